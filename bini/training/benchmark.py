@@ -0,0 +1,365 @@
+import os
+import gc
+import sys
+import json
+import math
+import time
+import resource
+import platform
+from pathlib import Path
+
+import yaml
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+SEED_PATH = BASE_DIR / "data/raw/seeds/seed_cases.json"
+
+# 측정 대상 / 배치 크기 / 회귀 임계값
+SPECS_PATH = Path(os.environ.get("BENCH_SPECS", BASE_DIR / "training/benchmark_specs.yaml"))
+
+REPORT_PATH = Path(os.environ.get("BENCH_REPORT", BASE_DIR / "outputs/benchmark_report.json"))
+BASELINE_PATH = Path(os.environ.get("BENCH_BASELINE", BASE_DIR / "outputs/benchmark_baseline.json"))
+
+# 1이면 측정 없이 기존 BENCH_REPORT를 baseline과 비교만 한다
+DIFF_ONLY = os.environ.get("DIFF_ONLY", "0") == "1"
+# 1이면 이번 리포트를 새 baseline으로 저장 (회귀 여부와 무관)
+UPDATE_BASELINE = os.environ.get("UPDATE_BASELINE", "0") == "1"
+
+# 리포트 지표: 처리량만 클수록 좋고 나머지는 작을수록 좋다
+METRICS = [
+    "load_seconds",
+    "tokenize_ms",
+    "ttft_p50_ms",
+    "ttft_p95_ms",
+    "tokens_per_sec",
+    "latency_p50_ms",
+    "latency_p95_ms",
+    "latency_p99_ms",
+    "peak_rss_mb",
+    "peak_vram_mb",
+]
+HIGHER_IS_BETTER = {"tokens_per_sec"}
+
+
+def percentile(values, q):
+    """선형 보간 백분위수 (values가 비면 None)"""
+    if not values:
+        return None
+    values = sorted(values)
+    pos = (len(values) - 1) * q / 100
+    lo, hi = math.floor(pos), math.ceil(pos)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def reset_peak_rss():
+    """프로세스 peak RSS(VmHWM) 초기화 (Linux 전용, 실패하면 누적 peak 그대로)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # ru_maxrss는 프로세스 전체 기간의 peak (Linux KB / macOS bytes)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / 1024 ** 2 if sys.platform == "darwin" else rss / 1024, 1)
+
+
+def sample_seeds(seeds, samples):
+    """seed 순서(특허별로 모여 있음)를 유지하며 고른 간격으로 samples개 선택"""
+    if not samples or samples >= len(seeds):
+        return seeds
+    step = len(seeds) / samples
+    return [seeds[int(i * step)] for i in range(samples)]
+
+
+def load_specs():
+    with open(SPECS_PATH, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+    specs = []
+    for raw in cfg["models"]:
+        spec = dict(raw)
+        for key in ("adapter", "merged"):
+            value = spec.get(key)
+            spec[f"{key}_path"] = (Path(value) if Path(value).is_absolute() else BASE_DIR / value) if value else None
+        specs.append(spec)
+    return specs, cfg
+
+
+# ---------------------------------------------------------------------------
+# 측정
+# ---------------------------------------------------------------------------
+
+def load_spec(spec, token=None):
+    """spec의 모델/토크나이저 로드. (model, tokenizer, 로드 초) 반환"""
+    from compare_models import load_spec_model, load_tokenizer
+    from generation import load_merged
+
+    start = time.perf_counter()
+    if spec["merged_path"] is not None:
+        model, tokenizer = load_merged(spec["merged_path"])
+    else:
+        tokenizer = load_tokenizer(spec, token)
+        model = load_spec_model(spec, token)
+    return model, tokenizer, time.perf_counter() - start
+
+
+def first_token_streamer():
+    """generate streamer: 첫 put은 프롬프트, 두 번째 put이 첫 생성 토큰 (배치 전체가 한 번에 나온다)"""
+    from transformers.generation.streamers import BaseStreamer
+
+    class FirstTokenTimer(BaseStreamer):
+        def __init__(self):
+            self.puts = 0
+            self.first_token_at = None
+
+        def put(self, value):
+            self.puts += 1
+            if self.puts == 2:
+                self.first_token_at = time.perf_counter()
+
+        def end(self):
+            pass
+
+    return FirstTokenTimer()
+
+
+def bench_batch_size(model, tokenizer, prompts, batch_size, max_new_tokens, constrained):
+    """한 배치 크기로 전체 프롬프트를 생성하며 지표 측정
+
+    요청 지연 = 배치 토크나이즈 시작부터 디코딩 끝까지 (같은 배치의 요청은 같은 지연).
+    """
+    import torch
+
+    from generation import encode_prompts, generate_encoded, length_sorted_batches
+
+    lengths = [len(tokenizer(p)["input_ids"]) for p in prompts]
+    batches = length_sorted_batches(lengths, batch_size)
+
+    tokenize_s = generate_s = 0.0
+    generated_tokens = 0
+    ttft, latency = [], []
+    for b, idxs in enumerate(batches, 1):
+        start = time.perf_counter()
+        inputs = encode_prompts(tokenizer, [prompts[i] for i in idxs])
+        encoded = time.perf_counter()
+        timer = first_token_streamer()
+        _, generated = generate_encoded(model, tokenizer, inputs, max_new_tokens=max_new_tokens,
+                                        constrained=constrained, streamer=timer)
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        done = time.perf_counter()
+
+        tokenize_s += encoded - start
+        generate_s += done - encoded
+        generated_tokens += generated
+        if timer.first_token_at is not None:
+            ttft.extend([timer.first_token_at - start] * len(idxs))
+        latency.extend([done - start] * len(idxs))
+        print(f"    [batch {b:3d}/{len(batches)}] size={len(idxs):2d} | {generated:5d} tok / {done - start:6.1f}s")
+
+    return {
+        "requests": len(prompts),
+        "batches": len(batches),
+        "generated_tokens": generated_tokens,
+        "tokenize_ms": _ms(tokenize_s / len(prompts)),
+        "ttft_p50_ms": _ms(percentile(ttft, 50)),
+        "ttft_p95_ms": _ms(percentile(ttft, 95)),
+        "tokens_per_sec": round(generated_tokens / generate_s, 2) if generate_s > 0 else 0.0,
+        "latency_p50_ms": _ms(percentile(latency, 50)),
+        "latency_p95_ms": _ms(percentile(latency, 95)),
+        "latency_p99_ms": _ms(percentile(latency, 99)),
+        "latency_mean_ms": _ms(sum(latency) / len(latency)),
+    }
+
+
+def bench_model(spec, cfg, prompts, token=None):
+    import torch
+
+    from generation import generate_batch
+
+    max_new_tokens = cfg.get("max_new_tokens", 512)
+    constrained = cfg.get("constrained", False)
+    cuda = torch.cuda.is_available()
+
+    reset_peak_rss()
+    if cuda:
+        torch.cuda.reset_peak_memory_stats()
+    print(f"\n모델 로드: {spec['name']}")
+    model, tokenizer, load_seconds = load_spec(spec, token)
+    print(f"  로드 {load_seconds:.1f}s")
+
+    for _ in range(cfg.get("warmup", 1)):
+        generate_batch(model, tokenizer, prompts[:1], max_new_tokens=16)
+
+    rows = []
+    for batch_size in cfg.get("batch_sizes", [1, 4, 16]):
+        print(f"  batch_size={batch_size}")
+        reset_peak_rss()
+        if cuda:
+            torch.cuda.reset_peak_memory_stats()
+        row = bench_batch_size(model, tokenizer, prompts, batch_size, max_new_tokens, constrained)
+        row = {
+            "model": spec["name"],
+            "batch_size": batch_size,
+            "load_seconds": round(load_seconds, 2),
+            **row,
+            # clear_refs를 못 쓰는 환경에서는 로드 peak까지 포함된 값
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_vram_mb": round(sum(torch.cuda.max_memory_allocated(i) for i in range(torch.cuda.device_count()))
+                                  / 1024 ** 2, 1) if cuda else None,
+        }
+        rows.append(row)
+
+    del model
+    gc.collect()
+    if cuda:
+        torch.cuda.empty_cache()
+    return rows
+
+
+def environment():
+    import torch
+    import transformers
+
+    return {
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "device": torch.cuda.get_device_name(0) if torch.cuda.is_available() else platform.processor() or "cpu",
+    }
+
+
+def run_benchmark(token=None):
+    from prompt_format import build_prompt
+
+    specs, cfg = load_specs()
+    with open(SEED_PATH, "r", encoding="utf-8") as f:
+        seeds = sample_seeds(json.load(f), cfg.get("samples", 0))
+    prompts = [build_prompt(s["user_query"], s["regit_num"], s["claim_text"]) for s in seeds]
+    print(f"벤치마크: 모델 {len(specs)}개, 프롬프트 {len(prompts)}개, batch_sizes={cfg.get('batch_sizes')}")
+
+    results = []
+    for spec in specs:
+        results.extend(bench_model(spec, cfg, prompts, token))
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "samples": len(prompts),
+        "max_new_tokens": cfg.get("max_new_tokens", 512),
+        "constrained": cfg.get("constrained", False),
+        "thresholds": cfg.get("thresholds", {}),
+        "results": results,
+    }
+
+
+# ---------------------------------------------------------------------------
+# baseline 비교
+# ---------------------------------------------------------------------------
+
+def diff_reports(baseline, report, thresholds):
+    """(model, batch_size)별 지표 변화. (비교 행 리스트, 회귀 행 리스트) 반환
+
+    change는 baseline 대비 비율, worse는 나빠진 방향을 양수로 맞춘 값.
+    baseline에 없는 조합이나 값이 없는 지표(CPU의 VRAM 등)는 건너뛴다.
+    """
+    default = thresholds.get("default", 0.10)
+    base_rows = {(r["model"], r["batch_size"]): r for r in baseline["results"]}
+    rows, regressions = [], []
+    for r in report["results"]:
+        b = base_rows.get((r["model"], r["batch_size"]))
+        if b is None:
+            continue
+        for metric in METRICS:
+            old, new = b.get(metric), r.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            limit = thresholds.get(metric, default)
+            row = {
+                "model": r["model"],
+                "batch_size": r["batch_size"],
+                "metric": metric,
+                "baseline": old,
+                "current": new,
+                "change": round(change, 4),
+                "threshold": limit,
+                "regressed": worse > limit,
+            }
+            rows.append(row)
+            if row["regressed"]:
+                regressions.append(row)
+    return rows, regressions
+
+
+def print_report(report):
+    print(f"\n{'모델':<16} | {'batch':>5} | {'load s':>7} | {'tok ms':>7} | {'TTFT p50':>9} | {'tok/s':>8} | "
+          f"{'p50 ms':>9} | {'p95 ms':>9} | {'p99 ms':>9} | {'RSS MB':>8} | {'VRAM MB':>8}")
+    print("-" * 130)
+    fmt = lambda v, w, p=1: f"{v:>{w}.{p}f}" if v is not None else f"{'-':>{w}}"
+    for r in report["results"]:
+        print(f"{r['model']:<16} | {r['batch_size']:>5} | {fmt(r['load_seconds'], 7)} | {fmt(r['tokenize_ms'], 7, 2)} | "
+              f"{fmt(r['ttft_p50_ms'], 9)} | {fmt(r['tokens_per_sec'], 8)} | {fmt(r['latency_p50_ms'], 9)} | "
+              f"{fmt(r['latency_p95_ms'], 9)} | {fmt(r['latency_p99_ms'], 9)} | {fmt(r['peak_rss_mb'], 8)} | "
+              f"{fmt(r['peak_vram_mb'], 8)}")
+
+
+def print_diff(rows, regressions):
+    print(f"\n[baseline 비교] 지표 {len(rows)}개, 회귀 {len(regressions)}개")
+    for row in rows:
+        mark = "✗" if row["regressed"] else " "
+        print(f"  {mark} {row['model']:<16} b={row['batch_size']:<3} {row['metric']:<15} "
+              f"{row['baseline']:>10} -> {row['current']:>10} ({row['change'] * 100:+6.1f}%, 허용 {row['threshold'] * 100:.0f}%)")
+
+
+def main():
+    if DIFF_ONLY:
+        with open(REPORT_PATH, "r", encoding="utf-8") as f:
+            report = json.load(f)
+    else:
+        report = run_benchmark(token=os.environ.get("HF_TOKEN"))
+        REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(REPORT_PATH, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print_report(report)
+    print(f"\n리포트: {REPORT_PATH}")
+
+    regressions = []
+    if BASELINE_PATH.exists():
+        with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("environment", {}).get("device") != report.get("environment", {}).get("device"):
+            print(f"⚠ baseline 장치({baseline.get('environment', {}).get('device')})가 현재와 달라 비교가 부정확할 수 있음")
+        rows, regressions = diff_reports(baseline, report, report.get("thresholds") or baseline.get("thresholds", {}))
+        print_diff(rows, regressions)
+    else:
+        print(f"baseline 없음: {BASELINE_PATH} (UPDATE_BASELINE=1로 저장)")
+
+    if UPDATE_BASELINE:
+        BASELINE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"baseline 갱신: {BASELINE_PATH}")
+    elif regressions:
+        print(f"\n성능 회귀 {len(regressions)}건 — 실패")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,25 @@
+import os
 import json
+import hashlib
+from collections import defaultdict
 from pathlib import Path
 
-BASE_DIR = Path(__file__).resolve().parents[1]  
+from prompt_format import build_prompt
 
-SEED_PATH = BASE_DIR / "data/raw/seeds/seed_cases.json"
-LABEL_PATH = BASE_DIR / "data/processed/train.jsonl"
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+SEED_DIR = BASE_DIR / "data/raw/seeds"
+LABEL_DIR = BASE_DIR / "data/processed"
+SEED_PATH = SEED_DIR / "seed_cases.json"
+LABEL_PATH = LABEL_DIR / "train.jsonl"
 OUT_PATH = BASE_DIR / "data/processed/sft_train.jsonl"
+MANIFEST_PATH = BASE_DIR / "data/processed/sft_manifest.json"
+
+# 1이면 manifest를 무시하고 sft_train.jsonl을 처음부터 다시 생성
+FULL_REBUILD = os.environ.get("FULL_REBUILD", "0") == "1"
+
+MANIFEST_VERSION = 2
 
-SYSTEM = (
-    "너는 특허 청구항과 사용자 제품 구성을 비교하여 구성요소별 대응 여부를 판단하고, "
-    "그 결과에 따라 특허 침해 리스크를 평가하는 모델이다. "
-    "최종 응답은 반드시 JSON 형식으로 출력한다."
-)
 
 def load_jsonl(path: str):
     rows = []
@@ -26,37 +34,273 @@ def load_jsonl(path: str):
                 raise ValueError(f"Invalid JSONL at line {line_no}: {e}\n{line[:200]}")
     return rows
 
+def iter_jsonl(path):
+    """JSONL을 한 줄씩 스트리밍"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except Exception as e:
+                raise ValueError(f"Invalid JSONL at {path}:{line_no}: {e}\n{line[:200]}")
+
+def iter_json_array(path, chunk_size=1 << 16):
+    """최상위 JSON 배열의 원소를 파일 전체를 읽지 않고 하나씩 스트리밍"""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        started = False
+        eof = False
+        while True:
+            if not eof and len(buf) < chunk_size:
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf += chunk
+            buf = buf.lstrip()
+            if not started:
+                if not buf:
+                    if eof:
+                        return
+                    continue
+                if buf[0] != "[":
+                    raise ValueError(f"{path}: 최상위가 JSON 배열이 아닙니다")
+                buf = buf[1:]
+                started = True
+                continue
+            if buf.startswith(","):
+                buf = buf[1:]
+                continue
+            if buf.startswith("]"):
+                return
+            try:
+                obj, end = decoder.raw_decode(buf)
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError(f"{path}: JSON 배열이 중간에 끝났습니다")
+                # 원소가 청크 경계에 걸림 -> 더 읽는다
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf += chunk
+                continue
+            yield obj
+            buf = buf[end:]
+
+def source_pairs():
+    """(seed 파일, label 파일) 쌍 목록: 전체 seed_cases.json + 특허별 seed_<regit_num>.json"""
+    pairs = [(SEED_PATH, LABEL_PATH)]
+    for seed_path in sorted(SEED_DIR.glob("seed_*.json")):
+        if seed_path == SEED_PATH:
+            continue
+        suffix = seed_path.stem[len("seed_"):]
+        label_path = LABEL_DIR / f"train_{suffix}.jsonl"
+        if label_path.exists():
+            pairs.append((seed_path, label_path))
+        else:
+            print(f"[WARN] 라벨 파일 없음, 건너뜀: {seed_path.name}")
+    return pairs
+
+def _join_key(row, counters):
+    """seed/label 공통 조인 키: 명시적 id가 있으면 id, 없으면 (regit_num, 특허 내 순번)"""
+    if row.get("id"):
+        return ("id", str(row["id"]))
+    regit_num = str(row["regit_num"])
+    n = counters[regit_num]
+    counters[regit_num] += 1
+    return ("regit", regit_num, n)
+
+def _keys(rows):
+    keys, counters = set(), defaultdict(int)
+    for row in rows:
+        key = _join_key(row, counters)
+        if key in keys:
+            raise ValueError(f"중복된 id: {key[1]}")
+        keys.add(key)
+    return keys
+
+def check_pairing(seed_path, label_path):
+    """seed와 label의 조인 키 집합이 같은지 확인하고, 다르면 ValueError
+
+    id가 없는 행은 (특허번호, 특허 내 순번)으로 짝을 지으므로 특허별 개수가 다르면 그 뒤의 짝이 모두 밀린다.
+    잘못 짝지은 예제를 내보내지 않도록 조인 전에 한 번 더 읽어 확인한다.
+    """
+    seed_keys = _keys(iter_json_array(seed_path))
+    label_keys = _keys(iter_jsonl(label_path))
+    if seed_keys == label_keys:
+        return
+    only_seed = sorted(seed_keys - label_keys, key=str)
+    only_label = sorted(label_keys - seed_keys, key=str)
+    raise ValueError(
+        f"{seed_path.name} / {label_path.name} 짝이 맞지 않습니다: "
+        f"seed에만 {len(only_seed)}개 {[k[1:] for k in only_seed[:5]]}, "
+        f"label에만 {len(only_label)}개 {[k[1:] for k in only_label[:5]]}"
+    )
+
+def join_pairs(seed_path, label_path):
+    """seed와 label을 조인 키(id)로 스트리밍 조인. (조인 키, seed, label)을 yield
+
+    먼저 check_pairing으로 짝이 맞는지 확인한다 (맞지 않으면 ValueError).
+    두 파일은 보통 같은 순서이므로 짝이 먼저 도착한 쪽만 잠시 버퍼에 들고 있는다.
+    """
+    check_pairing(seed_path, label_path)
+    seeds = iter_json_array(seed_path)
+    labels = iter_jsonl(label_path)
+    seed_counters, label_counters = defaultdict(int), defaultdict(int)
+    pending_seeds, pending_labels = {}, {}
+    seeds_done = labels_done = False
+
+    while not (seeds_done and labels_done):
+        if not seeds_done:
+            seed = next(seeds, None)
+            if seed is None:
+                seeds_done = True
+            else:
+                key = _join_key(seed, seed_counters)
+                if key in pending_labels:
+                    yield key, seed, pending_labels.pop(key)
+                else:
+                    pending_seeds[key] = seed
+        if not labels_done:
+            label = next(labels, None)
+            if label is None:
+                labels_done = True
+            else:
+                key = _join_key(label, label_counters)
+                if key in pending_seeds:
+                    yield key, pending_seeds.pop(key), label
+                else:
+                    pending_labels[key] = label
+
+def build_text(seed, y):
+    user_query = seed["user_query"].strip()
+    claim_text = seed["claim_text"].strip()
+    regit_num = seed["regit_num"]
+
+    prompt = build_prompt(user_query, regit_num, claim_text)
+
+    # id는 조인용이므로 정답 응답에서 뺀다
+    completion = json.dumps({k: v for k, v in y.items() if k != "id"}, ensure_ascii=False)
+    return prompt + completion + "\n</assistant>\n"
+
+def _hash_parts(parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:20]
+
+def example_key(source_name, join_key):
+    """예제 식별 키: (seed 파일, 조인 키) 해시
+
+    조인 키는 seed/label의 id이므로 user_query/claim_text를 고쳐도 키가 유지되고,
+    내용 변경은 content_hash 비교로 잡혀 기존 줄을 대체한다.
+    """
+    return _hash_parts((source_name, *join_key))
+
+def dedup_key(seed):
+    """파일 간 중복 판별 키: (특허번호, 제품 설명, 청구항) 해시"""
+    return _hash_parts((seed["regit_num"], seed["user_query"].strip(), seed["claim_text"].strip()))
+
+def content_hash(line: str):
+    return hashlib.sha256(line.encode("utf-8")).hexdigest()
+
+def load_manifest():
+    if FULL_REBUILD or not MANIFEST_PATH.exists() or not OUT_PATH.exists():
+        return None
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+def save_manifest(manifest):
+    tmp = MANIFEST_PATH.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    tmp.replace(MANIFEST_PATH)
+
+def compact(rows, stale_lines):
+    """변경/삭제된 예제의 줄을 제거하며 sft_train.jsonl을 다시 쓰고 줄 번호를 갱신"""
+    line_to_key = {entry["line"]: key for key, entry in rows.items()}
+    tmp = OUT_PATH.with_suffix(".jsonl.tmp")
+    new_line = 0
+    with open(OUT_PATH, "r", encoding="utf-8") as src, open(tmp, "w", encoding="utf-8") as dst:
+        for line_no, line in enumerate(src):
+            if line_no in stale_lines:
+                continue
+            dst.write(line)
+            key = line_to_key.get(line_no)
+            if key is not None:
+                rows[key]["line"] = new_line
+            new_line += 1
+    tmp.replace(OUT_PATH)
+
 def main():
-    with open(SEED_PATH, "r", encoding="utf-8") as f:
-        seeds = json.load(f)
+    manifest = load_manifest()
+    if manifest is None:
+        print("manifest 없음 (또는 FULL_REBUILD=1): 처음부터 생성")
+        manifest = {"version": MANIFEST_VERSION, "rows": {}}
+        mode = "w"
+        next_line = 0
+    else:
+        mode = "a"
+        next_line = max((e["line"] for e in manifest["rows"].values()), default=-1) + 1
+
+    rows = manifest["rows"]
+    seen = set()       # 이번 빌드에 남아 있는 예제 키
+    contents = set()   # 이번 빌드에 이미 쓴 예제 내용 (파일 간 중복 제거)
+    stale_lines = set()
+    stats = {"new": 0, "changed": 0, "unchanged": 0, "duplicate": 0, "deleted": 0}
+
+    # 짝이 맞지 않는 파일이 있으면 sft_train.jsonl을 건드리기 전에 중단
+    sources = source_pairs()
+    for seed_path, label_path in sources:
+        check_pairing(seed_path, label_path)
+
+    with open(OUT_PATH, mode, encoding="utf-8") as out:
+        for seed_path, label_path in sources:
+            for join_key, seed, y in join_pairs(seed_path, label_path):
+                content = dedup_key(seed)
+                if content in contents:
+                    # seed_cases.json과 특허별 seed 파일에 같은 예제가 중복 등장
+                    stats["duplicate"] += 1
+                    continue
+                contents.add(content)
+                key = example_key(seed_path.name, join_key)
+                seen.add(key)
 
-    labels = load_jsonl(LABEL_PATH)
+                line = json.dumps({"text": build_text(seed, y)}, ensure_ascii=False)
+                h = content_hash(line)
+                entry = rows.get(key)
+                if entry is not None and entry["hash"] == h:
+                    stats["unchanged"] += 1
+                    continue
 
-    if len(seeds) != len(labels):
-        raise ValueError(f"seed({len(seeds)}) and labels({len(labels)}) count mismatch")
+                if entry is None:
+                    stats["new"] += 1
+                else:
+                    stats["changed"] += 1
+                    stale_lines.add(entry["line"])
 
-    with open(OUT_PATH, "w", encoding="utf-8") as out:
-        for i, (seed, y) in enumerate(zip(seeds, labels), 1):
-            user_query = seed["user_query"].strip()
-            claim_text = seed["claim_text"].strip()
-            regit_num = seed["regit_num"]
+                out.write(line + "\n")
+                rows[key] = {"hash": h, "line": next_line, "source": seed_path.name}
+                next_line += 1
 
-            prompt = (
-                f"<system>\n{SYSTEM}\n</system>\n"
-                f"<user>\n"
-                f"[사용자 제품 설명]\n{user_query}\n\n"
-                f"[특허 정보]\n특허번호: {regit_num}\n청구항:\n{claim_text}\n\n"
-                f"구성요소별 대응 여부를 판단하고, 침해 리스크를 평가하라.\n"
-                f"</user>\n"
-                f"<assistant>\n"
-            )
+    # 원본에서 사라진 예제 (seed/label 삭제, 다른 파일의 중복으로 바뀜)
+    for key in [k for k in rows if k not in seen]:
+        stale_lines.add(rows.pop(key)["line"])
+        stats["deleted"] += 1
 
-            completion = json.dumps(y, ensure_ascii=False)
-            text = prompt + completion + "\n</assistant>\n"
+    if stale_lines:
+        compact(rows, stale_lines)
 
-            out.write(json.dumps({"text": text}, ensure_ascii=False) + "\n")
+    save_manifest(manifest)
 
-    print(f"Wrote: {OUT_PATH} ({len(seeds)} rows)")
+    print(f"Wrote: {OUT_PATH} ({len(rows)} rows) | "
+          f"new {stats['new']}, changed {stats['changed']}, unchanged {stats['unchanged']}, "
+          f"deleted {stats['deleted']}, duplicate {stats['duplicate']}")
+    print(f"Manifest: {MANIFEST_PATH}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import shutil
+import numpy as np
+import faiss
+from dotenv import load_dotenv
+from numpy.lib.format import open_memmap
+from pathlib import Path
+
+load_dotenv()
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# 청구항 임베딩 인덱스 디렉토리 (vectors.npy / claims.jsonl / offsets.npy / ivfpq.faiss / meta.json)
+INDEX_DIR = Path(os.environ.get("INDEX_DIR", BASE_DIR / "data/index/claims"))
+
+# 한국어 SBERT 인코더 (ARCHITECTURE.md 텍스트 임베딩: KoSimCSE/SBERT 계열)
+EMBED_MODEL = os.environ.get("EMBED_MODEL", "jhgan/ko-sroberta-multitask")
+
+# 인덱스 입력 (regit_num, claim_text를 가진 JSON 배열 / JSONL / kipris_ingest.py 청구항 저장소 디렉토리, 기본은 seed 청구항)
+CLAIMS_PATH = Path(os.environ.get("CLAIMS_PATH", BASE_DIR / "data/raw/seeds/seed_cases.json"))
+
+TOP_K = int(os.environ.get("TOP_K", "10"))
+NPROBE = int(os.environ.get("NPROBE", "16"))
+
+# IVF-PQ: 코드북 학습에 필요한 최소 벡터 수 (이보다 적으면 exact 인덱스 사용)
+PQ_MIN_TRAIN = 256 * 39
+PQ_SUBQUANTIZERS = 16
+PQ_BITS = 8
+TRAIN_SAMPLE = 100_000
+ENCODE_BATCH = 256
+INDEX_VERSION = 1
+
+
+class ClaimEncoder:
+    """SBERT 인코더 (L2 정규화 -> 내적 = 코사인 유사도)"""
+
+    def __init__(self, model_name=EMBED_MODEL):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size=ENCODE_BATCH):
+        vectors = self.model.encode(
+            list(texts),
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return vectors.astype(np.float32, copy=False)
+
+
+def iter_claims(path=CLAIMS_PATH):
+    """(regit_num, claim_text) 스트리밍. 같은 청구항은 한 번만"""
+    from build_sft_jsonl import iter_json_array, iter_jsonl
+
+    path = Path(path)
+    if path.is_dir():
+        from kipris_ingest import iter_store_claims
+
+        rows = iter_store_claims(path)
+    else:
+        rows = iter_jsonl(path) if path.suffix == ".jsonl" else iter_json_array(path)
+    seen = set()
+    for row in rows:
+        key = (str(row["regit_num"]), row["claim_text"].strip())
+        if key in seen:
+            continue
+        seen.add(key)
+        yield key
+
+
+def _ivfpq_params(n, dim):
+    nlist = int(min(max(4 * np.sqrt(n), 16), n // 39))
+    m = PQ_SUBQUANTIZERS
+    while dim % m:
+        m //= 2
+    return nlist, m
+
+
+def train_ann(vectors, dim):
+    """IVF-PQ 인덱스 학습 + 추가 (벡터가 적으면 exact 내적 인덱스)"""
+    n = vectors.shape[0]
+    if n < PQ_MIN_TRAIN:
+        index = faiss.IndexFlatIP(dim)
+        kind = "flat"
+    else:
+        nlist, m = _ivfpq_params(n, dim)
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, m, PQ_BITS, faiss.METRIC_INNER_PRODUCT)
+        sample = np.sort(np.random.default_rng(0).choice(n, size=min(n, TRAIN_SAMPLE), replace=False))
+        index.train(np.ascontiguousarray(vectors[sample]))
+        kind = f"ivfpq(nlist={nlist},m={m},nbits={PQ_BITS})"
+
+    # mmap 벡터를 조금씩 올려 추가
+    for start in range(0, n, TRAIN_SAMPLE):
+        index.add(np.ascontiguousarray(vectors[start:start + TRAIN_SAMPLE]))
+    return index, kind
+
+
+def write_ann(index_dir, vectors, model_name):
+    """vectors(memmap)로 ANN 인덱스를 학습해 index_dir/ivfpq.faiss에 저장. meta dict 반환"""
+    start = time.perf_counter()
+    n, dim = vectors.shape
+    index, kind = train_ann(vectors, dim)
+    faiss.write_index(index, str(Path(index_dir) / "ivfpq.faiss"))
+    return {
+        "version": INDEX_VERSION,
+        "model": model_name,
+        "dim": dim,
+        "count": n,
+        "index": kind,
+        "index_seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def build_index(claims, encoder: ClaimEncoder, index_dir=INDEX_DIR):
+    """청구항을 인코딩해 디스크 인덱스 생성
+
+    1) claims.jsonl + offsets.npy 기록 (개수 확정)  2) 배치 인코딩 -> vectors.npy (memmap)
+    3) IVF-PQ 학습/추가 -> ivfpq.faiss
+    """
+    index_dir = Path(index_dir)
+    tmp_dir = index_dir.with_name(index_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    offsets = []
+    with open(tmp_dir / "claims.jsonl", "wb") as f:
+        for regit_num, claim_text in claims:
+            offsets.append(f.tell())
+            f.write((json.dumps({"regit_num": regit_num, "claim_text": claim_text}, ensure_ascii=False) + "\n").encode("utf-8"))
+    n = len(offsets)
+    if n == 0:
+        raise ValueError("인덱싱할 청구항이 없습니다")
+    np.save(tmp_dir / "offsets.npy", np.asarray(offsets, dtype=np.int64))
+
+    start = time.perf_counter()
+    vectors = open_memmap(tmp_dir / "vectors.npy", mode="w+", dtype=np.float32, shape=(n, encoder.dim))
+    store = ClaimStore(tmp_dir)
+    for lo in range(0, n, ENCODE_BATCH * 16):
+        hi = min(n, lo + ENCODE_BATCH * 16)
+        vectors[lo:hi] = encoder.encode(store.texts(range(lo, hi)))
+        print(f"  인코딩 {hi}/{n}")
+    vectors.flush()
+    encode_seconds = time.perf_counter() - start
+
+    meta = write_ann(tmp_dir, vectors, encoder.model_name)
+    meta["encode_seconds"] = round(encode_seconds, 2)
+    with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    del vectors
+
+    shutil.rmtree(index_dir, ignore_errors=True)
+    tmp_dir.rename(index_dir)
+    print(f"인덱스 생성: {index_dir} ({n}개, {meta['index']})")
+    return index_dir
+
+
+class ClaimStore:
+    """claims.jsonl을 오프셋으로 임의 접근 (전체를 메모리에 올리지 않음)"""
+
+    def __init__(self, index_dir):
+        self.path = Path(index_dir) / "claims.jsonl"
+        self.offsets = np.load(Path(index_dir) / "offsets.npy", mmap_mode="r")
+        self._f = open(self.path, "rb")
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def get(self, i):
+        self._f.seek(int(self.offsets[i]))
+        return json.loads(self._f.readline().decode("utf-8"))
+
+    def texts(self, idxs):
+        return [self.get(i)["claim_text"] for i in idxs]
+
+
+class ClaimIndex:
+    """user_query -> top-k (regit_num, claim_text) 후보 검색
+
+    ANN 인덱스는 mmap으로 열고 (IVF 리스트를 필요한 만큼만 읽음), 후보는 memmap 원본 벡터로
+    정확한 코사인 점수를 다시 계산해 PQ 근사 오차를 보정한다.
+    """
+
+    def __init__(self, index_dir=INDEX_DIR, encoder: ClaimEncoder = None, nprobe=NPROBE):
+        self.index_dir = Path(index_dir)
+        with open(self.index_dir / "meta.json", "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        # 벡터 검색만 할 때(벤치마크)는 인코더를 로드하지 않는다
+        self.encoder = encoder
+        if encoder is not None and encoder.model_name != self.meta["model"]:
+            raise ValueError(f"인덱스 인코더({self.meta['model']})와 쿼리 인코더({encoder.model_name})가 다릅니다")
+        # IVF 리스트만 mmap 대상 (작은 exact 인덱스는 그대로 로드)
+        flags = 0 if self.meta["index"] == "flat" else faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        self.index = faiss.read_index(str(self.index_dir / "ivfpq.faiss"), flags)
+        if hasattr(self.index, "nprobe"):
+            self.index.nprobe = nprobe
+        self.vectors = np.load(self.index_dir / "vectors.npy", mmap_mode="r")
+        self._store = None
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = ClaimStore(self.index_dir)
+        return self._store
+
+    def search_vectors(self, queries, k=TOP_K, rerank_factor=4):
+        """정규화된 쿼리 벡터로 검색. (점수, 인덱스) 배열 반환"""
+        _, cand = self.index.search(queries, k * rerank_factor)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, c in enumerate(cand):
+            # memmap은 정렬된 인덱스로 읽어야 순차 접근에 가깝다
+            c = np.sort(c[c >= 0])
+            exact = self.vectors[c] @ queries[row]
+            order = np.argsort(-exact)[:k]
+            ids[row, :len(order)] = c[order]
+            scores[row, :len(order)] = exact[order]
+        return scores, ids
+
+    def search(self, user_query, k=TOP_K):
+        """[{"regit_num", "claim_text", "score"}] (점수 내림차순)"""
+        if self.encoder is None:
+            self.encoder = ClaimEncoder(self.meta["model"])
+        query = self.encoder.encode([user_query])
+        scores, ids = self.search_vectors(query, k)
+        hits = []
+        for score, i in zip(scores[0], ids[0]):
+            if i < 0:
+                continue
+            row = self.store.get(int(i))
+            row["score"] = round(float(score), 4)
+            hits.append(row)
+        return hits
+
+
+def candidate_prompts(user_query, hits):
+    """검색 결과를 기존 build_prompt 입력으로 변환"""
+    from prompt_format import build_prompt
+
+    return [build_prompt(user_query, h["regit_num"], h["claim_text"]) for h in hits]
+
+
+def main():
+    encoder = ClaimEncoder()
+    if not (INDEX_DIR / "meta.json").exists() or os.environ.get("REBUILD_INDEX", "0") == "1":
+        print(f"인덱스 생성 중... ({CLAIMS_PATH})")
+        build_index(iter_claims(CLAIMS_PATH), encoder, INDEX_DIR)
+
+    index = ClaimIndex(INDEX_DIR, encoder=encoder)
+    query = os.environ.get("QUERY", "tributyl acetylcitrate를 함유하는 크림을 만들었어")
+    start = time.perf_counter()
+    hits = index.search(query, k=TOP_K)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print(f"\n쿼리: {query} ({elapsed:.1f}ms, {index.meta['index']})")
+    for rank, h in enumerate(hits, 1):
+        print(f"  {rank:2d}. [{h['score']:.3f}] {h['regit_num']} | {h['claim_text'][:60]}...")
+
+
+if __name__ == "__main__":
+    main()
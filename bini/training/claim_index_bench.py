@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import shutil
+import numpy as np
+from numpy.lib.format import open_memmap
+from pathlib import Path
+
+from claim_index import INDEX_DIR, NPROBE, ClaimIndex, write_ann
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# 측정할 인덱스 크기 (청구항 수)
+BENCH_SIZES = [int(n) for n in os.environ.get("BENCH_SIZES", "10000,100000,1000000").split(",")]
+BENCH_QUERIES = int(os.environ.get("BENCH_QUERIES", "200"))
+BENCH_K = int(os.environ.get("BENCH_K", "10"))
+
+# 실제 인덱스 벡터가 부족하면 같은 차원의 군집형 합성 벡터로 채운다
+EMBED_DIM = int(os.environ.get("EMBED_DIM", "768"))
+BENCH_DIR = BASE_DIR / "data/index/bench"
+CHUNK = 100_000
+
+
+def _normalize(x):
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _source_vectors():
+    """기존 청구항 인덱스의 실제 임베딩 (없으면 None)"""
+    path = INDEX_DIR / "vectors.npy"
+    return np.load(path, mmap_mode="r") if path.exists() else None
+
+
+def make_vectors(path, n, dim, real=None, seed=0):
+    """n개 벡터 memmap 생성: 실제 임베딩을 앞에 두고 나머지는 군집형 합성 벡터"""
+    rng = np.random.default_rng(seed)
+    vectors = open_memmap(path, mode="w+", dtype=np.float32, shape=(n, dim))
+    filled = 0
+    if real is not None and real.shape[1] == dim:
+        filled = min(n, real.shape[0])
+        vectors[:filled] = real[:filled]
+    # 청구항 임베딩처럼 주제별로 뭉친 분포 (균등 난수는 ANN recall을 과소평가)
+    centers = _normalize(rng.standard_normal((max(16, n // 1000), dim)).astype(np.float32))
+    for lo in range(filled, n, CHUNK):
+        hi = min(n, lo + CHUNK)
+        assign = rng.integers(0, len(centers), size=hi - lo)
+        noise = rng.standard_normal((hi - lo, dim)).astype(np.float32) * (0.5 / np.sqrt(dim))
+        vectors[lo:hi] = _normalize(centers[assign] + noise)
+    vectors.flush()
+    return vectors
+
+
+def make_queries(vectors, count, seed=1):
+    """데이터 벡터 근처의 쿼리 (같은 주제의 다른 표현을 흉내)"""
+    rng = np.random.default_rng(seed)
+    idxs = rng.choice(vectors.shape[0], size=count, replace=False)
+    noise = rng.standard_normal((count, vectors.shape[1])).astype(np.float32) * (0.3 / np.sqrt(vectors.shape[1]))
+    return np.ascontiguousarray(_normalize(np.asarray(vectors[np.sort(idxs)]) + noise))
+
+
+def exact_topk(vectors, queries, k):
+    """memmap을 청크 단위로 읽어 정확한 top-k (정답)"""
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), k), dtype=np.int64)
+    for lo in range(0, vectors.shape[0], CHUNK):
+        scores = queries @ np.asarray(vectors[lo:lo + CHUNK]).T
+        ids = np.broadcast_to(np.arange(lo, lo + scores.shape[1]), scores.shape)
+        all_scores = np.concatenate([best_scores, scores], axis=1)
+        all_ids = np.concatenate([best_ids, ids], axis=1)
+        top = np.argpartition(-all_scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(all_scores, top, axis=1)
+        best_ids = np.take_along_axis(all_ids, top, axis=1)
+    return best_ids
+
+
+def bench_size(n, real):
+    index_dir = BENCH_DIR / f"n{n}"
+    shutil.rmtree(index_dir, ignore_errors=True)
+    index_dir.mkdir(parents=True)
+
+    dim = real.shape[1] if real is not None else EMBED_DIM
+    vectors = make_vectors(index_dir / "vectors.npy", n, dim, real)
+    meta = write_ann(index_dir, vectors, "bench")
+    with open(index_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    queries = make_queries(vectors, BENCH_QUERIES)
+    truth = exact_topk(vectors, queries, BENCH_K)
+
+    index = ClaimIndex(index_dir, nprobe=NPROBE)
+    index.search_vectors(queries[:1], BENCH_K)  # 워밍업 (mmap 페이지 적재)
+
+    latencies, hits = [], 0
+    for q, t in zip(queries, truth):
+        start = time.perf_counter()
+        _, ids = index.search_vectors(q[None], BENCH_K)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(ids[0].tolist()) & set(t.tolist()))
+
+    latencies = np.asarray(latencies)
+    return {
+        "claims": n,
+        "dim": dim,
+        "real_vectors": int(min(n, real.shape[0])) if real is not None else 0,
+        "index": meta["index"],
+        "nprobe": NPROBE,
+        "build_seconds": meta["index_seconds"],
+        "index_mb": round((index_dir / "ivfpq.faiss").stat().st_size / 1024 ** 2, 1),
+        "vectors_mb": round((index_dir / "vectors.npy").stat().st_size / 1024 ** 2, 1),
+        f"recall@{BENCH_K}": round(hits / (len(queries) * BENCH_K), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+    }
+
+
+def main():
+    real = _source_vectors()
+    rows = []
+    for n in BENCH_SIZES:
+        print(f"\n[{n:,} 청구항] 인덱스 생성 및 측정 중...")
+        row = bench_size(n, real)
+        rows.append(row)
+        print(f"  {row['index']} | recall@{BENCH_K} {row[f'recall@{BENCH_K}']:.3f} | "
+              f"p50 {row['p50_ms']:.2f}ms | p99 {row['p99_ms']:.2f}ms")
+
+    print(f"\n{'claims':>10} | {'index':<32} | {'recall@' + str(BENCH_K):>9} | {'p50 ms':>7} | {'p99 ms':>7} | {'index MB':>8}")
+    print("-" * 88)
+    for r in rows:
+        print(f"{r['claims']:>10,} | {r['index']:<32} | {r[f'recall@{BENCH_K}']:>9.3f} | "
+              f"{r['p50_ms']:>7.2f} | {r['p99_ms']:>7.2f} | {r['index_mb']:>8.1f}")
+
+    report_path = BENCH_DIR / "bench_report.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({"queries": BENCH_QUERIES, "k": BENCH_K, "rows": rows}, f, ensure_ascii=False, indent=2)
+    print(f"\n결과 저장: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
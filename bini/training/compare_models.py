@@ -1,38 +1,41 @@
 import os
+import gc
 import json
+import time
+import hashlib
 import torch
+import yaml
+from collections import OrderedDict
 from dotenv import load_dotenv
-from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
+from accelerate import init_empty_weights
+from transformers import AutoConfig, AutoTokenizer, AutoModelForCausalLM, BatchEncoding, BitsAndBytesConfig
 from peft import PeftModel
 from pathlib import Path
 
+from generation import MAX_NEW_TOKENS, generate_batch, generate_encoded, length_sorted_batches
+from judge_client import judge_many
+from judgement_cache import adapter_hash
+from prefix_cache import PrefixCache
+from prompt_format import build_prompt
+
 load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parents[1]
-ADAPTER_PATH = BASE_DIR / "outputs/gemma3-4b-it-lora"
 SEED_PATH = BASE_DIR / "data/raw/seeds/seed_cases.json"
 LABEL_PATH = BASE_DIR / "data/processed/train.jsonl"
 
-# 각 특허에서 10개씩 샘플링 (총 30개)
-TARGET_PATENTS = ["1014541990000", "1019930200000", "1021522890000"]
-SAMPLES_PER_PATENT = 10
-
-SYSTEM = (
-    "너는 특허 청구항과 사용자 제품 구성을 비교하여 구성요소별 대응 여부를 판단하고, "
-    "그 결과에 따라 특허 침해 리스크를 평가하는 모델이다. "
-    "최종 응답은 반드시 JSON 형식으로 출력한다."
-)
-
-def build_prompt(user_query: str, regit_num: str, claim_text: str) -> str:
-    return (
-        f"<system>\n{SYSTEM}\n</system>\n"
-        f"<user>\n"
-        f"[사용자 제품 설명]\n{user_query}\n\n"
-        f"[특허 정보]\n특허번호: {regit_num}\n청구항:\n{claim_text}\n\n"
-        f"구성요소별 대응 여부를 판단하고, 침해 리스크를 평가하라.\n"
-        f"</user>\n"
-        f"<assistant>\n"
-    )
+# 비교 대상 모델 목록 (name / base_model / adapter / quantization)
+SPECS_PATH = Path(os.environ.get("COMPARE_SPECS", BASE_DIR / "training/compare_specs.yaml"))
+
+# 모델별 예측 디스크 캐시 (모델 + 어댑터 해시 + 프롬프트 해시 키, 재실행 시 새 조합만 생성)
+CACHE_DIR = BASE_DIR / "outputs/compare_cache"
+
+# 공유 prompt prefix KV 캐시 최대 개수 (0이면 사용 안 함, 사용 시 batch size 1로 생성)
+PREFIX_CACHE = int(os.environ.get("PREFIX_CACHE", "0"))
+
+# 모델 서버 주소 (설정 시 use_judge_server 모델은 로컬 로드 대신 serve.py 서버에 요청)
+JUDGE_SERVER_URL = os.environ.get("JUDGE_SERVER_URL")
+
 
 def load_jsonl(path):
     rows = []
@@ -43,8 +46,318 @@ def load_jsonl(path):
                 rows.append(json.loads(line))
     return rows
 
-def evaluate_model(model, tokenizer, seeds, labels, model_name):
-    """모델 평가 함수"""
+def _sha(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+def tokenizer_fingerprint(tokenizer):
+    """어휘/정규화 규칙 기준 토크나이저 식별자 (같으면 토크나이즈 결과를 공유)
+
+    어댑터 폴더에 저장된 토크나이저와 base 모델 토크나이저는 경로만 다르므로 경로는 제외한다.
+    """
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    vocab = backend.to_str() if backend is not None else json.dumps(tokenizer.get_vocab(), sort_keys=True)
+    return _sha(len(tokenizer), vocab, tokenizer.pad_token, tokenizer.bos_token)
+
+def load_specs(token=None):
+    """compare_specs.yaml을 읽어 모델별 키/메모리 추정치를 채운 spec 목록과 설정 반환"""
+    with open(SPECS_PATH, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+
+    max_new_tokens = cfg.get("max_new_tokens", MAX_NEW_TOKENS)
+    # 배치 크기/제약 디코딩은 출력이 달라질 수 있으므로 캐시 키에 포함 (prefix 캐시는 batch size 1로 생성)
+    cfg["batch_size"] = 1 if PREFIX_CACHE > 0 else cfg.get("batch_size", 1)
+    cfg["constrained"] = bool(cfg.get("constrained", False))
+    specs = []
+    for raw in cfg["models"]:
+        spec = dict(raw)
+        adapter = spec.get("adapter")
+        spec["adapter_path"] = (BASE_DIR / adapter if not Path(adapter).is_absolute() else Path(adapter)) if adapter else None
+        spec["server_url"] = JUDGE_SERVER_URL if spec.get("use_judge_server") and JUDGE_SERVER_URL else None
+        if spec["server_url"]:
+            spec["memory_gb"] = 0.0
+            spec["key"] = None
+        else:
+            spec["adapter_hash"] = adapter_hash(spec["adapter_path"])
+            spec["key"] = _sha(spec["base_model"], spec["adapter_hash"], spec.get("quantization") or "bf16", max_new_tokens,
+                               cfg["batch_size"], cfg["constrained"])
+            spec["memory_gb"] = estimate_memory_gb(spec, token)
+        specs.append(spec)
+    return specs, cfg
+
+def estimate_memory_gb(spec, token=None):
+    """가중치 할당 없이 config로 파라미터 수를 세어 로드 후 메모리 추정 (spec의 memory_gb가 우선)"""
+    if spec.get("memory_gb"):
+        return float(spec["memory_gb"])
+    config = AutoConfig.from_pretrained(spec["base_model"], token=token)
+    with init_empty_weights():
+        skeleton = AutoModelForCausalLM.from_config(config)
+    params = sum(p.numel() for p in skeleton.parameters())
+    bytes_per_param = 0.5 if spec.get("quantization") == "4bit" else 2
+    gb = params * bytes_per_param / 1024 ** 3
+    if spec["adapter_path"] is not None:
+        gb += sum(p.stat().st_size for p in spec["adapter_path"].glob("adapter_model.*")) / 1024 ** 3
+    # 양자화 메타데이터/버퍼 여유분
+    return round(gb * 1.1, 2)
+
+def default_budget_gb():
+    if torch.cuda.is_available():
+        total = sum(torch.cuda.get_device_properties(i).total_memory for i in range(torch.cuda.device_count()))
+        return total / 1024 ** 3 * 0.9
+    return float("inf")
+
+
+class PredictionCache:
+    """모델 키(base + 어댑터 해시 + 설정)별 JSONL에 프롬프트 해시 -> 응답 저장"""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._entries = {}
+
+    def _load(self, key):
+        if key not in self._entries:
+            entries = {}
+            path = self.cache_dir / f"{key}.jsonl"
+            if path.exists():
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            row = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue  # 중단된 실행이 남긴 잘린 줄
+                        entries[row["prompt_hash"]] = row["response"]
+            self._entries[key] = entries
+        return self._entries[key]
+
+    def get(self, key, prompt_hash):
+        return self._load(key).get(prompt_hash)
+
+    def put(self, key, prompt_hash, response):
+        self._load(key)[prompt_hash] = response
+        with open(self.cache_dir / f"{key}.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps({"prompt_hash": prompt_hash, "response": response}, ensure_ascii=False) + "\n")
+
+
+def load_tokenizer(spec, token=None):
+    """spec의 토크나이저 (어댑터에 저장된 것이 있으면 그것, 없으면 베이스 모델)"""
+    return AutoTokenizer.from_pretrained(spec["adapter_path"] or spec["base_model"], token=token)
+
+
+def load_spec_model(spec, token=None):
+    """spec 모델 1개 로드 (quantization: 4bit면 nf4, 아니면 bf16 / adapter_path가 있으면 LoRA 적용)"""
+    if spec.get("quantization") == "4bit":
+        # 4-bit 양자화로 메모리 절약
+        bnb_config = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_compute_dtype=torch.bfloat16,
+            bnb_4bit_use_double_quant=True,
+        )
+        model = AutoModelForCausalLM.from_pretrained(
+            spec["base_model"], token=token, quantization_config=bnb_config, device_map="auto",
+        )
+    else:
+        model = AutoModelForCausalLM.from_pretrained(
+            spec["base_model"], token=token, torch_dtype=torch.bfloat16, device_map="auto",
+        )
+    if spec["adapter_path"] is not None:
+        model = PeftModel.from_pretrained(model, spec["adapter_path"])
+    model.eval()
+    return model
+
+
+class ModelPool:
+    """메모리 상한 안에서 모델을 올려 두는 풀 (자리가 없으면 가장 오래 안 쓴 모델부터 해제)"""
+
+    def __init__(self, budget_gb, token=None):
+        self.budget_gb = budget_gb
+        self.token = token
+        self._models = OrderedDict()  # name -> (model, memory_gb)
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = {}
+
+    @property
+    def used_gb(self):
+        return sum(gb for _, gb in self._models.values())
+
+    def get(self, spec):
+        name = spec["name"]
+        if name in self._models:
+            self._models.move_to_end(name)
+            return self._models[name][0]
+
+        while self._models and self.used_gb + spec["memory_gb"] > self.budget_gb:
+            self.evict(next(iter(self._models)))
+
+        print(f"  모델 로드: {name} (추정 {spec['memory_gb']:.1f}GB, 사용 중 {self.used_gb:.1f}GB)")
+        start = time.perf_counter()
+        model = load_spec_model(spec, self.token)
+        self.load_seconds[name] = round(time.perf_counter() - start, 2)
+        self.loads += 1
+        self._models[name] = (model, spec["memory_gb"])
+        return model
+
+    def evict(self, name):
+        print(f"  모델 해제: {name}")
+        model, _ = self._models.pop(name)
+        del model
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        self.evictions += 1
+
+    def clear(self):
+        for name in list(self._models):
+            self.evict(name)
+
+    def stats(self):
+        return {
+            "budget_gb": None if self.budget_gb == float("inf") else round(self.budget_gb, 2),
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "load_seconds": self.load_seconds,
+        }
+
+
+def plan_groups(specs, budget_gb):
+    """메모리 상한 안에 함께 올라갈 수 있는 모델끼리 묶는다 (각 모델은 한 번만 로드)"""
+    groups, current, used = [], [], 0.0
+    for spec in specs:
+        if current and used + spec["memory_gb"] > budget_gb:
+            groups.append(current)
+            current, used = [], 0.0
+        current.append(spec)
+        used += spec["memory_gb"]
+    if current:
+        groups.append(current)
+    return groups
+
+def pad_batch(tokenizer, rows):
+    """토크나이즈된 행들을 left padding으로 배치 텐서화 (다시 토크나이즈하지 않음)"""
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    padding_side = tokenizer.padding_side
+    tokenizer.padding_side = "left"
+    try:
+        return tokenizer.pad(rows, return_tensors="pt")
+    finally:
+        tokenizer.padding_side = padding_side
+
+def select_rows(inputs, rows):
+    """배치에서 일부 행만 골라 그 행들에 공통인 왼쪽 패딩 열을 잘라낸다"""
+    mask = inputs["attention_mask"][rows]
+    start = int(mask.any(dim=0).nonzero()[0])
+    return BatchEncoding({k: v[rows][:, start:] for k, v in inputs.items()})
+
+def run_models(specs, seeds, prompts, batch_size, max_new_tokens, pool, cache, token=None, constrained=False):
+    """모든 모델의 응답 생성. 캐시에 없는 (모델, 프롬프트)만 생성하고 같은 배치를 모든 모델에 넣는다
+
+    반환: ({모델 이름: 원래 순서 응답 리스트}, {모델 이름: 생성 통계})
+    """
+    prompt_hashes = [_sha(p) for p in prompts]
+    responses = {s["name"]: [None] * len(prompts) for s in specs}
+    stats = {s["name"]: {"cached": 0, "generated": 0, "generated_tokens": 0, "seconds": 0.0} for s in specs}
+
+    # 1) 서버 모델 / 캐시 조회
+    local = []
+    for spec in specs:
+        name = spec["name"]
+        if spec["server_url"]:
+            # 서버의 어댑터 버전을 알 수 없으므로 캐시하지 않는다
+            print(f"[{name}] 모델 서버 사용: {spec['server_url']}")
+            start = time.perf_counter()
+            responses[name] = [o["response"] for o in judge_many(spec["server_url"], seeds)]
+            stats[name]["generated"] = len(prompts)
+            stats[name]["seconds"] = round(time.perf_counter() - start, 3)
+            continue
+        spec["pending"] = set()
+        for i, ph in enumerate(prompt_hashes):
+            cached = cache.get(spec["key"], ph)
+            if cached is None:
+                spec["pending"].add(i)
+            else:
+                responses[name][i] = cached
+                stats[name]["cached"] += 1
+        print(f"[{name}] 캐시 {stats[name]['cached']}개, 생성 필요 {len(spec['pending'])}개")
+        if spec["pending"]:
+            local.append(spec)
+
+    if not local:
+        return responses, stats
+
+    # 2) 토크나이저가 같은 모델끼리 프롬프트를 한 번만 토크나이즈해 공유 배치 구성
+    tokenizers, batches = {}, {}
+    for spec in local:
+        tokenizer = load_tokenizer(spec, token)
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        spec["tokenizer_key"] = tokenizer_fingerprint(tokenizer)
+        tokenizers.setdefault(spec["tokenizer_key"], tokenizer)
+        spec["tokenizer"] = tokenizers[spec["tokenizer_key"]]
+
+    for key, tokenizer in tokenizers.items():
+        idxs = sorted(set().union(*(s["pending"] for s in local if s["tokenizer_key"] == key)))
+        encoded = tokenizer([prompts[i] for i in idxs])
+        rows = [{k: encoded[k][j] for k in encoded.keys()} for j in range(len(idxs))]
+        groups = length_sorted_batches([len(r["input_ids"]) for r in rows], batch_size)
+        batches[key] = [([idxs[j] for j in g], pad_batch(tokenizer, [rows[j] for j in g])) for g in groups]
+        print(f"토크나이즈: 프롬프트 {len(idxs)}개 -> 배치 {len(batches[key])}개 "
+              f"(모델 {sum(1 for s in local if s['tokenizer_key'] == key)}개 공유)")
+
+    # 3) 메모리 상한 안에서 모델 그룹 단위로 올리고, 배치마다 그룹 내 모든 모델 생성
+    for group in plan_groups(local, pool.budget_gb):
+        models = {s["name"]: pool.get(s) for s in group}
+        prefix_caches = {
+            s["name"]: PrefixCache(models[s["name"]], s["tokenizer"], max_entries=PREFIX_CACHE)
+            for s in group
+        } if PREFIX_CACHE > 0 else {}
+
+        for key in tokenizers:
+            members = [s for s in group if s["tokenizer_key"] == key]
+            for b, (idxs, inputs) in enumerate(batches.get(key, []), 1):
+                for spec in members:
+                    name = spec["name"]
+                    rows = [r for r, i in enumerate(idxs) if i in spec["pending"]]
+                    if not rows:
+                        continue
+                    start = time.perf_counter()
+                    if name in prefix_caches:
+                        # prefix 캐시는 프롬프트 문자열 단위 (batch size 1)
+                        outs, generated = generate_batch(
+                            models[name], spec["tokenizer"], [prompts[idxs[0]]],
+                            max_new_tokens=max_new_tokens, prefix_cache=prefix_caches[name], constrained=constrained,
+                        )
+                    else:
+                        sub = inputs if len(rows) == len(idxs) else select_rows(inputs, rows)
+                        outs, generated = generate_encoded(
+                            models[name], spec["tokenizer"], sub, max_new_tokens=max_new_tokens,
+                            constrained=constrained,
+                        )
+                    elapsed = time.perf_counter() - start
+
+                    for r, out in zip(rows, outs):
+                        i = idxs[r]
+                        responses[name][i] = out
+                        cache.put(spec["key"], prompt_hashes[i], out)
+                    stats[name]["generated"] += len(rows)
+                    stats[name]["generated_tokens"] += generated
+                    stats[name]["seconds"] = round(stats[name]["seconds"] + elapsed, 3)
+                    print(f"  [batch {b:3d}/{len(batches[key])}] {name}: {len(rows)}개 | "
+                          f"{generated:5d} tok / {elapsed:6.1f}s")
+
+        for name, pc in prefix_caches.items():
+            stats[name]["prefix_cache"] = pc.stats()
+
+    pool.clear()
+    return responses, stats
+
+def score_model(seeds, labels, responses, model_name):
+    """모델 응답 채점"""
     results = {
         "json_valid": 0,
         "risk_correct": 0,
@@ -52,25 +365,9 @@ def evaluate_model(model, tokenizer, seeds, labels, model_name):
     }
 
     predictions = []
+    print(f"\n[{model_name}]")
 
-    for i, (seed, label) in enumerate(zip(seeds, labels)):
-        prompt = build_prompt(seed["user_query"], seed["regit_num"], seed["claim_text"])
-        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
-
-        with torch.no_grad():
-            outputs = model.generate(
-                **inputs,
-                max_new_tokens=512,
-                do_sample=False,
-                pad_token_id=tokenizer.pad_token_id,
-            )
-
-        response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-        if "<assistant>" in response:
-            response = response.split("<assistant>")[-1].strip()
-        if "</assistant>" in response:
-            response = response.split("</assistant>")[0].strip()
-
+    for i, (seed, label, response) in enumerate(zip(seeds, labels, responses)):
         pred_risk = None
         json_valid = False
 
@@ -102,76 +399,54 @@ def evaluate_model(model, tokenizer, seeds, labels, model_name):
 
     return results, predictions
 
-def main():
-    token = os.environ.get("HF_TOKEN")
-
-    # 데이터 로드 (각 특허에서 10개씩 샘플링)
+def sample_seeds(cfg):
+    """설정된 특허에서 samples_per_patent개씩 샘플링 (patents가 비어 있으면 전체)"""
     with open(SEED_PATH, "r", encoding="utf-8") as f:
         all_seeds = json.load(f)
     all_labels = load_jsonl(LABEL_PATH)
 
-    seeds = []
-    labels = []
-    for patent in TARGET_PATENTS:
+    patents = [str(p) for p in cfg.get("patents") or []]
+    if not patents:
+        return all_seeds, all_labels
+
+    per_patent = cfg.get("samples_per_patent", 10)
+    seeds, labels = [], []
+    for patent in patents:
         count = 0
         for s, l in zip(all_seeds, all_labels):
-            if s["regit_num"] == patent and count < SAMPLES_PER_PATENT:
+            if s["regit_num"] == patent and count < per_patent:
                 seeds.append(s)
                 labels.append(l)
                 count += 1
+    return seeds, labels
+
+def main():
+    token = os.environ.get("HF_TOKEN")
+
+    specs, cfg = load_specs(token)
+    seeds, labels = sample_seeds(cfg)
+    prompts = [build_prompt(s["user_query"], s["regit_num"], s["claim_text"]) for s in seeds]
 
+    budget = cfg.get("memory_budget_gb") or default_budget_gb()
+    pool = ModelPool(budget, token=token)
+    cache = PredictionCache()
+
+    names = [s["name"] for s in specs]
     print("=" * 70)
-    print("모델 비교: Fine-tuned 4B vs Base 12B")
+    print(f"모델 비교: {' vs '.join(names)}")
     print("=" * 70)
-    print(f"테스트 데이터: {len(seeds)}개\n")
-
-    # ===== 1. Fine-tuned 4B 모델 =====
-    print("-" * 70)
-    print("[1] Fine-tuned Gemma 4B (LoRA)")
-    print("-" * 70)
-
-    tokenizer_4b = AutoTokenizer.from_pretrained(ADAPTER_PATH)
-    model_4b = AutoModelForCausalLM.from_pretrained(
-        "google/gemma-3-4b-it",
-        token=token,
-        torch_dtype=torch.bfloat16,
-        device_map="auto",
-    )
-    model_4b = PeftModel.from_pretrained(model_4b, ADAPTER_PATH)
-    model_4b.eval()
-
-    results_4b, preds_4b = evaluate_model(model_4b, tokenizer_4b, seeds, labels, "4B-finetuned")
-
-    # 메모리 해제
-    del model_4b, tokenizer_4b
-    torch.cuda.empty_cache()
-
-    # ===== 2. Base 12B 모델 =====
-    print("\n" + "-" * 70)
-    print("[2] Base Gemma 12B (학습 안함, 4-bit 양자화)")
-    print("-" * 70)
-
-    tokenizer_12b = AutoTokenizer.from_pretrained("google/gemma-3-12b-it", token=token)
-    if tokenizer_12b.pad_token is None:
-        tokenizer_12b.pad_token = tokenizer_12b.eos_token
-
-    # 4-bit 양자화로 메모리 절약
-    bnb_config = BitsAndBytesConfig(
-        load_in_4bit=True,
-        bnb_4bit_quant_type="nf4",
-        bnb_4bit_compute_dtype=torch.bfloat16,
-        bnb_4bit_use_double_quant=True,
-    )
+    print(f"테스트 데이터: {len(seeds)}개 | 메모리 상한: {budget:.1f}GB\n")
 
-    model_12b = AutoModelForCausalLM.from_pretrained(
-        "google/gemma-3-12b-it",
-        token=token,
-        quantization_config=bnb_config,
-        device_map="auto",
+    responses, gen_stats = run_models(
+        specs, seeds, prompts, batch_size=cfg["batch_size"],
+        max_new_tokens=cfg.get("max_new_tokens", MAX_NEW_TOKENS), pool=pool, cache=cache, token=token,
+        constrained=cfg["constrained"],
     )
-    model_12b.eval()
 
-    results_12b, preds_12b = evaluate_model(model_12b, tokenizer_12b, seeds, labels, "12B-base")
+    results, predictions = {}, {}
+    for name in names:
+        results[name], predictions[name] = score_model(seeds, labels, responses[name], name)
+        results[name]["generation"] = gen_stats[name]
 
     # ===== 결과 비교 =====
     print("\n" + "=" * 70)
@@ -179,53 +454,64 @@ def main():
     print("=" * 70)
 
     total = len(seeds)
-
-    print(f"\n{'메트릭':<20} | {'4B Fine-tuned':^15} | {'12B Base':^15}")
-    print("-" * 55)
-    print(f"{'JSON 유효성':<20} | {results_4b['json_valid']:>6}/{total} ({results_4b['json_valid']/total*100:>5.1f}%) | {results_12b['json_valid']:>6}/{total} ({results_12b['json_valid']/total*100:>5.1f}%)")
-    print(f"{'risk_level 정확도':<20} | {results_4b['risk_correct']:>6}/{total} ({results_4b['risk_correct']/total*100:>5.1f}%) | {results_12b['risk_correct']:>6}/{total} ({results_12b['risk_correct']/total*100:>5.1f}%)")
+    print(f"\n{'모델':<20} | {'JSON 유효성':^16} | {'risk_level 정확도':^16} | {'캐시/생성':^9}")
+    print("-" * 72)
+    for name in names:
+        r, g = results[name], gen_stats[name]
+        print(f"{name:<20} | {r['json_valid']:>6}/{total} ({r['json_valid']/total*100:>5.1f}%) | "
+              f"{r['risk_correct']:>6}/{total} ({r['risk_correct']/total*100:>5.1f}%) | {g['cached']:>3}/{g['generated']:<3}")
 
     # 케이스별 비교
     print(f"\n[케이스별 비교]")
-    print(f"{'#':<3} | {'Query':<25} | {'정답':<4} | {'4B-FT':<4} | {'12B':<4}")
-    print("-" * 55)
+    print(f"{'#':<3} | {'Query':<25} | {'정답':<4} | " + " | ".join(f"{n[:10]:<10}" for n in names))
+    print("-" * (40 + 13 * len(names)))
 
     diff_count = 0
-    for p4, p12 in zip(preds_4b, preds_12b):
-        mark_4b = "✓" if p4["pred"] == p4["true"] else "✗"
-        mark_12b = "✓" if p12["pred"] == p12["true"] else "✗"
-
-        # 결과가 다른 경우 하이라이트
-        if (p4["pred"] == p4["true"]) != (p12["pred"] == p12["true"]):
+    for row in zip(*(predictions[n] for n in names)):
+        correct = [p["pred"] == p["true"] for p in row]
+        cells = " | ".join(f"{'✓' if c else '✗'}{p['pred'] or 'N/A':<9}" for c, p in zip(correct, row))
+        # 모델 간 정답 여부가 다른 경우 하이라이트
+        mark = ""
+        if len(set(correct)) > 1:
             diff_count += 1
-            print(f"{p4['idx']:<3} | {p4['query']:<25} | {p4['true']:<4} | {mark_4b}{p4['pred'] or 'N/A':<3} | {mark_12b}{p12['pred'] or 'N/A':<3} ★")
-        else:
-            print(f"{p4['idx']:<3} | {p4['query']:<25} | {p4['true']:<4} | {mark_4b}{p4['pred'] or 'N/A':<3} | {mark_12b}{p12['pred'] or 'N/A':<3}")
+            mark = " ★"
+        print(f"{row[0]['idx']:<3} | {row[0]['query']:<25} | {row[0]['true']:<4} | {cells}{mark}")
 
     print(f"\n★ 결과가 다른 케이스: {diff_count}개")
 
     # 승자 판정
     print("\n" + "=" * 70)
-    if results_4b['risk_correct'] > results_12b['risk_correct']:
-        diff = results_4b['risk_correct'] - results_12b['risk_correct']
-        print(f"결론: Fine-tuned 4B 모델이 {diff}개 더 정확 ({results_4b['risk_correct']/total*100:.1f}% vs {results_12b['risk_correct']/total*100:.1f}%)")
-        print("→ 작은 모델도 Fine-tuning하면 큰 Base 모델보다 특정 태스크에서 우수!")
-    elif results_4b['risk_correct'] < results_12b['risk_correct']:
-        diff = results_12b['risk_correct'] - results_4b['risk_correct']
-        print(f"결론: Base 12B 모델이 {diff}개 더 정확 ({results_12b['risk_correct']/total*100:.1f}% vs {results_4b['risk_correct']/total*100:.1f}%)")
+    ranked = sorted(names, key=lambda n: -results[n]["risk_correct"])
+    best = ranked[0]
+    if len(ranked) > 1 and results[best]["risk_correct"] == results[ranked[1]]["risk_correct"]:
+        tied = [n for n in names if results[n]["risk_correct"] == results[best]["risk_correct"]]
+        print(f"결론: {', '.join(tied)} 동일한 정확도 ({results[best]['risk_correct']/total*100:.1f}%)")
     else:
-        print(f"결론: 두 모델 동일한 정확도 ({results_4b['risk_correct']/total*100:.1f}%)")
+        print(f"결론: {best} 모델이 가장 정확 ({results[best]['risk_correct']/total*100:.1f}%)")
     print("=" * 70)
 
     # 결과 저장
-    result_path = BASE_DIR / "outputs/compare_4b_vs_12b.json"
+    result_path = BASE_DIR / "outputs/compare_models.json"
+    result_path.parent.mkdir(parents=True, exist_ok=True)
     with open(result_path, "w", encoding="utf-8") as f:
         json.dump({
             "samples": total,
-            "4b_finetuned": results_4b,
-            "12b_base": results_12b,
-            "predictions_4b": preds_4b,
-            "predictions_12b": preds_12b,
+            "batch_size": cfg["batch_size"],
+            "constrained": cfg["constrained"],
+            "models": {
+                s["name"]: {
+                    "base_model": s["base_model"],
+                    "adapter": s.get("adapter"),
+                    "adapter_hash": s.get("adapter_hash"),
+                    "quantization": s.get("quantization"),
+                    "server_url": s["server_url"],
+                    "cache_key": s["key"],
+                    **results[s["name"]],
+                }
+                for s in specs
+            },
+            "pool": pool.stats(),
+            "predictions": predictions,
         }, f, ensure_ascii=False, indent=2)
     print(f"\n결과 저장: {result_path}")
 
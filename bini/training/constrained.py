@@ -0,0 +1,200 @@
+import re
+import json
+import torch
+from transformers import LogitsProcessor, StoppingCriteria
+
+from json_grammar import SchemaGrammar, load_schema
+
+_BYTE_TOKEN = re.compile(r"^<0x([0-9A-Fa-f]{2})>$")
+
+
+def _token_pieces(tokenizer):
+    """토큰 id -> 디코딩될 바이트 조각 (특수 토큰은 None, 바이트 폴백 토큰 <0xNN>은 그 1바이트)"""
+    special = set(tokenizer.all_special_ids)
+    pieces = []
+    for i, tok in enumerate(tokenizer.convert_ids_to_tokens(list(range(len(tokenizer))))):
+        if i in special or tok is None:
+            pieces.append(None)
+            continue
+        m = _BYTE_TOKEN.match(tok)
+        if m:
+            pieces.append(bytes([int(m.group(1), 16)]))
+            continue
+        pieces.append(tok.replace("▁", " ").encode("utf-8"))
+    return pieces
+
+
+_PLAIN_STRING = (("str", 0),)
+
+
+def _is_plain(piece):
+    """문자열 본문 안에서 상태를 바꾸지 않는 조각 (완결된 UTF-8, 따옴표/역슬래시/제어문자 없음)"""
+    try:
+        text = piece.decode("utf-8")
+    except UnicodeDecodeError:
+        return False
+    return bool(text) and not any(ch in '"\\' or ord(ch) < 0x20 for ch in text)
+
+
+class SchemaConstraint:
+    """output_schema.json 기반 제약 디코딩 상태
+
+    - SchemaGrammar가 허용하는 바이트 시퀀스만 생성되도록 매 스텝 토큰을 마스킹한다
+      (key 순서/따옴표/구분자/enum/null까지 포함, 특수 토큰과 EOS는 object가 닫히기 전엔 금지)
+    - 행마다 생성된 토큰을 한 개씩 오토마톤에 반영한다 (전체 재디코딩 없음)
+    - 상태별 허용 토큰 마스크는 첫 바이트 버킷으로 계산해 tokenizer/스키마 단위로 캐시한다
+    - top-level object가 닫히면 해당 행 생성 종료
+    max_new_tokens 안에 object가 닫히지 않으면 json_text는 None이고 호출 쪽은 extract_json 경로로 돌아간다.
+    """
+
+    _vocab_cache = {}
+    _mask_cache = {}
+
+    def __init__(self, tokenizer, prompt_len, schema=None):
+        self.tokenizer = tokenizer
+        self.prompt_len = prompt_len
+        schema = schema or load_schema()
+        self.grammar = SchemaGrammar(schema)
+        self.states = []   # 행별 [생성 토큰 0개일 때 상태, 1개 뒤, ...]
+        self.fed = []      # 행별 반영한 토큰 id
+        self.texts = []    # 행별 반영한 바이트
+        self._synced_len = None
+
+        self.vocab_key = (tokenizer.name_or_path, len(tokenizer))
+        if self.vocab_key not in self._vocab_cache:
+            self._vocab_cache[self.vocab_key] = self._build_vocab(_token_pieces(tokenizer))
+        self.pieces, self.buckets, self.special_buckets, self.plain_ids = self._vocab_cache[self.vocab_key]
+        self.schema_key = json.dumps(schema, sort_keys=True)
+
+    @staticmethod
+    def _build_vocab(pieces):
+        """첫 바이트별 토큰 버킷 (전체 / 문자열 본문에서 검사가 필요한 것만) + 문자열 본문용 무검사 토큰"""
+        buckets, special_buckets, plain_ids = {}, {}, []
+        for i, p in enumerate(pieces):
+            if not p:
+                continue
+            buckets.setdefault(p[0], []).append(i)
+            if _is_plain(p):
+                plain_ids.append(i)
+            else:
+                special_buckets.setdefault(p[0], []).append(i)
+        return pieces, buckets, special_buckets, plain_ids
+
+    # ----- 상태 동기화 -----
+    def _sync(self, input_ids):
+        # 같은 스텝에서 processor와 stopping criteria가 모두 호출되므로 한 번만 반영
+        if input_ids.shape[1] == self._synced_len:
+            return
+        self._synced_len = input_ids.shape[1]
+        generated = input_ids[:, self.prompt_len:]
+        n_gen = generated.shape[1]
+        while len(self.states) < generated.shape[0]:
+            self.states.append([self.grammar.start])
+            self.fed.append([])
+            self.texts.append(bytearray())
+        for row in range(generated.shape[0]):
+            fed = self.fed[row]
+            if self.states[row][-1] == () and n_gen >= len(fed):
+                continue  # 닫힌 행 (뒤는 패딩)
+            keep = len(fed)
+            if n_gen != keep + 1 or (keep and int(generated[row, keep - 1]) != fed[-1]):
+                # assisted generation 등으로 후보 토큰이 되돌려진 경우만 공통 접두사를 다시 찾는다
+                ids = generated[row, :min(keep, n_gen)].tolist()
+                keep = next((k for k, (a, b) in enumerate(zip(ids, fed)) if a != b), len(ids))
+            if keep < len(fed):
+                del fed[keep:]
+                del self.states[row][keep + 1:]
+                self.texts[row] = self.texts[row][:sum(len(self.pieces[t] or b"") for t in fed)]
+            for token in generated[row, keep:].tolist():
+                state = self.states[row][-1]
+                if state == ():
+                    nxt, piece = state, b""  # 닫힌 뒤는 패딩
+                else:
+                    piece = self.pieces[token] if token < len(self.pieces) else None
+                    nxt = self.grammar.feed(state, piece) if piece else None
+                    if nxt is None:
+                        break  # 마스크 밖 토큰: 이 행은 더 이상 제약하지 않는다
+                fed.append(token)
+                self.states[row].append(nxt)
+                self.texts[row] += piece
+
+    def json_text(self, row):
+        """행의 top-level JSON 문자열 (닫히지 않았으면 None)"""
+        if row >= len(self.states) or self.states[row][-1] != ():
+            return None
+        return self.texts[row].decode("utf-8", errors="replace")
+
+    # ----- 제약 판단 -----
+    def allowed_ids(self, state):
+        """상태에서 허용되는 토큰 id 리스트"""
+        key = (self.vocab_key, self.schema_key, state)
+        cached = self._mask_cache.get(key)
+        if cached is not None:
+            return cached
+        grammar = self.grammar
+        plain_string = state[-1:] == _PLAIN_STRING
+        buckets = self.special_buckets if plain_string else self.buckets
+        allowed = list(self.plain_ids) if plain_string else []
+        for b in range(256):
+            after = grammar.step(state, b)
+            if after is None:
+                continue
+            for i in buckets.get(b, ()):
+                if grammar.feed(after, self.pieces[i][1:]) is not None:
+                    allowed.append(i)
+        self._mask_cache[key] = allowed
+        return allowed
+
+    def _mask(self, state, vocab_size, device):
+        """허용 토큰이 적으면 id 텐서, 많으면 (문자열 본문) 금지 토큰 bool 마스크"""
+        key = ("mask", self.vocab_key, self.schema_key, state, vocab_size, str(device))
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            allowed = torch.tensor(self.allowed_ids(state), dtype=torch.long, device=device)
+            if len(allowed) * 8 < vocab_size:
+                mask = allowed
+            else:
+                mask = torch.ones(vocab_size, dtype=torch.bool, device=device)
+                mask[allowed] = False
+            self._mask_cache[key] = mask
+        return mask
+
+    def apply(self, input_ids, scores):
+        self._sync(input_ids)
+        for row in range(scores.shape[0]):
+            states = self.states[row]
+            if len(states) != input_ids.shape[1] - self.prompt_len + 1 or states[-1] == ():
+                continue  # 따라가지 못한 행 / 닫힌 행
+            mask = self._mask(states[-1], scores.shape[-1], scores.device)
+            if mask.dtype == torch.bool:
+                scores[row] = scores[row].masked_fill(mask, float("-inf"))
+            else:
+                kept = scores[row, mask]
+                scores[row] = float("-inf")
+                scores[row, mask] = kept
+        return scores
+
+    def done(self, input_ids):
+        self._sync(input_ids)
+        return torch.tensor(
+            [self.states[r][-1] == () for r in range(input_ids.shape[0])],
+            dtype=torch.bool, device=input_ids.device,
+        )
+
+
+class SchemaLogitsProcessor(LogitsProcessor):
+    def __init__(self, constraint: SchemaConstraint):
+        self.constraint = constraint
+
+    def __call__(self, input_ids, scores):
+        return self.constraint.apply(input_ids, scores)
+
+
+class JsonCloseStoppingCriteria(StoppingCriteria):
+    """top-level JSON object가 닫힌 행은 생성 종료"""
+
+    def __init__(self, constraint: SchemaConstraint):
+        self.constraint = constraint
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.constraint.done(input_ids)
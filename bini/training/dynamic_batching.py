@@ -0,0 +1,221 @@
+import json
+import time
+import random
+import torch
+import yaml
+from pathlib import Path
+from torch.utils.data import DataLoader
+from transformers import Trainer, TrainerCallback
+
+
+class DynamicPaddingCollator:
+    """배치 안의 최장 길이까지만 패딩 (labels 패딩은 -100)"""
+
+    def __init__(self, pad_token_id, pad_to_multiple_of=8):
+        self.pad_token_id = pad_token_id
+        self.pad_to_multiple_of = pad_to_multiple_of
+
+    def __call__(self, features):
+        max_len = max(len(f["input_ids"]) for f in features)
+        if self.pad_to_multiple_of:
+            m = self.pad_to_multiple_of
+            max_len = (max_len + m - 1) // m * m
+
+        batch = len(features)
+        input_ids = torch.full((batch, max_len), self.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((batch, max_len), dtype=torch.long)
+        labels = torch.full((batch, max_len), -100, dtype=torch.long)
+
+        for row, f in enumerate(features):
+            n = len(f["input_ids"])
+            input_ids[row, :n] = torch.as_tensor(f["input_ids"])
+            attention_mask[row, :n] = 1
+            labels[row, :n] = torch.as_tensor(f["labels"])
+
+        return {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "labels": labels,
+            # Gemma 3 모델은 token_type_ids 필요
+            "token_type_ids": torch.zeros_like(input_ids),
+        }
+
+
+class TokenBudgetBatchSampler:
+    """길이가 비슷한 예제끼리 묶되 (배치 크기 x 최장 길이)가 max_tokens를 넘지 않도록 하는 batch sampler
+
+    max_tokens를 기존 (batch 1 x max_seq_length)로 두면 메모리 상한은 그대로이고
+    짧은 예제는 한 배치에 여러 개가 들어가 실질 배치 크기가 커진다.
+    """
+
+    def __init__(self, lengths, max_tokens, max_batch_size=None, shuffle=True, seed=42):
+        self.lengths = list(lengths)
+        self.max_tokens = max_tokens
+        self.max_batch_size = max_batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.batches = self._build()
+
+    def _build(self):
+        order = sorted(range(len(self.lengths)), key=lambda i: self.lengths[i])
+        batches, current, longest = [], [], 0
+        for i in order:
+            new_longest = max(longest, self.lengths[i])
+            too_many = self.max_batch_size and len(current) >= self.max_batch_size
+            if current and (new_longest * (len(current) + 1) > self.max_tokens or too_many):
+                batches.append(current)
+                current, new_longest = [], self.lengths[i]
+            current.append(i)
+            longest = new_longest
+        if current:
+            batches.append(current)
+        return batches
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        batches = list(self.batches)
+        if self.shuffle:
+            # 버킷 내부 구성은 유지하고 배치 순서만 epoch마다 섞는다
+            random.Random(self.seed + self.epoch).shuffle(batches)
+        self.epoch += 1
+        return iter(batches)
+
+    def __len__(self):
+        return len(self.batches)
+
+
+class LengthGroupedTrainer(Trainer):
+    """TokenBudgetBatchSampler로 학습 배치를 구성하는 Trainer"""
+
+    def __init__(self, *args, batch_sampler=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_sampler = batch_sampler
+
+    def get_train_dataloader(self):
+        if self.batch_sampler is None:
+            return super().get_train_dataloader()
+        dataloader = DataLoader(
+            self.train_dataset,
+            batch_sampler=self.batch_sampler,
+            collate_fn=self.data_collator,
+            num_workers=self.args.dataloader_num_workers,
+            pin_memory=self.args.dataloader_pin_memory,
+        )
+        return self.accelerator.prepare(dataloader)
+
+
+class TokenCounter:
+    """collator를 감싸 배치마다 실제 토큰 수와 패딩 포함 토큰 수를 센다"""
+
+    def __init__(self, collator, pad_token_id):
+        self.collator = collator
+        self.pad_token_id = pad_token_id
+        self.reset()
+
+    def reset(self):
+        self.real_tokens = 0
+        self.padded_tokens = 0
+        self.examples = 0
+
+    def __call__(self, features):
+        batch = self.collator(features)
+        input_ids = batch["input_ids"]
+        mask = batch.get("attention_mask")
+        if mask is not None and mask.dim() == 2:
+            self.real_tokens += int(mask.sum())
+        else:
+            self.real_tokens += int((input_ids != self.pad_token_id).sum())
+        self.padded_tokens += input_ids.numel()
+        self.examples += input_ids.shape[0]
+        return batch
+
+
+class ThroughputCallback(TrainerCallback):
+    """optimizer step 시간과 tokens/sec를 기록하고 학습 종료 시 JSON 리포트 저장"""
+
+    def __init__(self, counter: TokenCounter, report_path, mode):
+        self.counter = counter
+        self.report_path = Path(report_path)
+        self.mode = mode
+        self.steps = []
+        self._start = None
+
+    def on_step_begin(self, args, state, control, **kwargs):
+        if self._start is None:
+            self._start = time.perf_counter()
+
+    def on_step_end(self, args, state, control, **kwargs):
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        now = time.perf_counter()
+        elapsed = now - self._start
+        self.steps.append({
+            "step": state.global_step,
+            "seconds": elapsed,
+            "examples": self.counter.examples,
+            "real_tokens": self.counter.real_tokens,
+            "padded_tokens": self.counter.padded_tokens,
+        })
+        self.counter.reset()
+        self._start = now
+
+    def summary(self):
+        # 첫 step은 워밍업(컴파일/할당)이 섞이므로 2 step 이상이면 제외
+        steps = self.steps[1:] if len(self.steps) > 1 else self.steps
+        seconds = sum(s["seconds"] for s in steps)
+        real = sum(s["real_tokens"] for s in steps)
+        padded = sum(s["padded_tokens"] for s in steps)
+        examples = sum(s["examples"] for s in steps)
+        return {
+            "mode": self.mode,
+            "steps": len(steps),
+            "avg_step_seconds": round(seconds / len(steps), 4) if steps else 0.0,
+            "examples_per_step": round(examples / len(steps), 2) if steps else 0.0,
+            "real_tokens_per_sec": round(real / seconds, 2) if seconds else 0.0,
+            "padded_tokens_per_sec": round(padded / seconds, 2) if seconds else 0.0,
+            "padding_ratio": round(1 - real / padded, 4) if padded else 0.0,
+        }
+
+    def on_train_end(self, args, state, control, **kwargs):
+        summary = self.summary()
+        self.report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.report_path, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "steps": self.steps}, f, ensure_ascii=False, indent=2)
+
+        print(f"\n[학습 처리량: {self.mode}]")
+        print(f"  step 평균 시간:     {summary['avg_step_seconds']:.3f}s")
+        print(f"  step당 예제 수:     {summary['examples_per_step']:.1f}")
+        print(f"  실제 tokens/sec:    {summary['real_tokens_per_sec']:.1f}")
+        print(f"  패딩 포함 tokens/sec: {summary['padded_tokens_per_sec']:.1f}")
+        print(f"  패딩 비율:          {summary['padding_ratio'] * 100:.1f}%")
+        print(f"  리포트 저장: {self.report_path}")
+
+
+def compare_reports(before_path, after_path):
+    """두 처리량 리포트(before/after)를 나란히 출력"""
+    with open(before_path, "r", encoding="utf-8") as f:
+        before = json.load(f)["summary"]
+    with open(after_path, "r", encoding="utf-8") as f:
+        after = json.load(f)["summary"]
+
+    print(f"{'메트릭':<22} | {before['mode']:^14} | {after['mode']:^14}")
+    print("-" * 56)
+    for key in ("avg_step_seconds", "examples_per_step", "real_tokens_per_sec", "padding_ratio"):
+        print(f"{key:<22} | {before[key]:>14} | {after[key]:>14}")
+    if before["real_tokens_per_sec"]:
+        print(f"\n실제 tokens/sec 향상: x{after['real_tokens_per_sec'] / before['real_tokens_per_sec']:.2f}")
+
+
+def main():
+    """lora_config.yaml의 output_dir에 저장된 max_length_padding / dynamic_padding 리포트 비교"""
+    base_dir = Path(__file__).resolve().parents[1]
+    cfg = yaml.safe_load(open(base_dir / "training/lora_config.yaml", "r", encoding="utf-8"))
+    out_dir = Path(cfg["output_dir"])
+    compare_reports(out_dir / "throughput_max_length_padding.json", out_dir / "throughput_dynamic_padding.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,19 @@
 import os
 import json
 import re
-import torch
 from dotenv import load_dotenv
-from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
-from peft import PeftModel
 from pathlib import Path
 from collections import defaultdict
 
+from generation import MAX_NEW_TOKENS, generate_responses, load_merged, load_model, summarize_throughput
+from judgement_cache import JudgementCache, model_fingerprint
+from prefix_cache import PrefixCache
+from profiling import PROFILE_TORCH_SAMPLES, finish as finish_profile, span
+from prompt_format import CLAIM_FIRST, build_prompt
+from judge_client import remote_responses
+from parallel_eval import parallel_responses
+from screener import screen, screened_verdict
+
 load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -22,25 +28,33 @@ else:
     ADAPTER_PATH = BASE_DIR / "outputs/gemma3-4b-it-lora"
     BASE_MODEL = "google/gemma-3-4b-it"
 
+# 배치 평가 (1이면 기존과 동일한 직렬 생성)
+BATCH_SIZE = int(os.environ.get("BATCH_SIZE", "1"))
+
+# 공유 prompt prefix KV 캐시 최대 개수 (0이면 사용 안 함, 사용 시 batch size 1로 생성)
+PREFIX_CACHE = int(os.environ.get("PREFIX_CACHE", "0"))
+
+# output_schema.json 기반 제약 디코딩 (enum 값 제한 + JSON 종료 시 조기 중단, 정규식 후처리 생략)
+CONSTRAINED = os.environ.get("CONSTRAINED", "0") == "1"
+
+# 모델 서버 주소 (설정 시 로컬 모델을 로드하지 않고 serve.py 서버에 요청)
+JUDGE_SERVER_URL = os.environ.get("JUDGE_SERVER_URL")
+
+# export_merged.py로 만든 병합+int8 체크포인트 경로 (설정 시 base+LoRA 대신 로드, CPU 전용)
+MERGED_MODEL_PATH = os.environ.get("MERGED_MODEL_PATH")
+
+# CPU 데이터 병렬 평가 워커 수 (2 이상이면 워커별 모델 복제본을 코어 구간에 고정해 샤드 생성)
+EVAL_WORKERS = int(os.environ.get("EVAL_WORKERS", "1"))
+
+# 1이면 판단 캐시(judgement_cache.py) 사용: 같은 모델/설정으로 이미 생성한 프롬프트는 다시 생성하지 않는다
+JUDGE_CACHE = os.environ.get("JUDGE_CACHE", "0") == "1"
+
+# 1단계 청구항 구성요소 스크리닝 (명백한 낮음은 LLM 호출 없이 종료, screener.py)
+SCREEN = os.environ.get("SCREEN", "0") == "1"
+
 SEED_PATH = BASE_DIR / "data/raw/seeds/seed_cases.json"
 LABEL_PATH = BASE_DIR / "data/processed/train.jsonl"
 
-SYSTEM = (
-    "너는 특허 청구항과 사용자 제품 구성을 비교하여 구성요소별 대응 여부를 판단하고, "
-    "그 결과에 따라 특허 침해 리스크를 평가하는 모델이다. "
-    "최종 응답은 반드시 JSON 형식으로 출력한다."
-)
-
-def build_prompt(user_query: str, regit_num: str, claim_text: str) -> str:
-    return (
-        f"<system>\n{SYSTEM}\n</system>\n"
-        f"<user>\n"
-        f"[사용자 제품 설명]\n{user_query}\n\n"
-        f"[특허 정보]\n특허번호: {regit_num}\n청구항:\n{claim_text}\n\n"
-        f"구성요소별 대응 여부를 판단하고, 침해 리스크를 평가하라.\n"
-        f"</user>\n"
-        f"<assistant>\n"
-    )
 
 def load_jsonl(path):
     rows = []
@@ -51,37 +65,29 @@ def load_jsonl(path):
                 rows.append(json.loads(line))
     return rows
 
-def main():
-    token = os.environ.get("HF_TOKEN")
-
-    print("=" * 60)
-    print("모델 평가 스크립트")
-    print("=" * 60)
-
-    # 데이터 로드
-    with open(SEED_PATH, "r", encoding="utf-8") as f:
-        seeds = json.load(f)
-    labels = load_jsonl(LABEL_PATH)
-
-    print(f"데이터셋: {len(seeds)}개")
-
-    # 모델 로드
-    print(f"\n모델 로딩 중... ({MODEL_SIZE.upper()})")
-    tokenizer = AutoTokenizer.from_pretrained(ADAPTER_PATH)
-
-    # bfloat16으로 로드
-    model = AutoModelForCausalLM.from_pretrained(
-        BASE_MODEL,
-        token=token,
-        torch_dtype=torch.bfloat16,
-        device_map="auto",
-    )
-
-    model = PeftModel.from_pretrained(model, ADAPTER_PATH)
-    model.eval()
-    print("모델 로딩 완료\n")
-
-    # 평가 메트릭
+def extract_json(response: str) -> str:
+    """응답에서 JSON 문자열 추출 (마크다운 코드블럭, 앞뒤 텍스트 제거)"""
+    json_str = response
+
+    # ```json ... ``` 또는 ``` ... ``` 형태 처리
+    if "```json" in json_str:
+        json_str = json_str.split("```json")[-1].split("```")[0].strip()
+    elif "```" in json_str:
+        parts = json_str.split("```")
+        if len(parts) >= 2:
+            json_str = parts[1].strip()
+
+    # { } 사이의 JSON만 추출
+    json_match = re.search(r'\{[\s\S]*\}', json_str)
+    if json_match:
+        json_str = json_match.group()
+    return json_str
+
+def score_responses(seeds, labels, responses, raw_json=False):
+    """생성된 응답을 정답과 비교하여 메트릭/혼동 행렬/오류 케이스 계산
+
+    raw_json=True면 (제약 디코딩 결과) 응답을 추출 없이 그대로 파싱한다.
+    """
     results = {
         "total": len(seeds),
         "json_valid": 0,
@@ -95,50 +101,15 @@ def main():
 
     errors = []
 
-    print("평가 시작...")
-    print("-" * 60)
-
-    for i, (seed, label) in enumerate(zip(seeds, labels)):
+    for i, (seed, label, response) in enumerate(zip(seeds, labels, responses)):
         user_query = seed["user_query"]
-        claim_text = seed["claim_text"]
-        regit_num = seed["regit_num"]
-
-        prompt = build_prompt(user_query, regit_num, claim_text)
-        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
-
-        with torch.no_grad():
-            outputs = model.generate(
-                **inputs,
-                max_new_tokens=512,
-                do_sample=False,
-                pad_token_id=tokenizer.pad_token_id,
-            )
-
-        response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-        if "<assistant>" in response:
-            response = response.split("<assistant>")[-1].strip()
-        if "</assistant>" in response:
-            response = response.split("</assistant>")[0].strip()
-
-        # JSON 추출 (마크다운 코드블럭, 앞뒤 텍스트 제거)
-        json_str = response
-
-        # ```json ... ``` 또는 ``` ... ``` 형태 처리
-        if "```json" in json_str:
-            json_str = json_str.split("```json")[-1].split("```")[0].strip()
-        elif "```" in json_str:
-            parts = json_str.split("```")
-            if len(parts) >= 2:
-                json_str = parts[1].strip()
-
-        # { } 사이의 JSON만 추출
-        json_match = re.search(r'\{[\s\S]*\}', json_str)
-        if json_match:
-            json_str = json_match.group()
+        with span("json_extract", idx=i + 1):
+            json_str = response if raw_json else extract_json(response)
 
         # JSON 파싱
         try:
-            pred = json.loads(json_str)
+            with span("json_parse", idx=i + 1):
+                pred = json.loads(json_str)
             results["json_valid"] += 1
 
             # risk_level 평가
@@ -185,6 +156,115 @@ def main():
                 "response": response[:500]
             })
 
+    return results, risk_confusion, match_confusion, errors
+
+def main():
+    token = os.environ.get("HF_TOKEN")
+
+    print("=" * 60)
+    print("모델 평가 스크립트")
+    print("=" * 60)
+
+    # 데이터 로드
+    with open(SEED_PATH, "r", encoding="utf-8") as f:
+        seeds = json.load(f)
+    labels = load_jsonl(LABEL_PATH)
+
+    print(f"데이터셋: {len(seeds)}개")
+
+    # 스크리닝된 케이스는 스키마 형식 응답으로 채우고 나머지만 모델에 보낸다
+    screened = {}
+    if SCREEN:
+        for i, seed in enumerate(seeds):
+            result = screen(seed["user_query"], seed["claim_text"])
+            if result["decision"] is not None:
+                screened[i] = json.dumps(screened_verdict(seed["regit_num"], result), ensure_ascii=False)
+        print(f"1단계 스크리닝: {len(screened)}/{len(seeds)}개 낮음으로 종료 (LLM 호출 {len(screened) / len(seeds) * 100:.1f}% 절감)")
+    llm_idx = [i for i in range(len(seeds)) if i not in screened]
+    if PROFILE_TORCH_SAMPLES:
+        captured = ", ".join(f"{i} -> seed {llm_idx[i]}" for i in sorted(PROFILE_TORCH_SAMPLES) if i < len(llm_idx))
+        print(f"torch profiler 캡처 (스크리닝 후 프롬프트 인덱스 -> seed 인덱스): {captured or '없음'}")
+    all_seeds, seeds = seeds, [seeds[i] for i in llm_idx]
+
+    prompts = []
+    for seed in seeds:
+        with span("build_prompt"):
+            prompts.append(build_prompt(seed["user_query"], seed["regit_num"], seed["claim_text"]))
+    prefix_cache = None
+    parallel = None
+    judgement_cache = None
+
+    # prefix KV 캐시는 batch size 1 전용이라 generate_responses가 BATCH_SIZE를 무시한다. 실제 값을 기록
+    batch_size = 1 if PREFIX_CACHE > 0 and not JUDGE_SERVER_URL else BATCH_SIZE
+    if batch_size != BATCH_SIZE:
+        print(f"[WARN] PREFIX_CACHE 사용: BATCH_SIZE={BATCH_SIZE} 대신 batch_size=1로 생성")
+    if PREFIX_CACHE > 0 and not CLAIM_FIRST:
+        print("prefix 캐시: 기본 프롬프트 순서라 system 블록만 공유 (특허별 재사용은 CLAIM_FIRST=1)")
+
+    if JUDGE_SERVER_URL:
+        # 모델 서버 사용: 동시 요청을 서버가 마이크로 배치로 묶는다
+        print(f"\n모델 서버 사용: {JUDGE_SERVER_URL}\n")
+        print("평가 시작...")
+        print("-" * 60)
+        responses, batch_stats = remote_responses(JUDGE_SERVER_URL, seeds, concurrency=max(BATCH_SIZE, 8))
+    elif EVAL_WORKERS > 1:
+        # 워커 프로세스가 각자 모델을 로드하므로 메인 프로세스는 로드하지 않는다
+        if MERGED_MODEL_PATH:
+            spec = {"merged_path": MERGED_MODEL_PATH}
+        else:
+            spec = {"base_model": BASE_MODEL, "adapter_path": str(ADAPTER_PATH), "token": token}
+        print("\n평가 시작...")
+        print("-" * 60)
+        responses, batch_stats, parallel = parallel_responses(
+            prompts, EVAL_WORKERS, spec, batch_size=batch_size, prefix_cache=PREFIX_CACHE,
+            constrained=CONSTRAINED,
+        )
+    else:
+        # 모델 로드
+        if MERGED_MODEL_PATH:
+            print(f"\n병합+int8 모델 로딩 중... ({MERGED_MODEL_PATH})")
+            model, tokenizer = load_merged(MERGED_MODEL_PATH)
+        else:
+            print(f"\n모델 로딩 중... ({MODEL_SIZE.upper()})")
+            model, tokenizer = load_model(BASE_MODEL, ADAPTER_PATH, token=token)
+        print("모델 로딩 완료\n")
+
+        print("평가 시작...")
+        print("-" * 60)
+
+        prefix_cache = PrefixCache(model, tokenizer, max_entries=PREFIX_CACHE) if PREFIX_CACHE > 0 else None
+
+        # 생성 (BATCH_SIZE > 1이면 길이순 버킷 배치 생성)
+        if prefix_cache is not None:
+            print(f"prefix KV 캐시 사용: max_entries={PREFIX_CACHE}")
+        elif BATCH_SIZE > 1:
+            print(f"배치 생성: batch_size={BATCH_SIZE}")
+        if CONSTRAINED:
+            print("스키마 제약 디코딩 사용")
+        if JUDGE_CACHE:
+            fingerprint = model_fingerprint(
+                BASE_MODEL, None if MERGED_MODEL_PATH else ADAPTER_PATH, MERGED_MODEL_PATH,
+                MAX_NEW_TOKENS, CONSTRAINED,
+            )
+            judgement_cache = JudgementCache(fingerprint)
+            print(f"판단 캐시 사용: {judgement_cache.path} (fingerprint {fingerprint})")
+        responses, batch_stats = generate_responses(
+            model, tokenizer, prompts, batch_size=batch_size, prefix_cache=prefix_cache,
+            constrained=CONSTRAINED, judgement_cache=judgement_cache,
+        )
+    throughput = summarize_throughput(batch_stats)
+
+    seeds = all_seeds
+    merged = list(screened.get(i, "") for i in range(len(seeds)))
+    for i, response in zip(llm_idx, responses):
+        merged[i] = response
+    responses = merged
+
+    # 모델 서버 응답은 서버 설정에 따라 제약 디코딩 여부가 다르므로 항상 추출을 거친다
+    raw_json = CONSTRAINED and not JUDGE_SERVER_URL
+    with span("metrics"):
+        results, risk_confusion, match_confusion, errors = score_responses(seeds, labels, responses, raw_json=raw_json)
+
     # 결과 출력
     print("\n" + "=" * 60)
     print("평가 결과")
@@ -198,6 +278,19 @@ def main():
     print(f"  JSON 유효성:     {results['json_valid']:3d}/{results['total']} ({json_acc:.1f}%)")
     print(f"  risk_level 정확도: {results['risk_level_correct']:3d}/{results['total']} ({risk_acc:.1f}%)")
     print(f"  match 정확도:     {results['match_correct']:3d}/{results['match_total']} ({match_acc:.1f}%)")
+    print(f"  생성 처리량:       {throughput['generated_tokens']} tok / {throughput['seconds']:.1f}s ({throughput['tokens_per_sec']:.1f} tok/s, batch_size={batch_size})")
+    print(f"  요청당 생성 토큰:   {throughput['generated_tokens'] / results['total']:.1f} tok")
+    if SCREEN:
+        print(f"  1단계 스크리닝:    {len(screened)}/{results['total']}개 LLM 호출 생략")
+    if parallel is not None:
+        print(f"  병렬 처리량:       워커 {parallel['workers']}개, wall {parallel['wall_seconds']:.1f}s ({parallel['wall_tokens_per_sec']:.1f} tok/s)")
+    if prefix_cache is not None or (parallel and parallel["prefix_cache"]):
+        cache_stats = prefix_cache.stats() if prefix_cache is not None else parallel["prefix_cache"]
+        print(f"  prefix 캐시:      hit {cache_stats['hits']} / miss {cache_stats['misses']} (hit rate {cache_stats['hit_rate']*100:.1f}%)")
+    if judgement_cache is not None:
+        jc = judgement_cache.stats()
+        print(f"  판단 캐시:        hit {jc['hits']} / miss {jc['misses']} (hit rate {jc['hit_rate']*100:.1f}%), "
+              f"생성 {jc['saved_seconds']:.1f}s 절약, {jc['bytes'] / 1024:.1f} KB 사용")
 
     # risk_level 혼동 행렬
     print(f"\n[risk_level 혼동 행렬] (행: 예측, 열: 정답)")
@@ -235,6 +328,7 @@ def main():
     eval_data = {
         "model": MODEL_SIZE.upper(),
         "base_model": BASE_MODEL,
+        "merged_model": MERGED_MODEL_PATH,
         "metrics": {
             "json_validity": json_acc,
             "risk_level_accuracy": risk_acc,
@@ -245,8 +339,35 @@ def main():
         "confusion_matrix": {
             "risk_level": {k: dict(v) for k, v in risk_confusion.items()},
             "match": {k: dict(v) for k, v in match_confusion.items()},
-        }
+        },
+        "throughput": {
+            "batch_size": batch_size,
+            "requested_batch_size": BATCH_SIZE,
+            "claim_first": CLAIM_FIRST,
+            "constrained": CONSTRAINED,
+            **throughput,
+            "batches": batch_stats,
+        },
     }
+    if SCREEN:
+        eval_data["screen"] = {
+            "screened": len(screened),
+            "llm_calls_avoided": len(screened) / len(seeds),
+            "screened_idx": [i + 1 for i in sorted(screened)],
+        }
+    if prefix_cache is not None:
+        eval_data["prefix_cache"] = prefix_cache.stats()
+    if judgement_cache is not None:
+        eval_data["judgement_cache"] = judgement_cache.stats()
+    if parallel is not None:
+        eval_data["parallel"] = {k: v for k, v in parallel.items() if k != "prefix_cache"}
+        if parallel["prefix_cache"]:
+            eval_data["prefix_cache"] = parallel["prefix_cache"]
+
+    # PROFILE=1: 단계별 span 파일 + 요약표 (병렬 평가 워커 프로세스의 span은 포함되지 않음)
+    profile = finish_profile()
+    if profile is not None:
+        eval_data["profile"] = profile
     with open(result_path, "w", encoding="utf-8") as f:
         json.dump(eval_data, f, ensure_ascii=False, indent=2)
     print(f"\n결과 저장: {result_path}")
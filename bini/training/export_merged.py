@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import torch
+from dotenv import load_dotenv
+from transformers import AutoTokenizer, AutoModelForCausalLM
+from peft import PeftModel
+from pathlib import Path
+
+from evaluate import load_jsonl, score_responses
+from generation import (
+    MERGED_WEIGHTS_NAME,
+    generate_responses,
+    load_merged,
+    quantize_for_cpu,
+    summarize_throughput,
+)
+from prompt_format import build_prompt
+
+load_dotenv()
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# 모델 선택 (환경변수 또는 기본값)
+MODEL_SIZE = os.environ.get("MODEL_SIZE", "4b")  # "1b" or "4b"
+
+if MODEL_SIZE == "1b":
+    ADAPTER_PATH = BASE_DIR / "outputs/gemma3-1b-it-lora"
+    BASE_MODEL = "google/gemma-3-1b-it"
+else:
+    ADAPTER_PATH = BASE_DIR / "outputs/gemma3-4b-it-lora"
+    BASE_MODEL = "google/gemma-3-4b-it"
+
+MERGED_PATH = Path(os.environ.get(
+    "MERGED_MODEL_PATH", BASE_DIR / f"outputs/gemma3-{MODEL_SIZE}-it-merged-int8"
+))
+
+SEED_PATH = BASE_DIR / "data/raw/seeds/seed_cases.json"
+LABEL_PATH = BASE_DIR / "data/processed/train.jsonl"
+
+# 비교 평가에 사용할 seed 개수 (0이면 전체)
+EVAL_SAMPLES = int(os.environ.get("EVAL_SAMPLES", "0"))
+
+# CPU 스레드 수 (0이면 torch 기본값)
+NUM_THREADS = int(os.environ.get("NUM_THREADS", "0"))
+
+
+def export(token):
+    """LoRA 어댑터를 베이스에 병합하고 int8 dynamic quantization 후 저장"""
+    print(f"베이스 모델 로딩 (fp32, CPU): {BASE_MODEL}")
+    model = AutoModelForCausalLM.from_pretrained(
+        BASE_MODEL,
+        token=token,
+        torch_dtype=torch.float32,
+    )
+    model = PeftModel.from_pretrained(model, ADAPTER_PATH)
+
+    print("LoRA 병합 중...")
+    model = model.merge_and_unload()
+    model.eval()
+
+    print("int8 dynamic quantization 중...")
+    model = quantize_for_cpu(model)
+
+    MERGED_PATH.mkdir(parents=True, exist_ok=True)
+    model.config.save_pretrained(MERGED_PATH)
+    torch.save(model.state_dict(), MERGED_PATH / MERGED_WEIGHTS_NAME)
+    AutoTokenizer.from_pretrained(ADAPTER_PATH).save_pretrained(MERGED_PATH)
+    print(f"저장 완료: {MERGED_PATH}")
+
+
+def run_eval(model, tokenizer, seeds, labels):
+    """seed 셋 생성 + 채점. (risk_level 정확도, 요청당 평균 지연, 처리량) 반환"""
+    prompts = [build_prompt(s["user_query"], s["regit_num"], s["claim_text"]) for s in seeds]
+    responses, batch_stats = generate_responses(model, tokenizer, prompts, batch_size=1)
+    results, _, _, _ = score_responses(seeds, labels, responses)
+    throughput = summarize_throughput(batch_stats)
+    return {
+        "risk_level_accuracy": results["risk_level_correct"] / results["total"] * 100,
+        "json_validity": results["json_valid"] / results["total"] * 100,
+        "latency_per_request": throughput["seconds"] / len(seeds),
+        "tokens_per_sec": throughput["tokens_per_sec"],
+    }
+
+
+def main():
+    token = os.environ.get("HF_TOKEN")
+
+    if NUM_THREADS > 0:
+        torch.set_num_threads(NUM_THREADS)
+
+    print("=" * 60)
+    print(f"LoRA 병합 + int8 export ({MODEL_SIZE.upper()})")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    export(token)
+    export_sec = time.perf_counter() - start
+
+    with open(SEED_PATH, "r", encoding="utf-8") as f:
+        seeds = json.load(f)
+    labels = load_jsonl(LABEL_PATH)
+    if EVAL_SAMPLES > 0:
+        seeds, labels = seeds[:EVAL_SAMPLES], labels[:EVAL_SAMPLES]
+
+    # ===== 1. 병합 전 (base bf16 + LoRA) =====
+    print("\n" + "-" * 60)
+    print("[1] 병합 전: bf16 base + LoRA (CPU)")
+    print("-" * 60)
+    start = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(ADAPTER_PATH)
+    model = AutoModelForCausalLM.from_pretrained(BASE_MODEL, token=token, torch_dtype=torch.bfloat16)
+    model = PeftModel.from_pretrained(model, ADAPTER_PATH)
+    model.eval()
+    unmerged_load = time.perf_counter() - start
+    unmerged = run_eval(model, tokenizer, seeds, labels)
+    unmerged["load_seconds"] = unmerged_load
+    del model
+
+    # ===== 2. 병합 + int8 =====
+    print("\n" + "-" * 60)
+    print("[2] 병합 + int8 dynamic quantization (CPU)")
+    print("-" * 60)
+    start = time.perf_counter()
+    model, tokenizer = load_merged(MERGED_PATH)
+    merged_load = time.perf_counter() - start
+    merged = run_eval(model, tokenizer, seeds, labels)
+    merged["load_seconds"] = merged_load
+
+    # ===== 결과 비교 =====
+    speedup = unmerged["latency_per_request"] / merged["latency_per_request"] if merged["latency_per_request"] > 0 else 0.0
+    acc_delta = merged["risk_level_accuracy"] - unmerged["risk_level_accuracy"]
+
+    print("\n" + "=" * 60)
+    print("비교 결과")
+    print("=" * 60)
+    print(f"{'메트릭':<22} | {'병합 전':^12} | {'병합+int8':^12}")
+    print("-" * 52)
+    print(f"{'로드 시간 (s)':<22} | {unmerged['load_seconds']:>12.1f} | {merged['load_seconds']:>12.1f}")
+    print(f"{'요청당 지연 (s)':<22} | {unmerged['latency_per_request']:>12.2f} | {merged['latency_per_request']:>12.2f}")
+    print(f"{'처리량 (tok/s)':<22} | {unmerged['tokens_per_sec']:>12.1f} | {merged['tokens_per_sec']:>12.1f}")
+    print(f"{'risk_level 정확도 (%)':<22} | {unmerged['risk_level_accuracy']:>12.1f} | {merged['risk_level_accuracy']:>12.1f}")
+    print(f"{'JSON 유효성 (%)':<22} | {unmerged['json_validity']:>12.1f} | {merged['json_validity']:>12.1f}")
+    print(f"\n속도 향상: x{speedup:.2f} | risk_level 정확도 변화: {acc_delta:+.1f}%p")
+
+    report_path = MERGED_PATH / "export_report.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "model": MODEL_SIZE.upper(),
+            "base_model": BASE_MODEL,
+            "adapter": str(ADAPTER_PATH),
+            "samples": len(seeds),
+            "export_seconds": export_sec,
+            "unmerged_bf16": unmerged,
+            "merged_int8": merged,
+            "speedup": speedup,
+            "risk_level_accuracy_delta": acc_delta,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\n결과 저장: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import time
+from pathlib import Path
+
+import torch
+from transformers import (
+    AutoConfig,
+    AutoTokenizer,
+    AutoModelForCausalLM,
+    LogitsProcessorList,
+    StoppingCriteriaList,
+)
+from peft import PeftModel
+
+from constrained import JsonCloseStoppingCriteria, SchemaConstraint, SchemaLogitsProcessor
+from profiling import span, torch_profile
+
+MAX_NEW_TOKENS = 512
+
+# export_merged.py가 저장하는 int8 state_dict 파일명
+MERGED_WEIGHTS_NAME = "quantized_state_dict.pt"
+
+
+def load_model(base_model, adapter_path, token=None):
+    """베이스 모델(bf16) + LoRA 어댑터 로드. (model, tokenizer) 반환"""
+    tokenizer = AutoTokenizer.from_pretrained(adapter_path)
+    model = AutoModelForCausalLM.from_pretrained(
+        base_model,
+        token=token,
+        torch_dtype=torch.bfloat16,
+        device_map="auto",
+    )
+    model = PeftModel.from_pretrained(model, adapter_path)
+    model.eval()
+    return model, tokenizer
+
+
+def quantize_for_cpu(model):
+    """nn.Linear 가중치를 int8 dynamic quantization (CPU 추론 전용)"""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_merged(merged_path):
+    """export_merged.py로 만든 병합+int8 체크포인트 로드. (model, tokenizer) 반환
+
+    dynamic quantized 모듈은 save_pretrained를 지원하지 않으므로
+    config로 fp32 모델 골격을 만들고 같은 방식으로 양자화한 뒤 state_dict를 채운다.
+    """
+    merged_path = Path(merged_path)
+    tokenizer = AutoTokenizer.from_pretrained(merged_path)
+    config = AutoConfig.from_pretrained(merged_path)
+    model = AutoModelForCausalLM.from_config(config, torch_dtype=torch.float32)
+    model = quantize_for_cpu(model)
+    # packed int8 파라미터는 weights_only 로드가 불가하므로 로컬 산출물만 로드한다
+    state_dict = torch.load(merged_path / MERGED_WEIGHTS_NAME, map_location="cpu", weights_only=False)
+    model.load_state_dict(state_dict)
+    model.eval()
+    return model, tokenizer
+
+
+def extract_response(decoded: str) -> str:
+    """디코딩된 전체 텍스트에서 assistant 응답 부분만 추출"""
+    response = decoded
+    if "<assistant>" in response:
+        response = response.split("<assistant>")[-1].strip()
+    if "</assistant>" in response:
+        response = response.split("</assistant>")[0].strip()
+    return response
+
+
+def length_sorted_batches(lengths, batch_size):
+    """프롬프트 길이순으로 정렬한 뒤 batch_size 단위로 묶은 인덱스 리스트 반환
+
+    짧은 user_query 행이 긴 청구항 행 길이까지 패딩되지 않도록 비슷한 길이끼리 묶는다.
+    """
+    if batch_size <= 1:
+        return [[i] for i in range(len(lengths))]
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def constraint_kwargs(tokenizer, prompt_len, constrained):
+    """스키마 제약 디코딩용 generate 인자 (constrained=False면 빈 dict)"""
+    if not constrained:
+        return None, {}
+    constraint = SchemaConstraint(tokenizer, prompt_len)
+    return constraint, {
+        "logits_processor": LogitsProcessorList([SchemaLogitsProcessor(constraint)]),
+        "stopping_criteria": StoppingCriteriaList([JsonCloseStoppingCriteria(constraint)]),
+    }
+
+
+def _decode_outputs(tokenizer, outputs, constraint):
+    responses = []
+    with span("decode", rows=len(outputs)):
+        for row, seq in enumerate(outputs):
+            json_text = constraint.json_text(row) if constraint is not None else None
+            if json_text is not None:
+                # 제약 디코딩: top-level object가 닫힌 지점까지가 응답 (후처리 불필요)
+                responses.append(json_text)
+            else:
+                responses.append(extract_response(tokenizer.decode(seq, skip_special_tokens=True)))
+    return responses
+
+
+def generate_batch(model, tokenizer, prompts, max_new_tokens=MAX_NEW_TOKENS, prefix_cache=None,
+                   constrained=False, adapter_names=None, assist_kwargs=None):
+    """프롬프트 배치를 left padding으로 한 번에 생성. (응답 리스트, 생성 토큰 수) 반환
+
+    prefix_cache가 주어지면 (batch size 1) 공유 prefix의 KV를 재사용한다.
+    constrained=True면 output_schema.json 기반 제약 디코딩 + JSON 종료 시 조기 중단.
+    adapter_names가 주어지면 (PeftModel) 행마다 다른 LoRA 어댑터로 한 배치에서 생성한다.
+    assist_kwargs는 speculative.assist_kwargs 결과 (draft 모델 assisted generation, batch size 1)
+    """
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    if prefix_cache is not None and len(prompts) == 1:
+        with span("tokenize", rows=1):
+            prompt_len = len(tokenizer(prompts[0])["input_ids"])
+        constraint, extra = constraint_kwargs(tokenizer, prompt_len, constrained)
+        with span("generate", rows=1, prefix_cache=True) as s:
+            outputs = prefix_cache.generate(prompts[0], max_new_tokens, **extra)
+            generated = int((outputs[:, prompt_len:] != tokenizer.pad_token_id).sum())
+            s.set(generated_tokens=generated)
+        return _decode_outputs(tokenizer, outputs, constraint), generated
+
+    return generate_encoded(model, tokenizer, encode_prompts(tokenizer, prompts),
+                            max_new_tokens=max_new_tokens, constrained=constrained,
+                            adapter_names=adapter_names, assist_kwargs=assist_kwargs)
+
+
+def encode_prompts(tokenizer, prompts):
+    """프롬프트 배치를 generate 입력으로 토크나이즈 (CPU 텐서)"""
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    with span("tokenize", rows=len(prompts)):
+        if len(prompts) == 1:
+            # 배치 크기 1은 기존 직렬 경로와 동일한 입력 (패딩 없음)
+            return tokenizer(prompts[0], return_tensors="pt")
+        # generate는 마지막 토큰 뒤에 이어 쓰므로 패딩은 왼쪽에 둔다
+        padding_side = tokenizer.padding_side
+        tokenizer.padding_side = "left"
+        try:
+            return tokenizer(prompts, return_tensors="pt", padding=True)
+        finally:
+            tokenizer.padding_side = padding_side
+
+
+def generate_encoded(model, tokenizer, inputs, max_new_tokens=MAX_NEW_TOKENS, constrained=False,
+                     adapter_names=None, assist_kwargs=None, streamer=None):
+    """encode_prompts 결과로 생성. (응답 리스트, 생성 토큰 수) 반환
+
+    streamer는 generate에 그대로 전달 (benchmark.py의 첫 토큰 시각 측정 등)
+    """
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    inputs = inputs.to(model.device)
+    prompt_len = inputs["input_ids"].shape[1]
+    constraint, extra = constraint_kwargs(tokenizer, prompt_len, constrained)
+    if adapter_names is not None:
+        extra["adapter_names"] = adapter_names
+    if assist_kwargs:
+        extra.update(assist_kwargs)
+    if streamer is not None:
+        extra["streamer"] = streamer
+
+    with span("generate", rows=inputs["input_ids"].shape[0], prompt_tokens=prompt_len) as s, torch.no_grad():
+        outputs = model.generate(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            pad_token_id=tokenizer.pad_token_id,
+            **extra,
+        )
+        generated = int((outputs[:, prompt_len:] != tokenizer.pad_token_id).sum())
+        s.set(generated_tokens=generated)
+
+    return _decode_outputs(tokenizer, outputs, constraint), generated
+
+
+def generate_responses(model, tokenizer, prompts, batch_size=1, max_new_tokens=MAX_NEW_TOKENS,
+                       prefix_cache=None, constrained=False, judgement_cache=None):
+    """전체 프롬프트를 길이 버킷 배치로 생성. (원래 순서의 응답 리스트, 배치별 처리량) 반환
+
+    judgement_cache(JudgementCache)가 주어지면 캐시에 있는 프롬프트는 생성하지 않고,
+    새로 생성한 응답은 배치 시간을 행 수로 나눈 생성 시간과 함께 저장한다.
+    """
+    if prefix_cache is not None:
+        batch_size = 1
+    responses = [None] * len(prompts)
+    batch_stats = []
+
+    todo = list(range(len(prompts)))
+    if judgement_cache is not None:
+        cached, todo = judgement_cache.lookup(prompts)
+        for i, response in cached.items():
+            responses[i] = response
+        if cached:
+            print(f"  판단 캐시 hit {len(cached)}/{len(prompts)}")
+
+    # 길이순 정렬용 토큰 수 (생성 배치의 "tokenize" span과 따로 집계)
+    with span("tokenize_lengths", rows=len(todo)):
+        lengths = [len(tokenizer(prompts[i])["input_ids"]) for i in todo]
+    batches = [[todo[j] for j in idxs] for idxs in length_sorted_batches(lengths, batch_size)]
+    lengths = dict(zip(todo, lengths))
+
+    for b, idxs in enumerate(batches, 1):
+        start = time.perf_counter()
+        # PROFILE_TORCH_SAMPLES에 든 프롬프트 인덱스가 있는 배치만 torch profiler로 캡처
+        with torch_profile(idxs):
+            outs, generated = generate_batch(
+                model, tokenizer, [prompts[i] for i in idxs],
+                max_new_tokens=max_new_tokens, prefix_cache=prefix_cache, constrained=constrained,
+            )
+        elapsed = time.perf_counter() - start
+
+        for i, response in zip(idxs, outs):
+            responses[i] = response
+            if judgement_cache is not None:
+                judgement_cache.put(prompts[i], response, elapsed / len(idxs))
+
+        tokens_per_sec = generated / elapsed if elapsed > 0 else 0.0
+        batch_stats.append({
+            "batch": b,
+            "size": len(idxs),
+            "max_prompt_tokens": max(lengths[i] for i in idxs),
+            "generated_tokens": generated,
+            "seconds": round(elapsed, 3),
+            "tokens_per_sec": round(tokens_per_sec, 2),
+        })
+        print(f"  [batch {b:3d}/{len(batches)}] size={len(idxs):2d} | "
+              f"{generated:5d} tok / {elapsed:6.1f}s = {tokens_per_sec:6.1f} tok/s")
+
+    return responses, batch_stats
+
+
+def summarize_throughput(batch_stats):
+    """배치별 처리량을 합산한 전체 처리량"""
+    total_tokens = sum(s["generated_tokens"] for s in batch_stats)
+    total_seconds = sum(s["seconds"] for s in batch_stats)
+    return {
+        "generated_tokens": total_tokens,
+        "seconds": round(total_seconds, 3),
+        "tokens_per_sec": round(total_tokens / total_seconds, 2) if total_seconds > 0 else 0.0,
+    }
@@ -1,48 +1,61 @@
 import os
 import json
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from peft import PeftModel
 from pathlib import Path
 
+from generation import generate_batch, load_merged, load_model
+from judge_client import judge
+from prefix_cache import PrefixCache
+from profiling import finish as finish_profile
+from prompt_format import build_prompt
+from speculative import TARGET_ADAPTER_PATH, TARGET_BASE_MODEL, assist_kwargs, load_draft
+from streaming import stream_verdict
+
 BASE_DIR = Path(__file__).resolve().parents[1]
 ADAPTER_PATH = BASE_DIR / "outputs/gemma3-1b-it-lora"
 BASE_MODEL = "google/gemma-3-1b-it"
 
-SYSTEM = (
-    "너는 특허 청구항과 사용자 제품 구성을 비교하여 구성요소별 대응 여부를 판단하고, "
-    "그 결과에 따라 특허 침해 리스크를 평가하는 모델이다. "
-    "최종 응답은 반드시 JSON 형식으로 출력한다."
-)
-
-def build_prompt(user_query: str, regit_num: str, claim_text: str) -> str:
-    return (
-        f"<system>\n{SYSTEM}\n</system>\n"
-        f"<user>\n"
-        f"[사용자 제품 설명]\n{user_query}\n\n"
-        f"[특허 정보]\n특허번호: {regit_num}\n청구항:\n{claim_text}\n\n"
-        f"구성요소별 대응 여부를 판단하고, 침해 리스크를 평가하라.\n"
-        f"</user>\n"
-        f"<assistant>\n"
-    )
+# 공유 prompt prefix KV 캐시 최대 개수 (0이면 사용 안 함)
+PREFIX_CACHE = int(os.environ.get("PREFIX_CACHE", "0"))
 
-def main():
-    token = os.environ.get("HF_TOKEN")
+# output_schema.json 기반 제약 디코딩
+CONSTRAINED = os.environ.get("CONSTRAINED", "0") == "1"
+
+# 스트리밍 모드: comparisons -> risk_level -> decision_reason 순서로 완성되는 즉시 출력 (로컬 모델 전용)
+STREAM = os.environ.get("STREAM", "0") == "1"
+
+# 모델 서버 주소 (설정 시 로컬 모델을 로드하지 않고 serve.py 서버에 요청)
+JUDGE_SERVER_URL = os.environ.get("JUDGE_SERVER_URL")
+
+# speculative decoding: Fine-tuned 4B를 1B draft가 제안한 토큰으로 검증하며 생성 (greedy 결과 동일)
+SPECULATIVE = os.environ.get("SPECULATIVE", "0") == "1"
+
+# export_merged.py로 만든 병합+int8 체크포인트 경로 (설정 시 base+LoRA 대신 로드, CPU 전용)
+MERGED_MODEL_PATH = os.environ.get("MERGED_MODEL_PATH")
 
-    print("Loading tokenizer...")
-    tokenizer = AutoTokenizer.from_pretrained(ADAPTER_PATH)
 
-    print("Loading base model...")
-    model = AutoModelForCausalLM.from_pretrained(
-        BASE_MODEL,
-        token=token,
-        torch_dtype=torch.bfloat16,
-        device_map="auto",
-    )
+def main():
+    token = os.environ.get("HF_TOKEN")
 
-    print("Loading LoRA adapter...")
-    model = PeftModel.from_pretrained(model, ADAPTER_PATH)
-    model.eval()
+    model = tokenizer = prefix_cache = assist = None
+    if JUDGE_SERVER_URL:
+        print(f"Using judge server: {JUDGE_SERVER_URL}")
+    elif SPECULATIVE:
+        print(f"Loading target model (4B + LoRA): {TARGET_BASE_MODEL}")
+        model, tokenizer = load_model(TARGET_BASE_MODEL, TARGET_ADAPTER_PATH, token=token)
+
+        print("Loading draft model (1B + LoRA)...")
+        draft, draft_tokenizer = load_draft(token)
+        assist = assist_kwargs(model, draft, tokenizer, draft_tokenizer)
+    elif MERGED_MODEL_PATH:
+        print(f"Loading merged int8 model: {MERGED_MODEL_PATH}")
+        model, tokenizer = load_merged(MERGED_MODEL_PATH)
+    else:
+        print(f"Loading model (1B + LoRA): {BASE_MODEL}")
+        model, tokenizer = load_model(BASE_MODEL, ADAPTER_PATH, token=token)
+
+    # assisted generation은 prefix KV 캐시 경로를 쓰지 않는다
+    if model is not None and PREFIX_CACHE > 0 and assist is None:
+        prefix_cache = PrefixCache(model, tokenizer, max_entries=PREFIX_CACHE)
 
     # 테스트 케이스
     test_cases = [
@@ -68,25 +81,36 @@ def main():
     print("="*60)
 
     for i, case in enumerate(test_cases, 1):
-        prompt = build_prompt(case["user_query"], regit_num, claim_text)
-
-        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
-
-        with torch.no_grad():
-            outputs = model.generate(
-                **inputs,
-                max_new_tokens=512,
-                do_sample=False,
-                pad_token_id=tokenizer.pad_token_id,
+        if STREAM and model is not None:
+            prompt = build_prompt(case["user_query"], regit_num, claim_text)
+            print(f"\n[테스트 {i}] (스트리밍)")
+            print(f"입력: {case['user_query']}")
+            print(f"예상: {case['expected']}")
+            for event in stream_verdict(model, tokenizer, prompt):
+                if event["type"] == "comparison":
+                    c = event["data"]
+                    print(f"  [{event['elapsed']:6.2f}s] 구성요소 {event['index'] + 1}: "
+                          f"{c.get('patent_element')} ↔ {c.get('user_product_element')} ({c.get('match')})")
+                elif event["type"] == "risk_level":
+                    print(f"  [{event['elapsed']:6.2f}s] risk_level: {event['value']}")
+                    print("  판단 근거: ", end="", flush=True)
+                elif event["type"] == "decision_reason_delta":
+                    print(event["text"], end="", flush=True)
+                elif event["type"] == "done":
+                    print(f"\n  완료 {event['elapsed']:.2f}s (risk_level까지 {event['time_to_risk_level']}s)")
+            continue
+
+        if JUDGE_SERVER_URL:
+            response = judge(JUDGE_SERVER_URL, case["user_query"], regit_num, claim_text)["response"]
+        else:
+            prompt = build_prompt(case["user_query"], regit_num, claim_text)
+
+            # assistant 태그 이후 부분만 추출된 응답
+            [response], _ = generate_batch(
+                model, tokenizer, [prompt], prefix_cache=prefix_cache, constrained=CONSTRAINED,
+                assist_kwargs=assist,
             )
 
-        response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-        # assistant 태그 이후 부분만 추출
-        if "<assistant>" in response:
-            response = response.split("<assistant>")[-1].strip()
-        if "</assistant>" in response:
-            response = response.split("</assistant>")[0].strip()
-
         print(f"\n[테스트 {i}]")
         print(f"입력: {case['user_query']}")
         print(f"예상: {case['expected']}")
@@ -99,6 +123,12 @@ def main():
         except:
             print("✗ JSON 파싱 실패")
 
+    if prefix_cache is not None:
+        print(f"\nprefix 캐시: {prefix_cache.stats()}")
+
+    # PROFILE=1: 단계별 span 파일 + 요약표
+    finish_profile(service_name="bini-inference")
+
     print("\n" + "="*60)
     print("테스트 완료")
     print("="*60)
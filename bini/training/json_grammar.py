@@ -0,0 +1,279 @@
+import json
+from pathlib import Path
+
+# 생성 텍스트를 따라가는 JSON 스캐너와 output_schema.json 바이트 오토마톤 (torch 없이 쓰는 부분, 마스킹은 constrained.py)
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+SCHEMA_PATH = BASE_DIR / "data/schema/output_schema.json"
+
+
+def load_schema(path=SCHEMA_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class JsonCursor:
+    """생성 중인 JSON 텍스트를 한 글자씩 따라가는 증분 스캐너
+
+    현재 문자열이 key인지 값인지, 값이라면 어느 key의 값인지, top-level object가 닫혔는지를 추적한다.
+    닫힌 문자열 값과 컨테이너는 events에 (종류, ...) 튜플로 쌓인다.
+    """
+
+    def __init__(self):
+        self.pos = 0
+        self.stack = []            # [(괄호, 부모 key, 시작 위치)]
+        self.in_string = False
+        self.escape = False
+        self.string_is_key = False
+        self.buffer = ""           # 현재 열려 있는 문자열의 raw 내용
+        self.last_key = None       # 현재 object에서 마지막으로 닫힌 key
+        self.expect_value = False  # object에서 ':' 다음 값 대기 중
+        self.value_key = None      # 현재 값 문자열이 속한 key
+        self.start = None          # top-level '{' 위치
+        self.end = None            # top-level '}' 다음 위치
+        self.events = []
+
+    def clone(self):
+        other = JsonCursor.__new__(JsonCursor)
+        other.__dict__.update(self.__dict__)
+        other.stack = list(self.stack)
+        other.events = []
+        return other
+
+    @property
+    def closed(self):
+        return self.end is not None
+
+    def _parent_key(self):
+        if not self.stack:
+            return None
+        kind, key, _ = self.stack[-1]
+        if kind == "{":
+            return self.last_key if self.expect_value else None
+        return key  # 배열 원소는 배열의 key를 따른다
+
+    def feed(self, text):
+        for ch in text:
+            self._feed_char(ch)
+
+    def _feed_char(self, ch):
+        if self.end is not None:
+            self.pos += 1
+            return
+
+        if self.in_string:
+            if self.escape:
+                self.buffer += ch
+                self.escape = False
+            elif ch == "\\":
+                self.buffer += ch
+                self.escape = True
+            elif ch == '"':
+                self.in_string = False
+                value = _decode_json_string(self.buffer)
+                if self.string_is_key:
+                    self.last_key = value
+                else:
+                    self.events.append(("string", self.value_key, value))
+                    self.expect_value = False
+            else:
+                self.buffer += ch
+
+        elif self.start is None:
+            # top-level object 이전 텍스트는 무시
+            if ch == "{":
+                self.start = self.pos
+                self.stack.append(("{", None, self.pos))
+                self.expect_value = False
+
+        elif ch == '"':
+            self.in_string = True
+            self.escape = False
+            self.buffer = ""
+            top_is_object = self.stack[-1][0] == "{"
+            self.string_is_key = top_is_object and not self.expect_value
+            self.value_key = None if self.string_is_key else self._parent_key()
+
+        elif ch in "{[":
+            self.stack.append((ch, self._parent_key(), self.pos))
+            self.expect_value = False
+            self.last_key = None
+
+        elif ch in "}]":
+            kind, key, start = self.stack.pop()
+            self.events.append(("close", kind, key, start, self.pos + 1))
+            self.last_key = key
+            self.expect_value = False
+            if not self.stack:
+                self.end = self.pos + 1
+
+        elif ch == ":":
+            self.expect_value = True
+
+        elif ch == ",":
+            self.expect_value = False
+
+        self.pos += 1
+
+
+def _decode_json_string(raw):
+    try:
+        return json.loads('"' + raw + '"')
+    except json.JSONDecodeError:
+        return raw
+
+
+# UTF-8 선두 바이트 -> (연속 바이트 수, 첫 연속 바이트 하한, 상한). overlong/서로게이트/U+10FFFF 초과 제외
+_UTF8_LEAD = {
+    **{b: (1, 0x80, 0xBF) for b in range(0xC2, 0xE0)},
+    0xE0: (2, 0xA0, 0xBF),
+    **{b: (2, 0x80, 0xBF) for b in range(0xE1, 0xF0) if b != 0xED},
+    0xED: (2, 0x80, 0x9F),
+    0xF0: (3, 0x90, 0xBF),
+    **{b: (3, 0x80, 0xBF) for b in range(0xF1, 0xF4)},
+    0xF4: (3, 0x80, 0x8F),
+}
+
+
+class SchemaGrammar:
+    """output_schema.json을 json.dumps(ensure_ascii=False) 출력 형식의 바이트 단위 오토마톤으로 컴파일
+
+    학습 completion(build_sft_jsonl.build_text)과 같은 형식만 허용한다.
+    - object: properties 순서대로 모든 key, 구분자는 ", " / ": "
+    - array: "[" 다음 "]" 또는 원소, 원소 뒤 ", " + 원소 또는 "]"
+    - string: 이스케이프와 UTF-8 멀티바이트 시퀀스까지 검사, enum은 허용값만
+    - null / boolean, ["string", "null"] 같은 타입 합집합 (첫 바이트로 구분 가능해야 함)
+    상태는 남은 작업의 튜플(스택)이라 해시 가능하고, 스키마가 고정이면 상태 수도 유한하다.
+    """
+
+    def __init__(self, schema):
+        self.nodes = []
+        self.first = []
+        self.root = self._compile(schema)
+        self.start = (("node", self.root),)
+
+    # ----- 컴파일 -----
+    def _add(self, node, first):
+        self.nodes.append(node)
+        self.first.append(frozenset(first))
+        return len(self.nodes) - 1
+
+    def _compile(self, schema):
+        types = schema.get("type")
+        if isinstance(types, list):
+            alts = [self._compile({**schema, "type": t}) for t in types]
+            first = set()
+            for a in alts:
+                if first & self.first[a]:
+                    raise ValueError(f"첫 바이트로 구분할 수 없는 타입 합집합: {types}")
+                first |= self.first[a]
+            return self._add(("union", tuple(alts)), first)
+        if "enum" in schema:
+            values = tuple(json.dumps(v, ensure_ascii=False).encode("utf-8") for v in schema["enum"])
+            return self._add(("alts", values), {v[0] for v in values})
+        if types == "object":
+            fields = tuple(
+                (json.dumps(k, ensure_ascii=False).encode("utf-8"), self._compile(prop))
+                for k, prop in schema.get("properties", {}).items()
+            )
+            return self._add(("obj", fields), {ord("{")})
+        if types == "array":
+            return self._add(("arr", self._compile(schema.get("items", {"type": "string"}))), {ord("[")})
+        if types == "string":
+            return self._add(("str",), {ord('"')})
+        if types == "null":
+            return self._add(("lit", b"null"), {ord("n")})
+        if types == "boolean":
+            return self._add(("alts", (b"true", b"false")), {ord("t"), ord("f")})
+        raise ValueError(f"제약 디코딩이 지원하지 않는 스키마 타입: {types}")
+
+    def _expand(self, node):
+        """값 노드를 스택에 쌓을 작업들로 펼친다 (마지막 원소가 먼저 처리됨)"""
+        kind = node[0]
+        if kind == "obj":
+            tasks, lit = [], b"{"
+            for i, (key, value) in enumerate(node[1]):
+                lit += (b", " if i else b"") + key + b": "
+                tasks += [("lit", lit), ("node", value)]
+                lit = b""
+            tasks.append(("lit", lit + b"}"))
+            return tuple(reversed(tasks))
+        if kind == "arr":
+            return (("arr", node[1]), ("lit", b"["))
+        if kind == "str":
+            return (("str", 0), ("lit", b'"'))
+        return (node,)  # alts / lit
+
+    # ----- 진행 -----
+    def step(self, stack, b):
+        """상태에서 바이트 b 하나를 소비한 다음 상태. 허용되지 않으면 None (빈 튜플은 top-level 종료)"""
+        while stack:
+            top = stack[-1]
+            kind = top[0]
+            if kind == "node":
+                node = self.nodes[top[1]]
+                if node[0] == "union":
+                    alt = next((a for a in node[1] if b in self.first[a]), None)
+                    if alt is None:
+                        return None
+                    stack = stack[:-1] + (("node", alt),)
+                else:
+                    stack = stack[:-1] + self._expand(node)
+                continue
+            if kind == "lit":
+                lit = top[1]
+                if lit[0] != b:
+                    return None
+                return stack[:-1] + ((("lit", lit[1:]),) if len(lit) > 1 else ())
+            if kind == "alts":
+                rest = tuple(v[1:] for v in top[1] if v[0] == b)
+                if not rest:
+                    return None
+                # enum 값은 따옴표까지 포함하므로 서로의 접두사가 아니다
+                return stack[:-1] + ((("alts", rest),) if rest[0] else ())
+            if kind == "str":
+                return self._step_string(stack, top[1], b)
+            if kind == "esc":
+                if b in b'"\\/bfnrt':
+                    return stack[:-1]
+                return stack[:-1] + (("hex", 4),) if b == ord("u") else None
+            if kind == "hex":
+                if b not in b"0123456789abcdefABCDEF":
+                    return None
+                return stack[:-1] + ((("hex", top[1] - 1),) if top[1] > 1 else ())
+            if kind == "arr":
+                if b == ord("]"):
+                    return stack[:-1]
+                stack = stack[:-1] + (("more", top[1]), ("node", top[1]))
+                continue
+            if kind == "more":
+                if b == ord(","):
+                    return stack[:-1] + (("more", top[1]), ("node", top[1]), ("lit", b" "))
+                return stack[:-1] if b == ord("]") else None
+        return None
+
+    @staticmethod
+    def _step_string(stack, pending, b):
+        if pending:
+            # UTF-8 연속 바이트 대기 중: (남은 바이트 수, 다음 바이트 하한, 상한)
+            left, lo, hi = pending
+            if not lo <= b <= hi:
+                return None
+            return stack[:-1] + (("str", (left - 1, 0x80, 0xBF) if left > 1 else 0),)
+        if b == ord('"'):
+            return stack[:-1]
+        if b == ord("\\"):
+            return stack + (("esc",),)
+        if b < 0x20:
+            return None
+        if b < 0x80:
+            return stack
+        lead = _UTF8_LEAD.get(b)
+        return stack[:-1] + (("str", lead),) if lead else None
+
+    def feed(self, stack, piece):
+        for b in piece:
+            stack = self.step(stack, b)
+            if stack is None:
+                return None
+        return stack
@@ -0,0 +1,64 @@
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# serve.py 모델 서버용 클라이언트 (torch 의존성 없음)
+
+REQUEST_TIMEOUT = 600  # 초
+DEFAULT_CONCURRENCY = 8
+
+
+def judge(server_url: str, user_query: str, regit_num: str, claim_text: str, timeout=REQUEST_TIMEOUT,
+          domain=None, adapter=None) -> dict:
+    """모델 서버에 판단 요청. {"response", "result", "batch_size", ...} 반환
+
+    domain / adapter는 다중 LoRA 서버의 어댑터 선택용 (없으면 regit_num 매핑 또는 기본 어댑터)
+    """
+    payload = {
+        "user_query": user_query,
+        "regit_num": regit_num,
+        "claim_text": claim_text,
+    }
+    if domain:
+        payload["domain"] = domain
+    if adapter:
+        payload["adapter"] = adapter
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    req = urllib.request.Request(
+        server_url.rstrip("/") + "/judge",
+        data=body,
+        headers={"Content-Type": "application/json; charset=utf-8"},
+    )
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read().decode("utf-8"))
+
+
+def judge_many(server_url: str, seeds, concurrency=DEFAULT_CONCURRENCY):
+    """seed 리스트를 동시에 요청하여 서버가 마이크로 배치로 묶도록 한다. 원래 순서의 결과 반환"""
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [
+            pool.submit(judge, server_url, s["user_query"], s["regit_num"], s["claim_text"],
+                        domain=s.get("domain"), adapter=s.get("adapter"))
+            for s in seeds
+        ]
+        return [f.result() for f in futures]
+
+
+def remote_responses(server_url: str, seeds, concurrency=DEFAULT_CONCURRENCY):
+    """judge_many 결과를 generate_responses와 같은 (응답 리스트, 처리량) 형식으로 반환"""
+    start = time.perf_counter()
+    outs = judge_many(server_url, seeds, concurrency=concurrency)
+    elapsed = time.perf_counter() - start
+
+    # 서버는 배치 전체의 생성 토큰 수를 돌려주므로 요청별 몫으로 나눠 합산
+    generated = round(sum(o["generated_tokens"] / o["batch_size"] for o in outs))
+    batch_stats = [{
+        "batch": 1,
+        "size": len(outs),
+        "server_avg_batch_size": round(sum(o["batch_size"] for o in outs) / len(outs), 2) if outs else 0.0,
+        "generated_tokens": generated,
+        "seconds": round(elapsed, 3),
+        "tokens_per_sec": round(generated / elapsed, 2) if elapsed > 0 else 0.0,
+    }]
+    return [o["response"] for o in outs], batch_stats
@@ -0,0 +1,178 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# 판단 캐시 파일 (SQLite)
+CACHE_PATH = Path(os.environ.get("JUDGE_CACHE_PATH", BASE_DIR / "outputs/judgement_cache.sqlite"))
+
+# 응답 본문 기준 용량 상한 (MB). 넘으면 오래 안 쓴 항목부터 CACHE_LOW_WATER까지 비운다
+JUDGE_CACHE_MB = float(os.environ.get("JUDGE_CACHE_MB", "256"))
+CACHE_LOW_WATER = 0.9
+
+# 항목 유효 기간 (초, 0이면 무기한)
+JUDGE_CACHE_TTL = int(os.environ.get("JUDGE_CACHE_TTL", str(7 * 24 * 3600)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    gen_seconds REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access);
+CREATE TABLE IF NOT EXISTS meta (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS entries_add AFTER INSERT ON entries
+    BEGIN UPDATE meta SET bytes = bytes + NEW.bytes; END;
+CREATE TRIGGER IF NOT EXISTS entries_remove AFTER DELETE ON entries
+    BEGIN UPDATE meta SET bytes = bytes - OLD.bytes; END;
+"""
+
+
+def _sha(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def normalize_prompt(prompt):
+    """NFC 정규화 + 줄별 공백 정리 (사용자 입력의 공백/조합형 한글 차이를 같은 프롬프트로 본다)"""
+    prompt = unicodedata.normalize("NFC", prompt)
+    return "\n".join(" ".join(line.split()) for line in prompt.strip().splitlines())
+
+
+def adapter_hash(adapter_path):
+    """어댑터 설정/가중치 파일 해시 (어댑터가 없으면 "none")"""
+    if adapter_path is None:
+        return "none"
+    h = hashlib.sha256()
+    for name in ("adapter_config.json", "adapter_model.safetensors", "adapter_model.bin"):
+        path = Path(adapter_path) / name
+        if not path.exists():
+            continue
+        h.update(name.encode("utf-8"))
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()[:16]
+
+
+def model_fingerprint(base_model, adapter_path=None, merged_path=None, max_new_tokens=None, constrained=False):
+    """응답을 바꾸는 설정의 식별자 (모델 / 어댑터 가중치 해시 / 생성 설정)"""
+    adapter = adapter_hash(Path(adapter_path)) if adapter_path else "none"
+    return _sha(base_model, adapter, merged_path or "", max_new_tokens, bool(constrained))[:16]
+
+
+class JudgementCache:
+    """프롬프트 내용 주소 기반 판단 캐시 (SQLite, LRU + TTL + 용량 상한)
+
+    키 = sha256(모델 fingerprint, variant(어댑터 이름 등), 정규화 프롬프트).
+    항목마다 생성에 걸린 시간을 저장해 hit 때마다 아낀 생성 시간을 합산한다.
+    """
+
+    def __init__(self, fingerprint, path=CACHE_PATH, max_mb=JUDGE_CACHE_MB, ttl=JUDGE_CACHE_TTL):
+        self.fingerprint = fingerprint
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 ** 2)
+        self.ttl = ttl
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # INSERT OR REPLACE로 지워지는 행에도 용량 trigger가 동작하도록
+        self.conn.execute("PRAGMA recursive_triggers=ON")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expired = 0
+        self.saved_seconds = 0.0
+
+    def key(self, prompt, variant=None):
+        return _sha(self.fingerprint, variant or "", normalize_prompt(prompt))
+
+    def get(self, prompt, variant=None):
+        """캐시된 응답 (없거나 만료됐으면 None)"""
+        key = self.key(prompt, variant)
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT response, gen_seconds, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl and now - row[2] > self.ttl:
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.expired += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE entries SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self.hits += 1
+            self.saved_seconds += row[1]
+            return row[0]
+
+    def put(self, prompt, response, gen_seconds, variant=None):
+        key = self.key(prompt, variant)
+        size = len(response.encode("utf-8"))
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, response, bytes, gen_seconds, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, response, size, gen_seconds, now, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        used = self.conn.execute("SELECT bytes FROM meta").fetchone()[0]
+        if used <= self.max_bytes:
+            return
+        target = int(self.max_bytes * CACHE_LOW_WATER)
+        freed = 0
+        victims = []
+        for key, size in self.conn.execute("SELECT key, bytes FROM entries ORDER BY last_access"):
+            if used - freed <= target:
+                break
+            victims.append((key,))
+            freed += size
+        self.conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def lookup(self, prompts, variants=None):
+        """(캐시 응답 dict {index: response}, 미스 index 리스트)"""
+        variants = variants or [None] * len(prompts)
+        cached, misses = {}, []
+        for i, (prompt, variant) in enumerate(zip(prompts, variants)):
+            response = self.get(prompt, variant)
+            if response is None:
+                misses.append(i)
+            else:
+                cached[i] = response
+        return cached, misses
+
+    def stats(self):
+        with self._lock:
+            used, entries, saved_total = self.conn.execute(
+                "SELECT (SELECT bytes FROM meta), COUNT(*), COALESCE(SUM(hits * gen_seconds), 0) FROM entries"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "saved_seconds_total": round(saved_total, 3),
+            "entries": entries,
+            "bytes": used,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "expired": self.expired,
+        }
@@ -0,0 +1,399 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+
+from judgement_cache import adapter_hash
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# 모델 선택 (evaluate.py와 동일)
+MODEL_SIZE = os.environ.get("MODEL_SIZE", "4b")  # "1b" or "4b"
+
+if MODEL_SIZE == "1b":
+    ADAPTER_PATH = BASE_DIR / "outputs/gemma3-1b-it-lora"
+    BASE_MODEL = "google/gemma-3-1b-it"
+else:
+    ADAPTER_PATH = BASE_DIR / "outputs/gemma3-4b-it-lora"
+    BASE_MODEL = "google/gemma-3-4b-it"
+
+# 판단 결과 저장소 (SQLite)
+STORE_PATH = Path(os.environ.get("JUDGEMENT_STORE", BASE_DIR / "outputs/judgement_store.sqlite"))
+
+SEED_PATH = Path(os.environ.get("SEED_PATH", BASE_DIR / "data/raw/seeds/seed_cases.json"))
+
+# 보정된 청구항 (seed 형식 JSON/JSONL 또는 청구항 변동이력 XML). 설정 시 바뀐 청구항의 쌍만 다시 판단
+AMENDMENTS_PATH = os.environ.get("AMENDMENTS_PATH")
+
+# 어댑터 버전 (미설정 시 어댑터 파일 해시). 바뀌면 모든 쌍이 다시 판단 대상이 된다
+ADAPTER_VERSION = os.environ.get("ADAPTER_VERSION")
+
+# 모델 서버 주소 (설정 시 로컬 모델을 로드하지 않고 serve.py 서버에 요청)
+JUDGE_SERVER_URL = os.environ.get("JUDGE_SERVER_URL")
+
+# 백그라운드 재판단 배치 크기 / 대기열이 비었을 때 폴링 간격(초)
+REJUDGE_BATCH = int(os.environ.get("REJUDGE_BATCH", "16"))
+POLL_SECONDS = 2.0
+
+# 테이블 구조가 바뀌면 올린다 (다르면 기존 테이블을 버리고 seed부터 다시 등록)
+STORE_VERSION = 2
+
+RISK_LEVEL = re.compile(r'"risk_level"\s*:\s*"(높음|애매|낮음)"')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS claims (
+    regit_num TEXT NOT NULL,
+    claim_no INTEGER NOT NULL,
+    claim_hash TEXT NOT NULL,
+    claim_text TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (regit_num, claim_no)
+);
+CREATE TABLE IF NOT EXISTS pairs (
+    query_hash TEXT NOT NULL,
+    regit_num TEXT NOT NULL,
+    claim_no INTEGER NOT NULL,
+    user_query TEXT NOT NULL,
+    PRIMARY KEY (query_hash, regit_num, claim_no)
+);
+CREATE TABLE IF NOT EXISTS judgements (
+    query_hash TEXT NOT NULL,
+    regit_num TEXT NOT NULL,
+    claim_no INTEGER NOT NULL,
+    claim_hash TEXT NOT NULL,
+    adapter_version TEXT NOT NULL,
+    response TEXT NOT NULL,
+    risk_level TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (query_hash, regit_num, claim_no, claim_hash, adapter_version)
+);
+CREATE TABLE IF NOT EXISTS pending (
+    query_hash TEXT NOT NULL,
+    regit_num TEXT NOT NULL,
+    claim_no INTEGER NOT NULL,
+    queued_at REAL NOT NULL,
+    PRIMARY KEY (query_hash, regit_num, claim_no)
+);
+"""
+TABLES = ("claims", "pairs", "judgements", "pending")
+
+
+def text_hash(text):
+    """공백 정규화 후 해시 (줄바꿈/들여쓰기 차이는 같은 텍스트로 본다)"""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()[:16]
+
+
+def claim_number(row):
+    """청구항 번호 (seed 행에는 없으므로 1항으로 본다)"""
+    return int(row.get("claim_no") or 1)
+
+
+def adapter_version(adapter_path=ADAPTER_PATH):
+    if ADAPTER_VERSION:
+        return ADAPTER_VERSION
+    return adapter_hash(Path(adapter_path))
+
+
+class JudgementStore:
+    """(user_query 해시, regit_num, claim_no, claim_text 해시, 어댑터 버전) 키의 판단 결과 저장소
+
+    청구항은 (regit_num, claim_no)별 현재 텍스트만 claims 테이블에 두고, 판단 결과는 당시 청구항 해시로 남긴다.
+    청구항이 보정되면 해시가 달라져 그 청구항의 쌍만 조회에서 빠지고 pending 대기열에 들어간다.
+    """
+
+    def __init__(self, path=STORE_PATH, version=None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.version = version or adapter_version()
+        self.conn = self._connect()
+        self._migrate()
+        self.conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _migrate(self):
+        """STORE_VERSION이 다른 저장소 파일이면 기존 테이블을 버린다 (판단 이력은 다시 쌓인다)"""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version == STORE_VERSION:
+            return
+        existing = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'claims'").fetchone()
+        with self.conn:
+            for table in TABLES:
+                self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+            self.conn.execute(f"PRAGMA user_version = {STORE_VERSION}")
+        if existing:
+            print(f"[WARN] 판단 저장소 버전 {version} -> {STORE_VERSION}: 기존 테이블을 비웠습니다 ({self.path})")
+
+    def _enqueue_missing(self):
+        """현재 청구항/어댑터 기준 판단이 없는 쌍을 pending에 추가. 추가된 수 반환"""
+        cur = self.conn.execute("""
+            INSERT OR IGNORE INTO pending (query_hash, regit_num, claim_no, queued_at)
+            SELECT p.query_hash, p.regit_num, p.claim_no, ?
+            FROM pairs p JOIN claims c ON c.regit_num = p.regit_num AND c.claim_no = p.claim_no
+            WHERE NOT EXISTS (
+                SELECT 1 FROM judgements j
+                WHERE j.query_hash = p.query_hash AND j.regit_num = p.regit_num AND j.claim_no = p.claim_no
+                  AND j.claim_hash = c.claim_hash AND j.adapter_version = ?
+            )
+        """, (time.time(), self.version))
+        return cur.rowcount
+
+    def _upsert_claim(self, regit_num, number, claim_text):
+        """청구항 갱신. 같은 번호의 텍스트가 바뀌었으면 True (처음 보는 청구항은 False)"""
+        claim_hash = text_hash(claim_text)
+        row = self.conn.execute(
+            "SELECT claim_hash FROM claims WHERE regit_num = ? AND claim_no = ?", (regit_num, number)
+        ).fetchone()
+        if row and row[0] == claim_hash:
+            return False
+        self.conn.execute(
+            "INSERT OR REPLACE INTO claims (regit_num, claim_no, claim_hash, claim_text, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (regit_num, number, claim_hash, claim_text, time.time()),
+        )
+        return row is not None
+
+    def _add_claim(self, regit_num, number, claim_text):
+        """처음 보는 청구항만 등록 (이미 있으면 보정된 텍스트를 유지)"""
+        self.conn.execute(
+            "INSERT OR IGNORE INTO claims (regit_num, claim_no, claim_hash, claim_text, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (regit_num, number, text_hash(claim_text), claim_text, time.time()),
+        )
+
+    def _add_pair(self, user_query, regit_num, number):
+        self.conn.execute(
+            "INSERT OR IGNORE INTO pairs (query_hash, regit_num, claim_no, user_query) VALUES (?, ?, ?, ?)",
+            (text_hash(user_query), regit_num, number, user_query),
+        )
+
+    def sync_seeds(self, seeds):
+        """seed_cases.json 형식 행을 등록하고 판단이 없는 쌍을 대기열에 넣는다
+
+        이미 등록된 청구항의 텍스트는 바꾸지 않는다 (청구항 텍스트는 apply_amendments로만 바뀐다).
+        """
+        with self.conn:
+            for seed in seeds:
+                regit_num, number = str(seed["regit_num"]), claim_number(seed)
+                self._add_claim(regit_num, number, seed["claim_text"])
+                self._add_pair(seed["user_query"], regit_num, number)
+            queued = self._enqueue_missing()
+        return {"pairs": len(seeds), "queued": queued}
+
+    def apply_amendments(self, amendments):
+        """보정 청구항 [{"regit_num", (claim_no), "claim_text", (user_query)}] 반영
+
+        텍스트가 실제로 바뀐 청구항의 쌍만 대기열에 넣는다. user_query가 있는 행은 새 쌍으로도 등록한다.
+        """
+        changed = set()
+        with self.conn:
+            for row in amendments:
+                regit_num, number = str(row["regit_num"]), claim_number(row)
+                if self._upsert_claim(regit_num, number, row["claim_text"]):
+                    changed.add((regit_num, number))
+                if row.get("user_query"):
+                    self._add_pair(row["user_query"], regit_num, number)
+            queued = self._enqueue_missing()
+        total = self.conn.execute("SELECT COUNT(*) FROM pairs").fetchone()[0]
+        return {"changed_claims": len(changed), "queued": queued, "pairs": total, "claims": sorted(changed)}
+
+    def get(self, user_query, regit_num, number=1):
+        """현재 청구항/어댑터 기준 판단 결과 (없거나 무효화됐으면 None)"""
+        row = self.conn.execute("""
+            SELECT j.response, j.risk_level, j.created_at FROM judgements j
+            JOIN claims c ON c.regit_num = j.regit_num AND c.claim_no = j.claim_no AND c.claim_hash = j.claim_hash
+            WHERE j.query_hash = ? AND j.regit_num = ? AND j.claim_no = ? AND j.adapter_version = ?
+        """, (text_hash(user_query), str(regit_num), number, self.version)).fetchone()
+        if row is None:
+            return None
+        return {"response": row[0], "risk_level": row[1], "created_at": row[2]}
+
+    def take_pending(self, limit):
+        """대기 중인 쌍을 seed 형식으로 최대 limit개 (오래된 순)"""
+        rows = self.conn.execute("""
+            SELECT q.query_hash, q.regit_num, q.claim_no, p.user_query, c.claim_text, c.claim_hash
+            FROM pending q
+            JOIN pairs p ON p.query_hash = q.query_hash AND p.regit_num = q.regit_num AND p.claim_no = q.claim_no
+            JOIN claims c ON c.regit_num = q.regit_num AND c.claim_no = q.claim_no
+            ORDER BY q.queued_at LIMIT ?
+        """, (limit,)).fetchall()
+        return [
+            {"query_hash": r[0], "regit_num": r[1], "claim_no": r[2], "user_query": r[3], "claim_text": r[4],
+             "claim_hash": r[5]}
+            for r in rows
+        ]
+
+    def record(self, items, responses):
+        """판단 결과 저장 + 대기열에서 제거. 판단 중 청구항이 또 바뀌었으면 대기열에 남긴다"""
+        now = time.time()
+        with self.conn:
+            for item, response in zip(items, responses):
+                m = RISK_LEVEL.search(response)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO judgements VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (item["query_hash"], item["regit_num"], item["claim_no"], item["claim_hash"], self.version,
+                     response, m.group(1) if m else None, now),
+                )
+                self.conn.execute("""
+                    DELETE FROM pending WHERE query_hash = ? AND regit_num = ? AND claim_no = ?
+                    AND EXISTS (SELECT 1 FROM claims WHERE regit_num = ? AND claim_no = ? AND claim_hash = ?)
+                """, (item["query_hash"], item["regit_num"], item["claim_no"],
+                      item["regit_num"], item["claim_no"], item["claim_hash"]))
+
+    def stats(self):
+        count = lambda table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        current = self.conn.execute("""
+            SELECT COUNT(*) FROM judgements j
+            JOIN claims c ON c.regit_num = j.regit_num AND c.claim_no = j.claim_no AND c.claim_hash = j.claim_hash
+            WHERE j.adapter_version = ?
+        """, (self.version,)).fetchone()[0]
+        return {
+            "adapter_version": self.version,
+            "claims": count("claims"),
+            "pairs": count("pairs"),
+            "current": current,
+            "pending": count("pending"),
+            "history": count("judgements"),
+        }
+
+
+class ReJudgeWorker:
+    """pending 대기열을 배치 단위로 꺼내 다시 판단하는 백그라운드 스레드
+
+    judge_fn(seeds) -> 응답 문자열 리스트. 스레드는 자체 SQLite 연결을 쓰고 (WAL),
+    대기열이 비면 POLL_SECONDS마다 새 보정분을 확인한다.
+    """
+
+    def __init__(self, store: JudgementStore, judge_fn, batch_size=REJUDGE_BATCH):
+        self.store = JudgementStore(store.path, version=store.version)
+        self.judge_fn = judge_fn
+        self.batch_size = batch_size
+        self.judged = 0
+        self.batches = 0
+        self.seconds = 0.0
+        self._stop = threading.Event()
+        self._idle = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="rejudge", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def run_once(self):
+        """배치 1개 처리. 처리한 쌍 수 반환"""
+        items = self.store.take_pending(self.batch_size)
+        if not items:
+            return 0
+        start = time.perf_counter()
+        responses = self.judge_fn(items)
+        self.store.record(items, responses)
+        self.seconds += time.perf_counter() - start
+        self.judged += len(items)
+        self.batches += 1
+        return len(items)
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                if self.run_once():
+                    self._idle.clear()
+                    print(f"  재판단 {self.judged}건 (배치 {self.batches}개, {self.seconds:.1f}s)")
+                else:
+                    self._idle.set()
+                    self._stop.wait(POLL_SECONDS)
+        except Exception as e:
+            # 스레드가 조용히 죽으면 wait_idle이 영원히 기다리므로 예외를 남기고 깨운다
+            self._error = e
+            self._idle.set()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError("백그라운드 재판단 실패") from self._error
+
+    def wait_idle(self, timeout=None):
+        """대기열이 빌 때까지 대기. 스레드에서 예외가 났으면 다시 던진다"""
+        idle = self._idle.wait(timeout)
+        self._raise_error()
+        return idle
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._raise_error()
+
+
+def make_judge_fn(token=None, batch_size=REJUDGE_BATCH):
+    """모델 서버 또는 로컬 모델로 seed 리스트를 판단하는 함수"""
+    if JUDGE_SERVER_URL:
+        from judge_client import remote_responses
+
+        return lambda seeds: remote_responses(JUDGE_SERVER_URL, seeds, concurrency=batch_size)[0]
+
+    from generation import generate_responses, load_model
+    from prompt_format import build_prompt
+
+    print(f"모델 로딩 중... ({MODEL_SIZE.upper()})")
+    model, tokenizer = load_model(BASE_MODEL, ADAPTER_PATH, token=token)
+
+    def judge_fn(seeds):
+        prompts = [build_prompt(s["user_query"], s["regit_num"], s["claim_text"]) for s in seeds]
+        responses, _ = generate_responses(model, tokenizer, prompts, batch_size=batch_size)
+        return responses
+
+    return judge_fn
+
+
+def load_amendments(path):
+    """보정 청구항 로드: seed 형식 JSON 배열 / JSONL / 청구항 변동이력 XML"""
+    path = Path(path)
+    if path.suffix == ".xml" or path.is_dir():
+        from kipris_ingest import iter_xml_claims, xml_files
+
+        # 독립항 전체 (청구항 번호별로 따로 저장되므로 같은 특허의 다른 청구항끼리 덮어쓰지 않는다)
+        return [row for xml_path in xml_files(path) for row in iter_xml_claims(xml_path)]
+
+    from build_sft_jsonl import iter_json_array, iter_jsonl
+
+    return list(iter_jsonl(path) if path.suffix == ".jsonl" else iter_json_array(path))
+
+
+def main():
+    token = os.environ.get("HF_TOKEN")
+
+    store = JudgementStore()
+    with open(SEED_PATH, "r", encoding="utf-8") as f:
+        seeds = json.load(f)
+    synced = store.sync_seeds(seeds)
+    print(f"seed 등록: {synced['pairs']}쌍, 판단 필요 {synced['queued']}쌍 (어댑터 {store.version})")
+
+    if AMENDMENTS_PATH:
+        report = store.apply_amendments(load_amendments(AMENDMENTS_PATH))
+        print(f"청구항 보정: {report['changed_claims']}건 변경 -> {report['queued']}/{report['pairs']}쌍만 재판단 대상")
+        for regit_num, number in report["claims"]:
+            print(f"  - {regit_num} 제{number}항")
+
+    pending = store.stats()["pending"]
+    if pending == 0:
+        print("재판단할 쌍이 없습니다")
+    else:
+        print(f"\n백그라운드 재판단 시작 ({pending}쌍, batch_size={REJUDGE_BATCH})")
+        worker = ReJudgeWorker(store, make_judge_fn(token)).start()
+        worker.wait_idle()
+        worker.stop()
+        print(f"재판단 완료: {worker.judged}쌍 / {worker.seconds:.1f}s")
+
+    stats = store.stats()
+    print(f"\n[저장소] 청구항 {stats['claims']}개 | 쌍 {stats['pairs']}개 | 현재 판단 {stats['current']}개 | "
+          f"대기 {stats['pending']}개 | 이력 {stats['history']}개")
+
+
+if __name__ == "__main__":
+    main()
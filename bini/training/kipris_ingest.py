@@ -0,0 +1,339 @@
+import os
+import re
+import json
+import time
+import hashlib
+from pathlib import Path
+from xml.parsers import expat
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# KIPRIS 공개/등록공보 XML 벌크 덤프 (파일 또는 디렉토리, 하위 *.xml 전체)
+KIPRIS_XML_PATH = Path(os.environ.get("KIPRIS_XML_PATH", BASE_DIR / "data/raw/kipris"))
+
+# 청구항 컬럼 저장소 (소스 XML 파일마다 parquet 파일 1개 + manifest.json)
+CLAIM_STORE_DIR = Path(os.environ.get("CLAIM_STORE_DIR", BASE_DIR / "data/processed/claim_store"))
+
+# 1이면 manifest를 무시하고 전체 재적재
+FULL_REINGEST = os.environ.get("FULL_REINGEST", "0") == "1"
+
+# parquet row group 크기 (이 개수만큼 모이면 기록하고 버퍼를 비운다)
+ROW_GROUP_ROWS = int(os.environ.get("ROW_GROUP_ROWS", "65536"))
+READ_CHUNK = 1 << 20
+STORE_VERSION = 1
+
+# 공보 XML 태그 (네임스페이스/대소문자 무시, 구버전 DTD와 ST.96 계열 표기를 함께 받는다)
+DOC_TAGS = {
+    "patentdocumentandrelated", "utilitymodeldocumentandrelated", "kr-patent-document",
+    "kr_patentdocument", "patentdocument", "us-patent-grant",
+}
+REGIT_TAGS = {
+    "kr_registernumber", "kr_registrationnumber", "registernumber", "registrationnumber",
+    "registernum", "regit_num",
+}
+CLAIM_TAGS = {"claim"}
+# 청구항 내부에서 끝날 때 공백을 넣는 문단 태그 (<b>, <sub> 같은 서식 태그는 붙여 쓴다)
+BLOCK_TAGS = {"claimtext", "claim-text", "p", "br", "paragraph"}
+
+# 종속항: "제1항에 있어서", "청구항 1 또는 2에 따른", "제1항 내지 제3항 중 어느 한 항에 있어서"
+DEPENDENT_CLAIM = re.compile(
+    r"^\s*(?:제\s*\d+\s*항|청구항\s*\d+)[^.]{0,40}?(?:있어서|따른|따르는|기재된|의\s*(?:방법|조성물|화장료))"
+)
+DELETED_CLAIM = re.compile(r"^\s*(?:\(?\s*삭제\s*\)?|deleted)\s*\.?\s*$", re.IGNORECASE)
+
+def _local(name):
+    """'{ns} tag' / 'ns:tag' -> 'tag' (소문자)"""
+    return name.rsplit(" ", 1)[-1].rsplit(":", 1)[-1].lower()
+
+
+def normalize_regit_num(raw):
+    """'10-1454199-0000' / '1014541990000' / '101454199' -> seed와 같은 13자리 등록번호"""
+    digits = re.sub(r"\D", "", raw or "")
+    if len(digits) == 9:
+        digits += "0000"
+    return digits
+
+
+def claim_kind(regit_num):
+    """등록번호 앞 2자리 권리 구분 (10: 특허, 20: 실용신안)"""
+    return {"10": "patent", "20": "utility"}.get(regit_num[:2], "other")
+
+
+def is_independent(claim_text):
+    return not DEPENDENT_CLAIM.search(claim_text) and not DELETED_CLAIM.match(claim_text)
+
+
+class _ClaimHandler:
+    """expat 콜백. 문서(공보 1건) 단위로 등록번호와 청구항만 모으고 나머지 본문은 버린다
+
+    DOC_TAGS 밖의 청구항, 등록번호가 없거나 서로 다른 등록번호가 두 개 이상인 문서의 청구항은
+    다른 특허에 잘못 붙이지 않도록 버리고 skipped_claims로 센다.
+    """
+
+    def __init__(self, parser, source_file, independent_only):
+        self.parser = parser
+        self.source_file = source_file
+        self.independent_only = independent_only
+        self.rows = []  # 완성된 행 (iter_xml_claims가 매 청크마다 비운다)
+        self.depth = 0
+        self.docs = []  # 열린 문서 스택: {"depth", "regit_num", "claims"}
+        self.text = None  # 현재 모으는 문자열 (등록번호 / 청구항)
+        self.target = None
+        self.claim = None
+        self.documents = 0
+        self.skipped_claims = 0  # 문서 밖 / 등록번호 없음 / 등록번호 충돌로 버린 청구항
+        self.conflicts = 0  # 서로 다른 등록번호가 둘 이상인 문서
+
+    def start(self, name, attrs):
+        tag = _local(name)
+        self.depth += 1
+        if tag in DOC_TAGS:
+            self.docs.append({"depth": self.depth, "regit_num": "", "conflict": False, "claims": []})
+        if self.claim is not None:
+            return  # 청구항 내부 서식 태그 (<b>, <sub> ...)
+        if tag in CLAIM_TAGS and not self.docs:
+            self.skipped_claims += 1
+        elif tag in CLAIM_TAGS:
+            number = attrs.get("num") or attrs.get("n") or attrs.get("claimNumber") or ""
+            self.claim = {
+                "depth": self.depth,
+                "claim_no": int(re.sub(r"\D", "", number) or len(self.docs[-1]["claims"]) + 1),
+                "source_offset": self.parser.CurrentByteIndex,
+            }
+            self.text, self.target = [], "claim"
+        elif tag in REGIT_TAGS and self.docs:
+            self.text, self.target = [], "regit"
+
+    def data(self, chunk):
+        if self.text is not None:
+            self.text.append(chunk)
+
+    def end(self, name):
+        if self.target == "regit" and self.claim is None:
+            doc, regit_num = self.docs[-1], normalize_regit_num("".join(self.text))
+            if not doc["regit_num"]:
+                doc["regit_num"] = regit_num
+            elif regit_num and regit_num != doc["regit_num"]:
+                doc["conflict"] = True
+            self.text = self.target = None
+        elif self.claim is not None and self.depth == self.claim["depth"]:
+            self.claim["claim_text"] = " ".join("".join(self.text).split())
+            self.docs[-1]["claims"].append(self.claim)
+            self.claim = self.text = self.target = None
+        elif self.claim is not None and _local(name) in BLOCK_TAGS:
+            self.text.append(" ")
+
+        if self.docs and self.docs[-1]["depth"] == self.depth:
+            self._emit(self.docs.pop())
+        self.depth -= 1
+
+    def _emit(self, doc):
+        if not doc["claims"]:
+            return
+        if not doc["regit_num"] or doc["conflict"]:
+            self.skipped_claims += len(doc["claims"])
+            self.conflicts += doc["conflict"]
+            return
+        self.documents += 1
+        for claim in doc["claims"]:
+            if self.independent_only and not is_independent(claim["claim_text"]):
+                continue
+            self.rows.append({
+                "regit_num": doc["regit_num"],
+                "claim_no": claim["claim_no"],
+                "claim_text": claim["claim_text"],
+                "kind": claim_kind(doc["regit_num"]),
+                "source_file": self.source_file,
+                "source_offset": claim["source_offset"],
+            })
+
+
+def iter_xml_claims(path, independent_only=True, stats=None):
+    """공보 XML 1개를 스트리밍 파싱해 청구항 행(dict)을 yield
+
+    iterparse와 같은 expat 파서를 직접 써서 청구항 시작 바이트 오프셋을 얻는다.
+    파일을 READ_CHUNK 단위로 넣고 그때까지 완성된 행만 내보내므로 메모리는 공보 1건 크기로 제한된다.
+    """
+    path = Path(path)
+    parser = expat.ParserCreate(namespace_separator=" ")
+    parser.buffer_text = True
+    parser.buffer_size = 1 << 16
+    handler = _ClaimHandler(parser, str(path), independent_only)
+    parser.StartElementHandler = handler.start
+    parser.EndElementHandler = handler.end
+    parser.CharacterDataHandler = handler.data
+
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(READ_CHUNK)
+            parser.Parse(chunk, not chunk)
+            yield from handler.rows
+            handler.rows.clear()
+            if not chunk:
+                break
+    if stats is not None:
+        stats["documents"] = stats.get("documents", 0) + handler.documents
+        stats["skipped_claims"] = stats.get("skipped_claims", 0) + handler.skipped_claims
+        stats["conflicts"] = stats.get("conflicts", 0) + handler.conflicts
+
+
+def xml_files(path=KIPRIS_XML_PATH):
+    path = Path(path)
+    return [path] if path.is_file() else sorted(path.rglob("*.xml"))
+
+
+def _part_name(source):
+    return hashlib.sha1(str(Path(source).resolve()).encode("utf-8")).hexdigest()[:16] + ".parquet"
+
+
+def load_manifest(store_dir):
+    path = Path(store_dir) / "manifest.json"
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == STORE_VERSION:
+            return manifest
+    return {"version": STORE_VERSION, "sources": {}}
+
+
+def save_manifest(store_dir, manifest):
+    path = Path(store_dir) / "manifest.json"
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("regit_num", pa.string()),
+        ("claim_no", pa.int32()),
+        ("claim_text", pa.string()),
+        ("kind", pa.string()),
+        ("source_file", pa.string()),
+        ("source_offset", pa.int64()),
+    ])
+
+
+def write_part(rows, out_path, row_group_rows=ROW_GROUP_ROWS):
+    """행 스트림을 row group 단위로 parquet에 기록. 기록한 행 수 반환"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _schema()
+    tmp = Path(str(out_path) + ".tmp")
+    written = 0
+    with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= row_group_rows:
+                writer.write_table(pa.Table.from_pylist(buffer, schema=schema))
+                written += len(buffer)
+                buffer.clear()
+        if buffer:
+            writer.write_table(pa.Table.from_pylist(buffer, schema=schema))
+            written += len(buffer)
+    os.replace(tmp, out_path)
+    return written
+
+
+def ingest(xml_path=KIPRIS_XML_PATH, store_dir=CLAIM_STORE_DIR, full=FULL_REINGEST, independent_only=True):
+    """XML 덤프를 청구항 저장소로 적재. 크기/수정시각이 같은 소스 파일은 건너뛴다
+
+    반환: {"files", "skipped", "bytes", "rows", "documents", "skipped_claims", "seconds", "mb_per_sec"}
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {"version": STORE_VERSION, "sources": {}} if full else load_manifest(store_dir)
+    sources = xml_files(xml_path)
+    live = {str(p.resolve()) for p in sources}
+
+    # 사라진 소스 파일의 part 제거
+    for source in list(manifest["sources"]):
+        if source not in live:
+            (store_dir / manifest["sources"].pop(source)["part"]).unlink(missing_ok=True)
+
+    report = {"files": 0, "skipped": 0, "bytes": 0, "rows": 0, "documents": 0, "skipped_claims": 0}
+    start = time.perf_counter()
+    for path in sources:
+        key = str(path.resolve())
+        st = path.stat()
+        entry = manifest["sources"].get(key)
+        if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime:
+            report["skipped"] += 1
+            continue
+
+        stats = {}
+        file_start = time.perf_counter()
+        part = _part_name(path)
+        rows = write_part(iter_xml_claims(path, independent_only, stats), store_dir / part)
+        seconds = time.perf_counter() - file_start
+        manifest["sources"][key] = {
+            "part": part,
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "rows": rows,
+            "documents": stats.get("documents", 0),
+            "skipped_claims": stats.get("skipped_claims", 0),
+        }
+        save_manifest(store_dir, manifest)
+
+        report["files"] += 1
+        report["bytes"] += st.st_size
+        report["rows"] += rows
+        report["documents"] += stats.get("documents", 0)
+        report["skipped_claims"] += stats.get("skipped_claims", 0)
+        print(f"  {path.name}: 공보 {stats.get('documents', 0):,}건, 청구항 {rows:,}개 "
+              f"({st.st_size / 1024 ** 2 / seconds:.1f} MB/s)")
+        if stats.get("skipped_claims"):
+            print(f"  [WARN] {path.name}: 공보에 귀속할 수 없는 청구항 {stats['skipped_claims']:,}개 제외 "
+                  f"(공보 태그 밖 / 등록번호 없음 / 등록번호 충돌 공보 {stats.get('conflicts', 0):,}건)")
+
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    report["mb_per_sec"] = round(report["bytes"] / 1024 ** 2 / report["seconds"], 2) if report["seconds"] > 0 else 0.0
+    return report
+
+
+def _dataset(store_dir):
+    """manifest에 기록된 part만 (적재 중인 .tmp 파일 제외)"""
+    import pyarrow.dataset as ds
+
+    manifest = load_manifest(store_dir)
+    parts = [str(Path(store_dir) / entry["part"]) for entry in manifest["sources"].values()]
+    return ds.dataset(parts, format="parquet")
+
+
+def read_claims(store_dir=CLAIM_STORE_DIR, regit_nums=None, columns=None):
+    """저장소에서 청구항 조회 (pyarrow Table). regit_nums를 주면 해당 등록번호만
+
+    덤프는 보통 등록번호 순이라 row group 통계(min/max)로 대부분의 row group을 읽지 않고 건너뛴다.
+    """
+    import pyarrow.dataset as ds
+
+    dataset = _dataset(store_dir)
+    expr = None
+    if regit_nums is not None:
+        expr = ds.field("regit_num").isin([str(r) for r in regit_nums])
+    return dataset.to_table(columns=columns, filter=expr)
+
+
+def iter_store_claims(store_dir=CLAIM_STORE_DIR, batch_size=ROW_GROUP_ROWS):
+    """저장소 전체를 배치 단위로 읽어 {"regit_num", "claim_text", ...} dict를 yield"""
+    dataset = _dataset(store_dir)
+    for batch in dataset.to_batches(columns=["regit_num", "claim_no", "claim_text"], batch_size=batch_size):
+        yield from batch.to_pylist()
+
+
+def main():
+    print(f"KIPRIS XML 적재: {KIPRIS_XML_PATH} -> {CLAIM_STORE_DIR}")
+    report = ingest()
+    print(f"\n적재 완료: 파일 {report['files']}개 (변경 없음 {report['skipped']}개), "
+          f"공보 {report['documents']:,}건, 독립항 {report['rows']:,}개, 제외 청구항 {report['skipped_claims']:,}개")
+    print(f"처리량: {report['bytes'] / 1024 ** 2:.1f} MB / {report['seconds']:.1f}s ({report['mb_per_sec']:.1f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import random
+import resource
+import shutil
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from kipris_ingest import ingest, iter_xml_claims
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+SEED_PATH = BASE_DIR / "data/raw/seeds/seed_cases.json"
+BENCH_DIR = BASE_DIR / "data/raw/kipris_bench"
+
+# 합성 덤프 크기 (MB). 실제 공보 덤프가 있으면 KIPRIS_BENCH_XML로 그 경로를 측정
+BENCH_XML_MB = int(os.environ.get("BENCH_XML_MB", "2048"))
+KIPRIS_BENCH_XML = os.environ.get("KIPRIS_BENCH_XML")
+
+# 1이면 XML 파싱만 측정 (pyarrow 없이 실행 가능)
+PARSE_ONLY = os.environ.get("PARSE_ONLY", "0") == "1"
+
+# 공보 1건의 발명의 설명 분량 (실제 등록공보는 청구항보다 설명이 훨씬 길다)
+DESCRIPTION_PARAGRAPHS = 40
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_dump(path, target_mb, seed=0):
+    """seed 청구항으로 KIPRIS 등록공보 형식의 합성 벌크 XML 생성. (공보 수, 청구항 수) 반환"""
+    rng = random.Random(seed)
+    with open(SEED_PATH, "r", encoding="utf-8") as f:
+        seeds = json.load(f)
+    claims = list(dict.fromkeys(row["claim_text"].strip() for row in seeds))
+    queries = [row["user_query"] for row in seeds]
+
+    target = target_mb * 1024 ** 2
+    docs = total_claims = 0
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<KR_PatentBulk xmlns:kr="http://www.kipo.go.kr">\n')
+        while f.tell() < target:
+            regit_num = f"10-{2000000 + docs:07d}-0000"
+            independent = rng.sample(claims, k=rng.randint(1, 2))
+            paragraphs = "".join(f"<p num=\"{i:04d}\">{escape(rng.choice(queries))} {escape(rng.choice(claims))}</p>"
+                                 for i in range(DESCRIPTION_PARAGRAPHS))
+            claim_xml, n = [], 0
+            for text in independent:
+                n += 1
+                head = n
+                claim_xml.append(f'<Claim num="{n}"><ClaimText>{escape(text)}</ClaimText></Claim>')
+                for _ in range(rng.randint(2, 6)):
+                    n += 1
+                    claim_xml.append(f'<Claim num="{n}"><ClaimText>제{head}항에 있어서, '
+                                     f'{escape(rng.choice(claims)[:80])}인 것을 특징으로 하는 화장료 조성물.</ClaimText></Claim>')
+            f.write(
+                "<PatentDocumentAndRelated>"
+                f"<kr:KR_BibliographicData><kr:KR_RegisterNumber>{regit_num}</kr:KR_RegisterNumber>"
+                f"<kr:KR_InventionTitle>화장료 조성물</kr:KR_InventionTitle></kr:KR_BibliographicData>"
+                f"<Description>{paragraphs}</Description>"
+                f"<Claims>{''.join(claim_xml)}</Claims>"
+                "</PatentDocumentAndRelated>\n"
+            )
+            docs += 1
+            total_claims += n
+        f.write("</KR_PatentBulk>\n")
+    return docs, total_claims
+
+
+def bench_parse(path):
+    stats = {}
+    start = time.perf_counter()
+    rows = sum(1 for _ in iter_xml_claims(path, stats=stats))
+    seconds = time.perf_counter() - start
+    size_mb = Path(path).stat().st_size / 1024 ** 2
+    return {
+        "stage": "parse",
+        "mb": round(size_mb, 1),
+        "documents": stats["documents"],
+        "rows": rows,
+        "seconds": round(seconds, 2),
+        "mb_per_sec": round(size_mb / seconds, 2),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def bench_ingest(path):
+    store_dir = BENCH_DIR / "claim_store"
+    shutil.rmtree(store_dir, ignore_errors=True)
+    report = ingest(path, store_dir, full=True)
+    store_mb = sum(p.stat().st_size for p in store_dir.glob("*.parquet")) / 1024 ** 2
+    return {
+        "stage": "parse+parquet",
+        "mb": round(report["bytes"] / 1024 ** 2, 1),
+        "documents": report["documents"],
+        "rows": report["rows"],
+        "seconds": report["seconds"],
+        "mb_per_sec": report["mb_per_sec"],
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "store_mb": round(store_mb, 1),
+    }
+
+
+def main():
+    if KIPRIS_BENCH_XML:
+        path = Path(KIPRIS_BENCH_XML)
+    else:
+        path = BENCH_DIR / f"bulk_{BENCH_XML_MB}mb.xml"
+        if not path.exists() or path.stat().st_size < BENCH_XML_MB * 1024 ** 2:
+            print(f"합성 덤프 생성 중... ({BENCH_XML_MB} MB)")
+            docs, claims = make_dump(path, BENCH_XML_MB)
+            print(f"  공보 {docs:,}건, 청구항 {claims:,}개")
+
+    rows = [bench_parse(path)]
+    if not PARSE_ONLY:
+        rows.append(bench_ingest(path))
+
+    print(f"\n{'stage':<14} | {'MB':>8} | {'공보':>9} | {'독립항':>9} | {'sec':>7} | {'MB/s':>7} | {'peak RSS MB':>11}")
+    print("-" * 84)
+    for r in rows:
+        print(f"{r['stage']:<14} | {r['mb']:>8.1f} | {r['documents']:>9,} | {r['rows']:>9,} | "
+              f"{r['seconds']:>7.1f} | {r['mb_per_sec']:>7.1f} | {r['peak_rss_mb']:>11.1f}")
+
+    report_path = BENCH_DIR / "ingest_report.json"
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({"source": str(path), "rows": rows}, f, ensure_ascii=False, indent=2)
+    print(f"\n결과 저장: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import torch
+import yaml
+from transformers import AutoTokenizer, AutoModelForCausalLM
+from peft import PeftModel
+
+from generation import MAX_NEW_TOKENS, generate_batch
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+ADAPTERS_CONFIG = BASE_DIR / "training/adapters.yaml"
+
+# PEFT 혼합 배치에서 어댑터를 적용하지 않는 행의 이름
+BASE_ADAPTER = "__base__"
+
+
+class AdapterRouter:
+    """adapters.yaml 설정으로 요청(regit_num / domain / 어댑터 이름)을 어댑터 이름에 매핑"""
+
+    def __init__(self, cfg):
+        self.base_model = cfg["base_model"]
+        self.default = cfg.get("default") or BASE_ADAPTER
+        self.paths = {}
+        self.by_regit = {}
+        self.by_domain = {}
+        for name, entry in cfg["adapters"].items():
+            path = Path(entry["path"])
+            self.paths[name] = path if path.is_absolute() else BASE_DIR / path
+            for regit_num in entry.get("regit_nums") or []:
+                self.by_regit[str(regit_num)] = name
+            for domain in entry.get("domains") or []:
+                self.by_domain[domain] = name
+        if self.default != BASE_ADAPTER and self.default not in self.paths:
+            raise ValueError(f"default 어댑터 '{self.default}'가 adapters에 없습니다")
+
+    @classmethod
+    def from_yaml(cls, path=ADAPTERS_CONFIG):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(yaml.safe_load(f))
+
+    def route(self, regit_num=None, domain=None, adapter=None):
+        """명시적 어댑터 > regit_num 매핑 > domain 매핑 > default 순서"""
+        if adapter:
+            if adapter != BASE_ADAPTER and adapter not in self.paths:
+                raise KeyError(f"알 수 없는 어댑터: {adapter}")
+            return adapter
+        if regit_num is not None and str(regit_num) in self.by_regit:
+            return self.by_regit[str(regit_num)]
+        if domain and domain in self.by_domain:
+            return self.by_domain[domain]
+        return self.default
+
+
+class MultiLoraModel:
+    """base 모델 1개를 상주시키고 LoRA 어댑터를 이름별로 올려 요청마다 선택
+
+    어댑터는 처음 요청될 때 로드하고 max_loaded개를 넘으면 오래 안 쓴 것부터 내린다.
+    (LoRA 가중치는 base 대비 작으므로 어댑터 수가 늘어도 메모리는 거의 일정)
+    """
+
+    def __init__(self, router: AdapterRouter, token=None, max_loaded=8):
+        self.router = router
+        self.max_loaded = max_loaded
+        self.tokenizer = AutoTokenizer.from_pretrained(router.base_model, token=token)
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self._base = AutoModelForCausalLM.from_pretrained(
+            router.base_model,
+            token=token,
+            torch_dtype=torch.bfloat16,
+            device_map="auto",
+        )
+        self._base.eval()
+        self.model = None  # 첫 어댑터 로드 시 PeftModel로 감싼다
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"loads": 0, "evictions": 0, "swaps": 0, "mixed_batches": 0}
+
+    def _check_base(self, name, path):
+        with open(path / "adapter_config.json", "r", encoding="utf-8") as f:
+            expected = json.load(f).get("base_model_name_or_path")
+        if expected and expected != self.router.base_model:
+            raise ValueError(f"어댑터 '{name}'의 base 모델({expected})이 서버 base 모델({self.router.base_model})과 다릅니다")
+
+    def _ensure(self, names):
+        """배치에 필요한 어댑터를 로드하고, 상한을 넘으면 이번 배치에 안 쓰는 어댑터부터 해제"""
+        for name in names:
+            if name == BASE_ADAPTER:
+                continue
+            if name in self._loaded:
+                self._loaded.move_to_end(name)
+                continue
+            path = self.router.paths[name]
+            self._check_base(name, path)
+            if self.model is None:
+                self.model = PeftModel.from_pretrained(self._base, path, adapter_name=name)
+                self.model.eval()
+            else:
+                self.model.load_adapter(path, adapter_name=name)
+            self._loaded[name] = path
+            self.stats["loads"] += 1
+            print(f"어댑터 로드: {name} ({path})")
+
+        while len(self._loaded) > self.max_loaded:
+            victim = next((n for n in self._loaded if n not in names), None)
+            if victim is None:
+                break
+            self.model.delete_adapter(victim)
+            del self._loaded[victim]
+            self.stats["evictions"] += 1
+            print(f"어댑터 해제: {victim}")
+
+    def generate(self, prompts, adapters, mixed=True, max_new_tokens=MAX_NEW_TOKENS, constrained=False):
+        """prompts[i]를 adapters[i] 어댑터로 생성. (응답 리스트, 생성 토큰 수) 반환
+
+        mixed=True면 서로 다른 어댑터 요청을 PEFT adapter_names로 한 배치에서 생성하고,
+        False면 어댑터별로 나눠 set_adapter로 교체하며 생성한다.
+        """
+        with self._lock:
+            self._ensure(list(dict.fromkeys(adapters)))
+            if self.model is None:
+                # 아직 어댑터가 없으면 base 모델 그대로
+                return generate_batch(self._base, self.tokenizer, prompts,
+                                      max_new_tokens=max_new_tokens, constrained=constrained)
+
+            groups = list(dict.fromkeys(adapters))
+            if mixed and len(groups) > 1:
+                self.stats["mixed_batches"] += 1
+                return generate_batch(self.model, self.tokenizer, prompts, max_new_tokens=max_new_tokens,
+                                      constrained=constrained, adapter_names=list(adapters))
+
+            responses = [None] * len(prompts)
+            generated = 0
+            for name in groups:
+                idxs = [i for i, a in enumerate(adapters) if a == name]
+                batch = [prompts[i] for i in idxs]
+                if name == BASE_ADAPTER:
+                    with self.model.disable_adapter():
+                        outs, n = generate_batch(self.model, self.tokenizer, batch,
+                                                 max_new_tokens=max_new_tokens, constrained=constrained)
+                else:
+                    if self.model.active_adapter != name:
+                        self.model.set_adapter(name)
+                        self.stats["swaps"] += 1
+                    outs, n = generate_batch(self.model, self.tokenizer, batch,
+                                             max_new_tokens=max_new_tokens, constrained=constrained)
+                for i, out in zip(idxs, outs):
+                    responses[i] = out
+                generated += n
+            return responses, generated
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "base_model": self.router.base_model,
+                "loaded_adapters": list(self._loaded),
+                "max_loaded": self.max_loaded,
+                **self.stats,
+            }
@@ -0,0 +1,221 @@
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+
+import torch
+
+from generation import generate_responses, load_merged, load_model, summarize_throughput
+from prefix_cache import PrefixCache
+from prompt_format import build_prompt
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def core_groups(workers, cores=None):
+    """코어 목록을 workers개의 연속 구간으로 분할 (코어가 부족하면 코어 1개씩 겹쳐 배정)"""
+    cores = available_cores() if cores is None else list(cores)
+    per, extra = divmod(len(cores), workers)
+    if per == 0:
+        return [[cores[w % len(cores)]] for w in range(workers)]
+    groups, start = [], 0
+    for w in range(workers):
+        n = per + (1 if w < extra else 0)
+        groups.append(cores[start:start + n])
+        start += n
+    return groups
+
+
+def shard_indices(prompts, workers):
+    """길이 내림차순으로 번갈아 배정해 워커별 작업량을 비슷하게 맞춘 인덱스 샤드"""
+    order = sorted(range(len(prompts)), key=lambda i: (-len(prompts[i]), i))
+    return [sorted(order[w::workers]) for w in range(workers)]
+
+
+def _worker(task):
+    """워커 프로세스: 지정 코어에 고정 -> 모델 로드 -> 자기 샤드 생성"""
+    # CPU 평가 전용: 워커들이 같은 GPU를 나눠 잡지 않도록
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    cores = task["cores"]
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(len(cores))
+    torch.set_num_interop_threads(1)
+
+    spec = task["spec"]
+    start = time.perf_counter()
+    if spec.get("merged_path"):
+        model, tokenizer = load_merged(spec["merged_path"])
+    else:
+        model, tokenizer = load_model(spec["base_model"], spec["adapter_path"], token=spec.get("token"))
+    load_seconds = time.perf_counter() - start
+
+    prefix_cache = None
+    if task["prefix_cache"] > 0:
+        prefix_cache = PrefixCache(model, tokenizer, max_entries=task["prefix_cache"])
+
+    start = time.perf_counter()
+    responses, batch_stats = generate_responses(
+        model, tokenizer, task["prompts"], batch_size=task["batch_size"],
+        prefix_cache=prefix_cache, constrained=task["constrained"],
+    )
+    return {
+        "rank": task["rank"],
+        "cores": cores,
+        "indices": task["indices"],
+        "responses": responses,
+        "batch_stats": batch_stats,
+        "load_seconds": round(load_seconds, 3),
+        "generate_seconds": round(time.perf_counter() - start, 3),
+        "prefix_cache": prefix_cache.stats() if prefix_cache is not None else None,
+    }
+
+
+def _merge_prefix_stats(stats):
+    stats = [s for s in stats if s is not None]
+    if not stats:
+        return None
+    merged = {k: sum(s[k] for s in stats) for k in ("entries", "hits", "misses", "bypass", "evictions")}
+    merged["max_entries"] = stats[0]["max_entries"]
+    lookups = merged["hits"] + merged["misses"] + merged["bypass"]
+    merged["hit_rate"] = round(merged["hits"] / lookups, 4) if lookups else 0.0
+    return merged
+
+
+def merge_shards(total, shards):
+    """워커 결과를 rank 순서로 합쳐 원래 순서의 응답과 배치 통계를 만든다 (완료 순서와 무관)"""
+    responses = [None] * total
+    batch_stats = []
+    for shard in sorted(shards, key=lambda s: s["rank"]):
+        for i, response in zip(shard["indices"], shard["responses"]):
+            responses[i] = response
+        batch_stats.extend({"worker": shard["rank"], **s} for s in shard["batch_stats"])
+    return responses, batch_stats
+
+
+def parallel_responses(prompts, workers, spec, batch_size=1, prefix_cache=0, constrained=False, cores=None):
+    """프롬프트를 workers개 프로세스에 나눠 CPU에서 생성. (응답, 배치 통계, 병렬 실행 정보) 반환
+
+    spec: {"base_model", "adapter_path", "token"} 또는 {"merged_path"}
+    """
+    groups = core_groups(workers, cores)
+    shards = shard_indices(prompts, workers)
+    tasks = [
+        {
+            "rank": w,
+            "cores": groups[w],
+            "indices": shards[w],
+            "prompts": [prompts[i] for i in shards[w]],
+            "spec": spec,
+            "batch_size": batch_size,
+            "prefix_cache": prefix_cache,
+            "constrained": constrained,
+        }
+        for w in range(workers)
+    ]
+
+    print(f"병렬 평가: 워커 {workers}개, 워커당 코어 {[len(g) for g in groups]}")
+    start = time.perf_counter()
+    # fork된 자식에서 torch 스레드 풀이 꼬이지 않도록 spawn 사용
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        shards_out = list(pool.map(_worker, tasks))
+    wall_seconds = time.perf_counter() - start
+
+    responses, batch_stats = merge_shards(len(prompts), shards_out)
+    generated = sum(s["generated_tokens"] for s in batch_stats)
+    info = {
+        "workers": workers,
+        "wall_seconds": round(wall_seconds, 3),
+        "wall_tokens_per_sec": round(generated / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        "per_worker": [
+            {
+                "rank": s["rank"],
+                "cores": s["cores"],
+                "samples": len(s["indices"]),
+                "load_seconds": s["load_seconds"],
+                "generate_seconds": s["generate_seconds"],
+                **summarize_throughput(s["batch_stats"]),
+            }
+            for s in sorted(shards_out, key=lambda s: s["rank"])
+        ],
+        "prefix_cache": _merge_prefix_stats([s["prefix_cache"] for s in shards_out]),
+    }
+    return responses, batch_stats, info
+
+
+def main():
+    """워커 수 1/2/4/8 스케일링 측정 (evaluate.py 설정 사용)"""
+    # evaluate.py가 이 모듈을 import하므로 실행 시점에 가져온다
+    from evaluate import (
+        ADAPTER_PATH, BASE_MODEL, BATCH_SIZE, CONSTRAINED, LABEL_PATH, MERGED_MODEL_PATH, SEED_PATH,
+        load_jsonl, score_responses,
+    )
+
+    worker_counts = [int(n) for n in os.environ.get("SCALING_WORKERS", "1,2,4,8").split(",")]
+    samples = int(os.environ.get("EVAL_SAMPLES", "0"))
+
+    with open(SEED_PATH, "r", encoding="utf-8") as f:
+        seeds = json.load(f)
+    labels = load_jsonl(LABEL_PATH)
+    if samples:
+        seeds, labels = seeds[:samples], labels[:samples]
+    prompts = [build_prompt(s["user_query"], s["regit_num"], s["claim_text"]) for s in seeds]
+
+    if MERGED_MODEL_PATH:
+        spec = {"merged_path": MERGED_MODEL_PATH}
+    else:
+        spec = {"base_model": BASE_MODEL, "adapter_path": str(ADAPTER_PATH), "token": os.environ.get("HF_TOKEN")}
+
+    rows = []
+    baseline = None
+    for workers in worker_counts:
+        responses, _, info = parallel_responses(
+            prompts, workers, spec, batch_size=BATCH_SIZE, constrained=CONSTRAINED,
+        )
+        results, _, _, _ = score_responses(seeds, labels, responses, raw_json=CONSTRAINED)
+        if baseline is None:
+            baseline = (info["wall_seconds"], responses)
+        rows.append({
+            "workers": workers,
+            "cores_per_worker": min(len(w["cores"]) for w in info["per_worker"]),
+            "wall_seconds": info["wall_seconds"],
+            "max_load_seconds": max(w["load_seconds"] for w in info["per_worker"]),
+            "samples_per_sec": round(len(prompts) / info["wall_seconds"], 3),
+            "wall_tokens_per_sec": info["wall_tokens_per_sec"],
+            "speedup": round(baseline[0] / info["wall_seconds"], 2),
+            "efficiency": round(baseline[0] / info["wall_seconds"] / (workers / worker_counts[0]), 3),
+            "risk_level_accuracy": results["risk_level_correct"] / results["total"] * 100,
+            # 스레드 수가 달라지면 부동소수 합산 순서가 달라 greedy 결과가 드물게 바뀔 수 있다
+            "same_as_first": responses == baseline[1],
+        })
+
+    print("\n[스케일링 결과]")
+    print(f"{'workers':>7} | {'cores/w':>7} | {'wall(s)':>8} | {'samples/s':>9} | {'tok/s':>8} | "
+          f"{'speedup':>7} | {'eff':>5} | {'risk acc':>8} | same")
+    print("-" * 88)
+    for r in rows:
+        print(f"{r['workers']:>7} | {r['cores_per_worker']:>7} | {r['wall_seconds']:>8.1f} | "
+              f"{r['samples_per_sec']:>9.3f} | {r['wall_tokens_per_sec']:>8.1f} | {r['speedup']:>7.2f} | "
+              f"{r['efficiency']:>5.2f} | {r['risk_level_accuracy']:>7.1f}% | {r['same_as_first']}")
+
+    report_path = ADAPTER_PATH / "eval_scaling.json"
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "samples": len(prompts),
+            "cores": len(available_cores()),
+            "batch_size": BATCH_SIZE,
+            "constrained": CONSTRAINED,
+            "merged_model": MERGED_MODEL_PATH,
+            "rows": rows,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\n결과 저장: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
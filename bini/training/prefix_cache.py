@@ -0,0 +1,103 @@
+import copy
+from collections import OrderedDict
+
+import torch
+
+from prompt_format import PREFIX_MARKER
+
+
+def split_prompt(prompt: str):
+    """프롬프트를 (공유 prefix, 나머지)로 분리. 마커가 없으면 prefix는 빈 문자열"""
+    idx = prompt.find(PREFIX_MARKER)
+    if idx == -1:
+        return "", prompt
+    cut = idx + len(PREFIX_MARKER)
+    return prompt[:cut], prompt[cut:]
+
+
+class PrefixCache:
+    """공유 prompt prefix의 past_key_values를 한 번만 계산해 재사용하는 LRU 캐시
+
+    키는 prefix 텍스트이므로 prefix가 같은 호출끼리 KV를 공유한다. 특허별 재사용은 청구항이
+    제품 설명보다 앞에 오는 CLAIM_FIRST=1 프롬프트에서만 생긴다 (기본 순서는 system 블록만 공유).
+    hits는 저장된 KV를 실제로 이어 쓴 호출만 센다 (토큰 경계가 맞지 않아 건너뛴 호출은 bypass).
+    batch size 1 생성 전용 (left padding 배치는 prefix 위치가 행마다 달라 재사용 불가).
+    """
+
+    def __init__(self, model, tokenizer, max_entries=8):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # prefix -> (prefix_ids, past_key_values)
+        self.hits = 0
+        self.misses = 0
+        self.bypass = 0  # 토큰 경계가 맞지 않아 캐시를 쓰지 못한 호출
+        self.evictions = 0
+
+    def _reusable(self, prefix_ids, input_ids):
+        """prefix 토큰이 전체 프롬프트 토큰의 앞부분과 정확히 일치할 때만 재사용 가능"""
+        n = prefix_ids.shape[1]
+        return n < input_ids.shape[1] and torch.equal(input_ids[0, :n], prefix_ids[0])
+
+    def _lookup(self, prefix: str, input_ids):
+        """재사용할 (prefix_ids, past_key_values). 토큰 경계가 맞지 않으면 None"""
+        entry = self._entries.get(prefix)
+        if entry is not None:
+            self._entries.move_to_end(prefix)
+            if not self._reusable(entry[0], input_ids):
+                self.bypass += 1
+                return None
+            self.hits += 1
+            return entry
+
+        prefix_ids = self.tokenizer(prefix, return_tensors="pt")["input_ids"].to(self.model.device)
+        if not self._reusable(prefix_ids, input_ids):
+            # KV를 계산하기 전에 걸러낸다 (쓰지 못할 항목은 저장하지 않음)
+            self.bypass += 1
+            return None
+
+        self.misses += 1
+        with torch.no_grad():
+            out = self.model(input_ids=prefix_ids, use_cache=True)
+        entry = (prefix_ids, out.past_key_values)
+
+        self._entries[prefix] = entry
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def generate(self, prompt: str, max_new_tokens: int, **generate_kwargs):
+        """prefix KV를 재사용하여 생성. 생성된 전체 시퀀스(프롬프트 포함) 반환"""
+        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+        input_ids = inputs["input_ids"]
+        prefix, _ = split_prompt(prompt)
+
+        past_key_values = None
+        entry = self._lookup(prefix, input_ids) if prefix else None
+        if entry is not None:
+            # generate가 캐시를 확장하므로 원본은 복사해서 넘긴다
+            past_key_values = copy.deepcopy(entry[1])
+
+        with torch.no_grad():
+            outputs = self.model.generate(
+                **inputs,
+                past_key_values=past_key_values,
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                pad_token_id=self.tokenizer.pad_token_id,
+                **generate_kwargs,
+            )
+        return outputs
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.bypass
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypass": self.bypass,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
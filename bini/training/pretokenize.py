@@ -0,0 +1,237 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import torch
+import yaml
+from dotenv import load_dotenv
+from transformers import AutoTokenizer
+from pathlib import Path
+
+load_dotenv()
+
+BASE_DIR = Path(__file__).resolve().parents[1]  # bini/
+
+DATA_PATH = BASE_DIR / "data/processed/sft_train.jsonl"
+CACHE_ROOT = BASE_DIR / "data/cache/sft_tokens"
+
+ASSISTANT_TOKEN = "<assistant>"
+CACHE_VERSION = 1  # 캐시 포맷/마스킹 규칙이 바뀌면 올린다
+
+_ARRAYS = ("input_ids", "labels", "position_ids", "offsets")
+
+
+def _file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _tokenizer_hash(tokenizer):
+    h = hashlib.sha256()
+    h.update(tokenizer.name_or_path.encode("utf-8"))
+    h.update(str(len(tokenizer)).encode("utf-8"))
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is not None:
+        h.update(backend.to_str().encode("utf-8"))
+    return h.hexdigest()
+
+
+def cache_key(tokenizer, data_path, max_length, pack):
+    """토크나이저 + 데이터 + 설정으로 정해지는 캐시 키"""
+    h = hashlib.sha256()
+    for part in (CACHE_VERSION, _tokenizer_hash(tokenizer), _file_hash(data_path), max_length, pack):
+        h.update(str(part).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def tokenize_example(tokenizer, text, max_length):
+    """한 번의 토크나이즈로 input_ids와 labels 생성
+
+    offset_mapping으로 <assistant> 태그 이후에 시작하는 토큰만 학습 대상으로 남긴다.
+    (프롬프트를 다시 토크나이즈해 길이를 세는 방식은 경계 토큰 병합에 취약하다)
+    """
+    enc = tokenizer(
+        text,
+        truncation=True,
+        max_length=max_length,
+        return_offsets_mapping=True,
+    )
+    input_ids = enc["input_ids"]
+
+    tag = text.find(ASSISTANT_TOKEN)
+    if tag == -1:
+        # assistant 토큰이 없으면 전체 학습
+        return input_ids, list(input_ids)
+
+    boundary = tag + len(ASSISTANT_TOKEN)
+    labels = [
+        tok if start >= boundary and end > start else -100
+        for tok, (start, end) in zip(input_ids, enc["offset_mapping"])
+    ]
+    return input_ids, labels
+
+
+def pack_examples(lengths, max_length):
+    """First-fit decreasing으로 예제를 max_length 시퀀스에 채워 넣은 인덱스 그룹 반환"""
+    order = sorted(range(len(lengths)), key=lambda i: -lengths[i])
+    bins = []  # [(남은 길이, [인덱스])]
+    for i in order:
+        for b in bins:
+            if b[0] >= lengths[i]:
+                b[0] -= lengths[i]
+                b[1].append(i)
+                break
+        else:
+            bins.append([max_length - lengths[i], [i]])
+    return [sorted(b[1]) for b in bins]
+
+
+def build_cache(tokenizer, data_path=DATA_PATH, max_length=2048, pack=True, cache_root=CACHE_ROOT):
+    """sft_train.jsonl을 토크나이즈(+패킹)하여 NumPy 캐시로 저장. 캐시 디렉토리 반환
+
+    같은 키의 캐시가 있으면 그대로 재사용한다.
+    """
+    key = cache_key(tokenizer, data_path, max_length, pack)
+    cache_dir = Path(cache_root) / key
+    if (cache_dir / "meta.json").exists():
+        print(f"토큰 캐시 재사용: {cache_dir}")
+        return cache_dir
+
+    print(f"토큰 캐시 생성: {cache_dir}")
+    examples = []
+    with open(data_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                examples.append(tokenize_example(tokenizer, json.loads(line)["text"], max_length))
+
+    lengths = [len(ids) for ids, _ in examples]
+    groups = pack_examples(lengths, max_length) if pack else [[i] for i in range(len(examples))]
+
+    input_ids, labels, position_ids, offsets = [], [], [], [0]
+    for group in groups:
+        for i in group:
+            ids, lab = examples[i]
+            input_ids.extend(ids)
+            # 첫 라벨은 이전 예제의 다음 토큰을 예측하지 않도록 마스킹
+            labels.extend([-100] + lab[1:])
+            # 예제마다 position이 0부터 다시 시작 -> 예제 경계
+            position_ids.extend(range(len(ids)))
+        offsets.append(len(input_ids))
+
+    tmp_dir = cache_dir.with_name(cache_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    np.save(tmp_dir / "input_ids.npy", np.asarray(input_ids, dtype=np.int32))
+    np.save(tmp_dir / "labels.npy", np.asarray(labels, dtype=np.int32))
+    np.save(tmp_dir / "position_ids.npy", np.asarray(position_ids, dtype=np.int32))
+    np.save(tmp_dir / "offsets.npy", np.asarray(offsets, dtype=np.int64))
+
+    meta = {
+        "key": key,
+        "data_path": str(data_path),
+        "tokenizer": tokenizer.name_or_path,
+        "max_length": max_length,
+        "pack": pack,
+        "examples": len(examples),
+        "sequences": len(groups),
+        "tokens": len(input_ids),
+        "fill_ratio": round(len(input_ids) / (len(groups) * max_length), 4) if groups else 0.0,
+    }
+    with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    tmp_dir.rename(cache_dir)
+
+    print(f"  예제 {meta['examples']}개 -> 시퀀스 {meta['sequences']}개 "
+          f"(토큰 {meta['tokens']}, 채움률 {meta['fill_ratio'] * 100:.1f}%)")
+    return cache_dir
+
+
+class PackedDataset(torch.utils.data.Dataset):
+    """memory-mapped 토큰 캐시 위의 Dataset (시퀀스 단위)"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        arrays = {name: np.load(self.cache_dir / f"{name}.npy", mmap_mode="r") for name in _ARRAYS}
+        self.input_ids = arrays["input_ids"]
+        self.labels = arrays["labels"]
+        self.position_ids = arrays["position_ids"]
+        self.offsets = arrays["offsets"]
+        with open(self.cache_dir / "meta.json", "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        start, end = int(self.offsets[idx]), int(self.offsets[idx + 1])
+        return {
+            "input_ids": np.array(self.input_ids[start:end], dtype=np.int64),
+            "labels": np.array(self.labels[start:end], dtype=np.int64),
+            "position_ids": np.array(self.position_ids[start:end], dtype=np.int64),
+        }
+
+
+class PackedCollator:
+    """패킹된 시퀀스를 배치 최장 길이로 패딩하고 예제 경계를 넘지 않는 4D attention mask 생성"""
+
+    def __init__(self, pad_token_id, dtype=torch.float32):
+        self.pad_token_id = pad_token_id
+        self.dtype = dtype
+
+    def __call__(self, features):
+        max_len = max(len(f["input_ids"]) for f in features)
+        batch = len(features)
+
+        input_ids = torch.full((batch, max_len), self.pad_token_id, dtype=torch.long)
+        labels = torch.full((batch, max_len), -100, dtype=torch.long)
+        position_ids = torch.zeros((batch, max_len), dtype=torch.long)
+        # 예제 번호 (패딩은 -1)
+        doc_ids = torch.full((batch, max_len), -1, dtype=torch.long)
+
+        for row, f in enumerate(features):
+            n = len(f["input_ids"])
+            pos = torch.as_tensor(f["position_ids"])
+            input_ids[row, :n] = torch.as_tensor(f["input_ids"])
+            labels[row, :n] = torch.as_tensor(f["labels"])
+            position_ids[row, :n] = pos
+            doc_ids[row, :n] = torch.cumsum((pos == 0).long(), dim=0)
+
+        # 같은 예제 안에서만, causal 하게 attend
+        same_doc = doc_ids[:, :, None] == doc_ids[:, None, :]
+        causal = torch.tril(torch.ones((max_len, max_len), dtype=torch.bool))
+        valid = (doc_ids[:, None, :] >= 0)
+        allowed = same_doc & causal[None] & valid
+        # 패딩 행도 자기 자신은 보도록 하여 softmax NaN 방지
+        allowed |= torch.eye(max_len, dtype=torch.bool)[None]
+
+        attention_mask = torch.zeros((batch, 1, max_len, max_len), dtype=self.dtype)
+        attention_mask.masked_fill_(~allowed[:, None], torch.finfo(self.dtype).min)
+
+        return {
+            "input_ids": input_ids,
+            "labels": labels,
+            "position_ids": position_ids,
+            "attention_mask": attention_mask,
+            # Gemma 3 모델은 token_type_ids 필요
+            "token_type_ids": torch.zeros_like(input_ids),
+        }
+
+
+def main():
+    cfg = yaml.safe_load(open(BASE_DIR / "training/lora_config.yaml", "r", encoding="utf-8"))
+    token = os.environ.get("HF_TOKEN", None)
+    tokenizer = AutoTokenizer.from_pretrained(cfg["base_model"], token=token)
+    build_cache(
+        tokenizer,
+        max_length=cfg.get("max_seq_length", 2048),
+        pack=bool(cfg.get("packing", True)),
+    )
+
+
+if __name__ == "__main__":
+    main()
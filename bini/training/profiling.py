@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import secrets
+import itertools
+import threading
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# 1이면 단계별 span 기록 (0이면 span()이 공유 no-op 객체를 돌려줘 오버헤드가 거의 없다)
+PROFILE = os.environ.get("PROFILE", "0") == "1"
+
+# span 파일: chrome (chrome://tracing, Perfetto) 또는 otlp (OpenTelemetry OTLP/JSON)
+PROFILE_TRACE = Path(os.environ.get("PROFILE_TRACE", BASE_DIR / "outputs/profile_trace.json"))
+PROFILE_FORMAT = os.environ.get("PROFILE_FORMAT", "chrome")
+
+# torch profiler로 캡처할 샘플 인덱스 (예: "0,17,42"). 해당 샘플이 든 generate 배치를 통째로 캡처.
+# seed 인덱스가 아니라 generate_responses에 넘긴 프롬프트 순서 기준이다. evaluate.py에서는 1단계 스크리닝으로
+# 종료된 케이스를 뺀 뒤의 순서이므로 시작할 때 출력하는 프롬프트 -> seed 인덱스 대응을 참고한다
+PROFILE_TORCH_SAMPLES = {int(i) for i in os.environ.get("PROFILE_TORCH_SAMPLES", "").split(",") if i.strip()}
+PROFILE_TORCH_DIR = BASE_DIR / "outputs/profile_torch"
+
+# perf_counter_ns -> epoch ns (OTLP 타임스탬프용)
+_EPOCH_OFFSET_NS = time.time_ns() - time.perf_counter_ns()
+
+_spans = []
+_local = threading.local()
+_ids = itertools.count(1)
+_enabled = PROFILE
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "span_id", "parent_id", "tid", "start", "end")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.span_id = next(_ids)
+        self.parent_id = stack[-1].span_id if stack else None
+        self.tid = threading.get_native_id()
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.end = time.perf_counter_ns()
+        _local.stack.pop()
+        _spans.append(self)
+        return False
+
+    def set(self, **attrs):
+        """span 안에서 알게 된 값(생성 토큰 수 등)을 속성으로 추가"""
+        self.attrs.update(attrs)
+
+
+def span(name, **attrs):
+    """with span("generate", batch=3): ... 로 단계 구간 기록"""
+    if not _enabled:
+        return _NOOP
+    return _Span(name, attrs)
+
+
+def enable(flag=True):
+    global _enabled
+    _enabled = flag
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    _spans.clear()
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    pos = (len(values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def summary():
+    """단계별 집계 리스트 (total 내림차순). self_ms는 자식 span 시간을 뺀 값"""
+    if not _spans:
+        return []
+    child_ns = {}
+    for s in _spans:
+        if s.parent_id is not None:
+            child_ns[s.parent_id] = child_ns.get(s.parent_id, 0) + (s.end - s.start)
+    wall_ns = max(s.end for s in _spans) - min(s.start for s in _spans)
+
+    groups = {}
+    for s in _spans:
+        g = groups.setdefault(s.name, {"durations": [], "self_ns": 0})
+        g["durations"].append(s.end - s.start)
+        g["self_ns"] += s.end - s.start - child_ns.get(s.span_id, 0)
+
+    rows = []
+    for name, g in groups.items():
+        d = g["durations"]
+        rows.append({
+            "stage": name,
+            "count": len(d),
+            "total_ms": round(sum(d) / 1e6, 3),
+            "self_ms": round(g["self_ns"] / 1e6, 3),
+            "mean_ms": round(sum(d) / len(d) / 1e6, 3),
+            "p50_ms": round(_percentile(d, 50) / 1e6, 3),
+            "p95_ms": round(_percentile(d, 95) / 1e6, 3),
+            "self_share": round(g["self_ns"] / wall_ns, 4) if wall_ns else 0.0,
+        })
+    return sorted(rows, key=lambda r: -r["total_ms"])
+
+
+def print_summary(rows):
+    print(f"\n[단계별 시간] (self = 하위 단계 제외)")
+    print(f"{'stage':<16} | {'count':>6} | {'total ms':>10} | {'self ms':>10} | {'mean ms':>9} | "
+          f"{'p50 ms':>9} | {'p95 ms':>9} | {'self %':>6}")
+    print("-" * 96)
+    for r in rows:
+        print(f"{r['stage']:<16} | {r['count']:>6} | {r['total_ms']:>10.1f} | {r['self_ms']:>10.1f} | "
+              f"{r['mean_ms']:>9.2f} | {r['p50_ms']:>9.2f} | {r['p95_ms']:>9.2f} | {r['self_share'] * 100:>5.1f}%")
+
+
+def _chrome_trace():
+    pid = os.getpid()
+    events = [{
+        "name": s.name,
+        "cat": "bini",
+        "ph": "X",
+        "ts": s.start / 1000,
+        "dur": (s.end - s.start) / 1000,
+        "pid": pid,
+        "tid": s.tid,
+        "args": s.attrs,
+    } for s in sorted(_spans, key=lambda s: s.start)]
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_trace(service_name):
+    trace_id = secrets.token_hex(16)
+    span_ids = {s.span_id: secrets.token_hex(8) for s in _spans}
+    spans = []
+    for s in sorted(_spans, key=lambda s: s.start):
+        row = {
+            "traceId": trace_id,
+            "spanId": span_ids[s.span_id],
+            "name": s.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(s.start + _EPOCH_OFFSET_NS),
+            "endTimeUnixNano": str(s.end + _EPOCH_OFFSET_NS),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attrs.items()]
+                          + [{"key": "thread.id", "value": _otlp_value(s.tid)}],
+        }
+        if s.parent_id is not None:
+            row["parentSpanId"] = span_ids[s.parent_id]
+        spans.append(row)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{"scope": {"name": "bini.profiling"}, "spans": spans}],
+    }]}
+
+
+def write_trace(path=PROFILE_TRACE, fmt=PROFILE_FORMAT, service_name="bini-evaluate"):
+    data = _otlp_trace(service_name) if fmt == "otlp" else _chrome_trace()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    return path
+
+
+def finish(service_name="bini-evaluate"):
+    """span 파일 저장 + 요약표 출력. 요약 리스트 반환 (비활성이면 None)"""
+    if not _enabled or not _spans:
+        return None
+    path = write_trace(service_name=service_name)
+    rows = summary()
+    print_summary(rows)
+    print(f"span 파일 ({PROFILE_FORMAT}): {path}")
+    return rows
+
+
+class _TorchCapture:
+    def __init__(self, tag):
+        import torch
+
+        self.tag = tag
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        self.prof = torch.profiler.profile(activities=activities, record_shapes=True, profile_memory=True)
+
+    def __enter__(self):
+        self.prof.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self.prof.__exit__(*exc)
+        PROFILE_TORCH_DIR.mkdir(parents=True, exist_ok=True)
+        path = PROFILE_TORCH_DIR / f"{self.tag}.json"
+        self.prof.export_chrome_trace(str(path))
+        print(f"  torch profiler 캡처: {path}")
+        print(self.prof.key_averages().table(sort_by="self_cpu_time_total", row_limit=15))
+        return False
+
+
+def torch_profile(indices):
+    """indices 중 PROFILE_TORCH_SAMPLES에 든 샘플이 있으면 torch profiler 캡처, 아니면 no-op"""
+    selected = sorted(PROFILE_TORCH_SAMPLES.intersection(indices))
+    if not selected:
+        return _NOOP
+    return _TorchCapture("sample_" + "_".join(str(i) for i in selected))
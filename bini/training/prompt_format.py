@@ -0,0 +1,31 @@
+import os
+
+# 학습(build_sft_jsonl.py)과 추론/평가가 함께 쓰는 프롬프트 포맷. 두 쪽이 글자 하나까지 같아야 한다
+
+# 1이면 프롬프트에서 청구항을 제품 설명보다 앞에 둔다 (같은 특허끼리 prefix KV 캐시 공유).
+# 학습 데이터와 추론 모두 같은 값으로 실행해야 한다
+CLAIM_FIRST = os.environ.get("CLAIM_FIRST", "0") == "1"
+
+SYSTEM = (
+    "너는 특허 청구항과 사용자 제품 구성을 비교하여 구성요소별 대응 여부를 판단하고, "
+    "그 결과에 따라 특허 침해 리스크를 평가하는 모델이다. "
+    "최종 응답은 반드시 JSON 형식으로 출력한다."
+)
+
+# build_prompt 포맷에서 사용자 입력 직전까지가 호출 간 공유 가능한 prefix
+# - 기본 순서 (제품 설명 → 청구항): system 블록만 공유 (모든 호출이 같은 prefix 1개)
+# - CLAIM_FIRST=1 (청구항 → 제품 설명): system + 특허 청구항까지 공유 (특허별 prefix)
+PREFIX_MARKER = "[사용자 제품 설명]\n"
+
+
+def build_prompt(user_query: str, regit_num: str, claim_text: str) -> str:
+    query_block = f"{PREFIX_MARKER}{user_query}\n\n"
+    claim_block = f"[특허 정보]\n특허번호: {regit_num}\n청구항:\n{claim_text}\n\n"
+    return (
+        f"<system>\n{SYSTEM}\n</system>\n"
+        f"<user>\n"
+        + (claim_block + query_block if CLAIM_FIRST else query_block + claim_block) +
+        f"구성요소별 대응 여부를 판단하고, 침해 리스크를 평가하라.\n"
+        f"</user>\n"
+        f"<assistant>\n"
+    )
@@ -0,0 +1,520 @@
+import os
+import re
+import json
+import math
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import NamedTuple
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+SEED_DIR = BASE_DIR / "data/raw/seeds"
+SEED_PATH = SEED_DIR / "seed_cases.json"
+LABEL_PATH = BASE_DIR / "data/processed/train.jsonl"
+REPORT_PATH = BASE_DIR / "outputs/screener_report.json"
+
+# 핵심 구성요소 커버리지가 이 값 미만이면 "대응 없음"으로 본다 (0~1).
+# 기본값은 held_out_sweep(특허 단위 leave-one-out)에서 precision 1.0을 지키며 가장 많이 스크리닝한 값.
+# 147개 라벨 기준 16개 스크리닝, 낮음 recall 0.242이고, 0.8부터 오판정이 생긴다
+SCREEN_THRESHOLD = float(os.environ.get("SCREEN_THRESHOLD", "0.7"))
+
+# 청구항 코퍼스의 이 비율 이상(최소 2개 청구항)에 나오는 어절/영문 토큰은 특허마다 공통인 용도/제형/법률 표현으로 본다
+SCREEN_GENERIC_DF = float(os.environ.get("SCREEN_GENERIC_DF", "0.4"))
+
+# 문서 빈도를 셀 청구항 코퍼스 (kipris_ingest.py 청구항 저장소). 없으면 seed 파일들의 청구항
+SCREEN_CORPUS = Path(os.environ.get("SCREEN_CORPUS", BASE_DIR / "data/processed/claim_store"))
+
+# 임베딩 유사도 보조 (claim_index.ClaimEncoder 사용, sentence-transformers 필요)
+SCREEN_EMBED = os.environ.get("SCREEN_EMBED", "0") == "1"
+SCREEN_EMBED_THRESHOLD = float(os.environ.get("SCREEN_EMBED_THRESHOLD", "0.6"))
+
+# LLM 단독 결과 (evaluate.py의 evaluation_result.json). 같은 데이터셋이면 캐스케이드 정확도까지 계산
+SCREEN_LLM_RESULT = os.environ.get("SCREEN_LLM_RESULT")
+
+SWEEP = [0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8]
+
+# threshold를 고를 때 요구하는 스크리닝 precision (스크리닝 오판정은 그대로 정확도 손실이 된다)
+MIN_PRECISION = 1.0
+
+# 청구항 구성요소 경계: 구분자 / 나열 접속사 / "~을 포함하는" 류 연결 어구
+ELEMENT_SPLIT = re.compile(
+    r"[;,]|\s및/또는\s|\s및\s|\s또는\s"
+    r"|(?:을|를)\s*(?:유효성분으로\s*)?(?:함유|포함)하(?:는|며|고)(?![가-힣])"
+    r"|(?:으로|로)부터\s*선택(?:된|되는)\s|\s적어도\s하나의\s|\s하나\s이상의\s"
+    r"|(?:으로서|이고|하며|인데|것이고|것인)\s"
+)
+# 구성요소 앞뒤의 수식어 / 조사
+ELEMENT_PREFIX = re.compile(r"^(?:상기|적어도\s*(?:하나의|일\s*부분에)?|선택적으로|하나\s*이상의)\s*")
+ELEMENT_SUFFIX = re.compile(r"(?:을|를|이|가|은|는|의|에|로|으로|과|와)$")
+
+# 영문 성분명이 아닌 제품 등급 표기 (제품 설명 쪽)
+NOT_INGREDIENT_LATIN = {"spf"}
+
+# 제품 설명에서 성분을 구체적으로 밝히는 표현 ("X를 주성분으로", "X 기반의", "X 5%")
+INGREDIENT_CUE = re.compile(
+    r"([가-힣A-Za-z0-9][가-힣A-Za-z0-9\-/+.]*)\s*(?:을|를|이|가|은|는|랑|과|와)?\s*"
+    r"(?:주성분|기반|성분|함유|포함|넣|들어|배합|사용|쓴|썼|쓰고|위주|분산|\d)"
+)
+NOT_INGREDIENT = {
+    "제품", "화장품", "기능", "효과", "기능성", "성분", "성분은", "제형", "다른", "나머지", "무엇", "어떤",
+}
+PERCENT = re.compile(r"\d+(?:\.\d+)?\s*(?:%|중량)")
+LATIN_WORD = re.compile(r"[a-z][a-z0-9\-]{2,}")
+
+# 부정 / 미정 표현
+NEGATION = re.compile(
+    r"안\s*(?:넣|썼|쓰|쓴|써|들어|했)|않|미사용|없이|없고|없어|없습니다|없는|없음|아닙니다|아니|제외|빼고|without|\bfree\b"
+)
+UNDECIDED = re.compile(r"미정|아직|정하지|정해지|안\s*정|결정|확정|고민|검토|모르|기밀|조정\s*중|뭐\s*쓸|어떤")
+CLAUSE_SPLIT = re.compile(r"[,.;!?()]|(?:고|며|는데|지만|인데|이고)\s")
+
+HANGUL_WORD = re.compile(r"[가-힣]+")
+PARTICLE = re.compile(r"(?:으로서|으로|에서|에는|이고|하는|하며|하고|된|인|의|을|를|은|는|이|가|에|로|과|와|랑|도|만)$")
+
+
+class GenericVocab(NamedTuple):
+    """구성요소를 구분하는 데 쓸모없는 공통 표현 (청구항 코퍼스 문서 빈도로 결정)"""
+    words: frozenset   # 한글 어절 (조사 제거 전/후 모두)
+    grams: frozenset   # 공통 어절의 한글 2-gram (붙여 쓴 복합어 안의 공통 표현 제거용)
+    latin: frozenset   # 영문/숫자 토큰
+
+
+def generic_vocab(claim_texts, min_df=SCREEN_GENERIC_DF):
+    """청구항 문서 빈도가 min_df 비율 이상인 어절/토큰 (같은 청구항은 한 번만 센다)"""
+    docs = list(dict.fromkeys(claim_texts))
+    word_df, latin_df = Counter(), Counter()
+    for text in docs:
+        text = text.lower()
+        raw = HANGUL_WORD.findall(text)
+        word_df.update(set(raw) | {PARTICLE.sub("", w) for w in raw})
+        latin_df.update(set(LATIN_WORD.findall(text)))
+    cutoff = max(2, math.ceil(min_df * len(docs)))
+    words = {w for w, n in word_df.items() if n >= cutoff and len(w) >= 2}
+    grams = {w[i:i + 2] for w in words for i in range(len(w) - 1)}
+    latin = {w for w, n in latin_df.items() if n >= cutoff}
+    return GenericVocab(frozenset(words), frozenset(grams), frozenset(latin))
+
+
+def corpus_claims(corpus=SCREEN_CORPUS):
+    """문서 빈도용 청구항 텍스트. 청구항 저장소가 있으면 저장소, 없으면 seed 파일의 청구항"""
+    if (Path(corpus) / "manifest.json").exists():
+        from kipris_ingest import iter_store_claims
+
+        return [c["claim_text"] for c in iter_store_claims(corpus)]
+    from build_sft_jsonl import iter_json_array
+
+    return [s["claim_text"] for path in sorted(SEED_DIR.glob("seed_*.json")) for s in iter_json_array(path)]
+
+
+_default_vocab = None
+
+
+def default_vocab():
+    global _default_vocab
+    if _default_vocab is None:
+        _default_vocab = generic_vocab(corpus_claims())
+    return _default_vocab
+
+
+def _hangul_words(text, vocab):
+    """조사를 떼고 공통 표현을 뺀 한글 어절"""
+    words = []
+    for word in HANGUL_WORD.findall(text):
+        if word not in vocab.words:
+            word = PARTICLE.sub("", word)
+        if len(word) >= 2 and word not in vocab.words:
+            words.append(word)
+    return words
+
+
+def _grams(text, vocab):
+    """(한글 2-gram, 영문/숫자 토큰) 집합 쌍
+
+    한글은 어절을 이어 붙여 2-gram을 만든다 ("유기 자외선 차단제" / "유기자외선차단제" 표기 차이 흡수).
+    """
+    text = text.lower()
+    hangul = "".join(_hangul_words(text, vocab))
+    return {hangul[i:i + 2] for i in range(len(hangul) - 1)}, set(LATIN_WORD.findall(text))
+
+
+def split_elements(claim_text):
+    """청구항을 구성요소 문자열 리스트로 분리 (train.jsonl의 patent_element 단위에 가깝게)
+
+    괄호 안 구분자(영문 병기 등)에서는 자르지 않는다.
+    """
+    protected, depth = [], 0
+    for ch in claim_text:
+        depth += ch == "("
+        depth -= ch == ")"
+        protected.append("\0" if depth > 0 and ch in ",;" else ch)
+    text = re.sub(r"\s+", " ", "".join(protected))
+
+    elements, seen = [], set()
+    for part in ELEMENT_SPLIT.split(text):
+        part = part.replace("\0", ",").strip(" .")
+        # "...것을 특징으로 하는 X" -> X
+        part = re.sub(r"^.*특징으로\s*하는\s*", "", part)
+        part = ELEMENT_PREFIX.sub("", part)
+        for _ in range(2):
+            part = ELEMENT_SUFFIX.sub("", part).strip()
+        if len(part) < 2 or part in seen:
+            continue
+        seen.add(part)
+        elements.append(part)
+    return elements
+
+
+def element_forms(element):
+    """구성요소의 표기들: 괄호 밖 본문 + 괄호 안 병기 (예: 국문명 / 영문명)"""
+    inner = re.findall(r"\(([^)]*)\)", element)
+    outer = re.sub(r"\([^)]*\)", " ", element)
+    return [f for f in [outer, *inner] if f.strip()]
+
+
+def core_grams(element, vocab):
+    """표기별 (한글 2-gram, 영문 토큰) 쌍. 공통 표현만 남는 표기는 빼고, 전부 빠지면 용도/제형 요소로 본다"""
+    forms = []
+    for form in element_forms(element):
+        hangul, latin = _grams(form, vocab)
+        hangul -= vocab.grams
+        latin -= vocab.latin
+        if hangul or latin:
+            forms.append((hangul, latin))
+    return forms
+
+
+def coverage(forms, grams):
+    """구성요소가 텍스트에 포함된 비율. 표기/문자 체계별로 따로 계산해 최댓값
+
+    영문 토큰(예: C10-30, PPG-17)은 한 개만 일치해도 구성요소를 특정하므로 한글 n-gram과 섞지 않는다.
+    """
+    hangul, latin = grams
+    best = 0.0
+    for form_hangul, form_latin in forms:
+        if form_hangul:
+            best = max(best, len(form_hangul & hangul) / len(form_hangul))
+        if form_latin:
+            best = max(best, len(form_latin & latin) / len(form_latin))
+    return best
+
+
+def query_clauses(user_query, vocab):
+    """제품 설명을 절 단위로 나눠 (긍정 절 n-gram, 부정 절 n-gram) 반환"""
+    positive, negated = (set(), set()), (set(), set())
+    for clause in CLAUSE_SPLIT.split(user_query):
+        if not clause.strip():
+            continue
+        target = negated if NEGATION.search(clause.lower()) else positive
+        hangul, latin = _grams(clause, vocab)
+        target[0].update(hangul)
+        target[1].update(latin)
+    return positive, negated
+
+
+def latin_terms(user_query, vocab):
+    """제품 설명의 영문 성분명 토큰 (SPF 같은 등급 표기와 청구항 공통 표현 제외)"""
+    return [w for w in LATIN_WORD.findall(user_query.lower()) if w not in NOT_INGREDIENT_LATIN | vocab.latin]
+
+
+def is_specific(user_query, vocab):
+    """제품 설명이 구체적인 성분/함량을 밝히는지"""
+    if PERCENT.search(user_query):
+        return True
+    if latin_terms(user_query, vocab):
+        return True
+    return any(m.group(1) not in NOT_INGREDIENT for m in INGREDIENT_CUE.finditer(user_query))
+
+
+class EmbedScorer:
+    """구성요소 ↔ 제품 설명 절 코사인 유사도 (SCREEN_EMBED=1일 때만 로드)"""
+
+    def __init__(self, encoder=None):
+        if encoder is None:
+            from claim_index import ClaimEncoder
+
+            encoder = ClaimEncoder()
+        self.encoder = encoder
+        self._cache = {}
+
+    def _vector(self, text):
+        if text not in self._cache:
+            self._cache[text] = self.encoder.encode([text])[0]
+        return self._cache[text]
+
+    def similarity(self, element, clauses):
+        vec = self._vector(element)
+        return max((float(vec @ self._vector(c)) for c in clauses), default=0.0)
+
+
+def screen(user_query, claim_text, threshold=SCREEN_THRESHOLD, embed: EmbedScorer = None, vocab: GenericVocab = None):
+    """1단계 스크리닝. decision이 "낮음"이면 LLM 판단 없이 종료, None이면 LLM으로 넘긴다
+
+    vocab을 생략하면 청구항 코퍼스(SCREEN_CORPUS)의 문서 빈도로 만든 공통 표현을 쓴다.
+
+    - 제품 설명이 미정/비공개 표현을 담으면 항상 LLM
+    - 핵심 구성요소가 부정 절에서만 언급되면 (예: "겔화제는 안 넣었어요") 낮음
+    - 구체적인 성분을 밝혔는데 핵심 구성요소가 하나도 커버되지 않으면 낮음
+    """
+    vocab = vocab or default_vocab()
+    elements = [(e, core_grams(e, vocab)) for e in split_elements(claim_text)]
+    elements = [(e, forms) for e, forms in elements if forms]
+    positive, negated = query_clauses(user_query, vocab)
+    clauses = [c.strip() for c in CLAUSE_SPLIT.split(user_query) if c and c.strip()
+               and not NEGATION.search(c.lower())] if embed is not None else []
+
+    scores = []
+    for element, forms in elements:
+        pos = coverage(forms, positive)
+        if embed is not None and pos < threshold and clauses:
+            if embed.similarity(element, clauses) >= SCREEN_EMBED_THRESHOLD:
+                pos = 1.0
+        scores.append({
+            "element": element,
+            "coverage": round(pos, 3),
+            "negated": pos < threshold and coverage(forms, negated) >= threshold,
+        })
+
+    undecided = bool(UNDECIDED.search(user_query))
+    specific = is_specific(user_query, vocab)
+    # 영문 성분명은 청구항의 모든 핵심 구성요소에 영문 병기가 있을 때만 글자로 비교할 수 있다 (임베딩 사용 시에는 허용)
+    comparable = embed is not None or not latin_terms(user_query, vocab) or all(
+        any(latin for _, latin in forms) for _, forms in elements
+    )
+    absent = [s["element"] for s in scores if s["negated"]]
+    best = max((s["coverage"] for s in scores), default=1.0)
+
+    decision, reason = None, None
+    if not undecided and scores:
+        if absent:
+            decision, reason = "낮음", "negated"
+        elif specific and comparable and best < threshold:
+            decision, reason = "낮음", "uncovered"
+    return {
+        "decision": decision,
+        "reason": reason,
+        "specific": specific,
+        "undecided": undecided,
+        "comparable": comparable,
+        "max_coverage": round(best, 3),
+        "elements": scores,
+    }
+
+
+def screened_verdict(regit_num, result):
+    """스크리닝으로 종료된 케이스를 output_schema.json 형식 응답으로 변환"""
+    comparisons = [
+        {"patent_element": s["element"], "user_product_element": None, "match": "미대응"}
+        for s in result["elements"]
+        if s["negated"] or result["reason"] == "uncovered"
+    ]
+    if result["reason"] == "negated":
+        missing = ", ".join(s["element"] for s in result["elements"] if s["negated"])
+        reason = f"제품 설명에서 청구항 구성요소({missing})를 사용하지 않는다고 밝혀 모든 구성요소를 충족하지 않으므로 침해 리스크가 낮다."
+    else:
+        reason = "제품 설명에 밝힌 성분이 청구항의 핵심 구성요소와 대응하지 않아 침해 리스크가 낮다."
+    return {
+        "regit_num": str(regit_num),
+        "comparisons": comparisons,
+        "risk_level": "낮음",
+        "decision_reason": reason,
+    }
+
+
+def load_labeled(seed_path=SEED_PATH, label_path=LABEL_PATH):
+    from build_sft_jsonl import join_pairs
+
+    return [(seed, label) for _, seed, label in join_pairs(seed_path, label_path)]
+
+
+def _llm_correct(total):
+    """evaluation_result.json에서 행별 LLM 정답 여부 (데이터셋 크기가 다르면 None)"""
+    if not SCREEN_LLM_RESULT or not Path(SCREEN_LLM_RESULT).exists():
+        return None
+    with open(SCREEN_LLM_RESULT, "r", encoding="utf-8") as f:
+        result = json.load(f)
+    if result["details"]["total"] != total:
+        print(f"[WARN] LLM 결과 크기({result['details']['total']})가 데이터셋({total})과 달라 무시합니다")
+        return None
+    wrong = {e["idx"] for e in result["errors"]}
+    return [i + 1 not in wrong for i in range(total)]
+
+
+def evaluate(pairs, threshold, embed=None, llm_correct=None, vocab=None):
+    """라벨셋에서 캐스케이드 효과 측정
+
+    스크리닝된 케이스는 "낮음"으로 확정되므로 정답이 낮음이 아니면 정확도 손실이 된다.
+    LLM 단독 결과가 없으면 LLM이 모두 맞힌다고 가정한 손실 상한을 보고한다.
+    """
+    total = len(pairs)
+    screened, wrong, by_reason = [], [], {"negated": 0, "uncovered": 0}
+    gained = lost = 0
+    for i, (seed, label) in enumerate(pairs):
+        result = screen(seed["user_query"], seed["claim_text"], threshold, embed, vocab)
+        if result["decision"] is None:
+            continue
+        screened.append(i + 1)
+        by_reason[result["reason"]] += 1
+        correct = label["risk_level"] == result["decision"]
+        if not correct:
+            wrong.append({"idx": i + 1, "query": seed["user_query"][:40], "true": label["risk_level"]})
+        if llm_correct is not None:
+            gained += correct and not llm_correct[i]
+            lost += llm_correct[i] and not correct
+    low_total = sum(label["risk_level"] == "낮음" for _, label in pairs)
+    row = {
+        "threshold": threshold,
+        "screened": len(screened),
+        "llm_calls_avoided": round(len(screened) / total, 4) if total else 0.0,
+        "screened_precision": round(1 - len(wrong) / len(screened), 4) if screened else 1.0,
+        "low_recall": round((len(screened) - len(wrong)) / low_total, 4) if low_total else 0.0,
+        "accuracy_lost_upper": round(len(wrong) / total, 4) if total else 0.0,
+        "by_reason": by_reason,
+        "screened_wrong": wrong,
+    }
+    if llm_correct is not None:
+        llm_acc = sum(llm_correct) / total
+        row["llm_accuracy"] = round(llm_acc, 4)
+        row["cascade_accuracy"] = round(llm_acc + (gained - lost) / total, 4)
+    return row
+
+
+def tune_threshold(pairs, embed=None, vocab=None):
+    """precision이 MIN_PRECISION 이상인 threshold 중 가장 많이 스크리닝하는 값 (같으면 낮은 값)"""
+    rows = [evaluate(pairs, t, embed, vocab=vocab) for t in SWEEP]
+    ok = [r for r in rows if r["screened_precision"] >= MIN_PRECISION] or rows[:1]
+    return max(ok, key=lambda r: (r["screened"], -r["threshold"]))["threshold"]
+
+
+def held_out(pairs, embed=None, llm_correct=None, threshold=None):
+    """특허 단위 leave-one-out 평가
+
+    남긴 특허마다 나머지 특허의 청구항으로 공통 표현을, 나머지 특허의 라벨로 threshold를 정하고
+    남긴 특허에서만 측정한다. 공통 표현과 threshold 모두 평가 대상 특허를 보지 않는다.
+    threshold를 주면 fold마다 고르지 않고 그 값으로 고정한다 (held_out_sweep용).
+    """
+    by_patent = defaultdict(list)
+    for i, (seed, _) in enumerate(pairs):
+        by_patent[str(seed["regit_num"])].append(i)
+    corpus = corpus_claims()
+
+    folds = []
+    for regit_num, idx in by_patent.items():
+        held_claims = {pairs[i][0]["claim_text"] for i in idx}
+        vocab = generic_vocab([c for c in corpus if c not in held_claims])
+        train = [p for i, p in enumerate(pairs) if i not in set(idx)]
+        fold_threshold = threshold if threshold is not None else tune_threshold(train, embed, vocab)
+        test_llm = [llm_correct[i] for i in idx] if llm_correct is not None else None
+        row = evaluate([pairs[i] for i in idx], fold_threshold, embed, test_llm, vocab)
+        for w in row["screened_wrong"]:
+            w["idx"] = idx[w["idx"] - 1] + 1
+        folds.append({"regit_num": regit_num, "samples": len(idx), **row})
+
+    total = len(pairs)
+    screened = sum(f["screened"] for f in folds)
+    wrong = [w for f in folds for w in f["screened_wrong"]]
+    low_total = sum(label["risk_level"] == "낮음" for _, label in pairs)
+    summary = {
+        "threshold": threshold,
+        "screened": screened,
+        "llm_calls_avoided": round(screened / total, 4) if total else 0.0,
+        "screened_precision": round(1 - len(wrong) / screened, 4) if screened else 1.0,
+        "low_recall": round((screened - len(wrong)) / low_total, 4) if low_total else 0.0,
+        "accuracy_lost_upper": round(len(wrong) / total, 4) if total else 0.0,
+        "screened_wrong": wrong,
+    }
+    if llm_correct is not None:
+        summary["llm_accuracy"] = round(sum(llm_correct) / total, 4)
+        summary["cascade_accuracy"] = round(sum(f["cascade_accuracy"] * f["samples"] for f in folds) / total, 4)
+    return summary, folds
+
+
+def held_out_sweep(pairs, embed=None, llm_correct=None):
+    """SWEEP의 threshold마다 고정값으로 held_out 평가 (SCREEN_THRESHOLD 기본값을 고르는 근거)"""
+    return [held_out(pairs, embed, llm_correct, t)[0] for t in SWEEP]
+
+
+def element_agreement(pairs):
+    """분리한 구성요소가 라벨의 patent_element를 얼마나 덮는지 (청구항별 평균 커버리지)"""
+    per_claim = {}
+    for seed, label in pairs:
+        key = (seed["regit_num"], seed["claim_text"])
+        per_claim.setdefault(key, set()).update(c["patent_element"] for c in label["comparisons"])
+    vocab = default_vocab()
+    scores = []
+    for (_, claim_text), label_elements in per_claim.items():
+        split = [set().union(*_grams(e, vocab)) for e in split_elements(claim_text)]
+        for el in label_elements:
+            grams = set().union(*_grams(el, vocab))
+            if grams:
+                scores.append(max((len(grams & s) / len(grams) for s in split), default=0.0))
+    return round(sum(scores) / len(scores), 4) if scores else 0.0
+
+
+def main():
+    pairs = load_labeled()
+    embed = EmbedScorer() if SCREEN_EMBED else None
+    llm_correct = _llm_correct(len(pairs))
+    vocab = default_vocab()
+
+    print(f"라벨셋: {len(pairs)}개 (낮음 {sum(l['risk_level'] == '낮음' for _, l in pairs)}개)")
+    print(f"공통 표현 (청구항 문서 빈도 >= {SCREEN_GENERIC_DF}): 어절 {len(vocab.words)}개, 영문 {len(vocab.latin)}개")
+    print(f"구성요소 분리 일치도 (라벨 patent_element 커버리지): {element_agreement(pairs):.3f}")
+    print(f"임베딩 보조: {'사용' if embed else '미사용'}\n")
+
+    header = f"{'screened':>8} | {'LLM 호출 절감':>10} | {'precision':>9} | {'낮음 recall':>10} | {'정확도 손실':>9}"
+
+    def line(r):
+        return (f"{r['screened']:>8d} | {r['llm_calls_avoided'] * 100:>11.1f}% | "
+                f"{r['screened_precision']:>9.3f} | {r['low_recall']:>11.3f} | {r['accuracy_lost_upper'] * 100:>9.1f}%p")
+
+    # 라벨셋 전체로 공통 표현과 threshold를 정하므로 참고용 (in-sample)
+    rows = [evaluate(pairs, t, embed, llm_correct, vocab) for t in sorted(set(SWEEP + [SCREEN_THRESHOLD]))]
+    print("[in-sample 참고] threshold sweep")
+    print(f"{'threshold':>9} | {header}")
+    print("-" * 76)
+    for r in rows:
+        print(f"{r['threshold']:>9.2f} | {line(r)}")
+
+    summary, folds = held_out(pairs, embed, llm_correct)
+    print("\n[held-out] 특허 단위 leave-one-out (공통 표현/threshold는 나머지 특허로 결정)")
+    print(f"{'특허':>13} | {'샘플':>4} | {'threshold':>9} | {header}")
+    print("-" * 98)
+    for f in folds:
+        print(f"{f['regit_num']:>13} | {f['samples']:>4d} | {f['threshold']:>9.2f} | {line(f)}")
+    print(f"{'전체':>13} | {len(pairs):>4d} | {'':>9} | {line(summary)}")
+
+    sweep = held_out_sweep(pairs, embed, llm_correct)
+    print("\n[held-out] threshold 고정 sweep (공통 표현만 fold마다 결정)")
+    print(f"{'threshold':>9} | {header}")
+    print("-" * 76)
+    for r in sweep:
+        print(f"{r['threshold']:>9.2f} | {line(r)}")
+
+    if summary["screened_wrong"]:
+        print("\n[held-out] 낮음으로 잘못 종료된 케이스")
+        for w in summary["screened_wrong"]:
+            print(f"  #{w['idx']}: {w['query']}... (정답: {w['true']})")
+    if "cascade_accuracy" in summary:
+        print(f"\nrisk_level 정확도 (held-out): LLM 단독 {summary['llm_accuracy'] * 100:.1f}% "
+              f"-> 캐스케이드 {summary['cascade_accuracy'] * 100:.1f}%")
+    else:
+        print("\n캐스케이드 정확도: SCREEN_LLM_RESULT에 evaluate.py 결과를 지정하면 계산 (위 손실은 LLM이 모두 맞힌다고 가정한 상한)")
+
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump({
+            "samples": len(pairs),
+            "embed": bool(embed),
+            "generic_df": SCREEN_GENERIC_DF,
+            "element_agreement": element_agreement(pairs),
+            "threshold": SCREEN_THRESHOLD,
+            "held_out": summary,
+            "held_out_folds": folds,
+            "sweep_held_out": sweep,
+            "sweep_in_sample": rows,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\n결과 저장: {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import os
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from generation import MAX_NEW_TOKENS, generate_batch, load_merged, load_model
+from judgement_cache import JudgementCache, adapter_hash, model_fingerprint
+from multi_lora import AdapterRouter, MultiLoraModel
+from prompt_format import build_prompt
+
+load_dotenv()
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# 모델 선택 (환경변수 또는 기본값)
+MODEL_SIZE = os.environ.get("MODEL_SIZE", "4b")  # "1b" or "4b"
+
+if MODEL_SIZE == "1b":
+    ADAPTER_PATH = BASE_DIR / "outputs/gemma3-1b-it-lora"
+    BASE_MODEL = "google/gemma-3-1b-it"
+else:
+    ADAPTER_PATH = BASE_DIR / "outputs/gemma3-4b-it-lora"
+    BASE_MODEL = "google/gemma-3-4b-it"
+
+# export_merged.py로 만든 병합+int8 체크포인트 경로 (설정 시 base+LoRA 대신 로드, CPU 전용)
+MERGED_MODEL_PATH = os.environ.get("MERGED_MODEL_PATH")
+
+# output_schema.json 기반 제약 디코딩
+CONSTRAINED = os.environ.get("CONSTRAINED", "0") == "1"
+
+# 다중 LoRA 모드 설정 파일 (설정 시 base 모델 1개에 adapters.yaml의 어댑터들을 올려 요청별로 선택)
+ADAPTERS_CONFIG = os.environ.get("ADAPTERS_CONFIG")
+# 동시에 올려 둘 어댑터 수 상한
+MAX_LOADED_ADAPTERS = int(os.environ.get("MAX_LOADED_ADAPTERS", "8"))
+# 1이면 서로 다른 어댑터 요청을 한 배치로 생성, 0이면 어댑터별로 교체하며 생성
+MIXED_ADAPTER_BATCH = os.environ.get("MIXED_ADAPTER_BATCH", "1") == "1"
+
+SERVE_HOST = os.environ.get("SERVE_HOST", "127.0.0.1")
+SERVE_PORT = int(os.environ.get("SERVE_PORT", "8600"))
+
+# 마이크로 배치: 첫 요청 이후 BATCH_WAIT_MS 동안 들어온 요청을 최대 MAX_BATCH_SIZE개까지 묶는다
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "8"))
+BATCH_WAIT_MS = int(os.environ.get("BATCH_WAIT_MS", "20"))
+
+REQUEST_TIMEOUT = 600  # 초
+
+# 1이면 판단 캐시(judgement_cache.py) 사용: 같은 프롬프트는 큐에 넣지 않고 저장된 응답을 바로 반환
+JUDGE_CACHE = os.environ.get("JUDGE_CACHE", "0") == "1"
+
+
+class MicroBatcher:
+    """동시 요청을 큐에 모아 한 번의 generate 배치로 처리하는 워커
+
+    multi_lora가 주어지면 요청별 어댑터로 생성한다 (model/tokenizer 대신 사용).
+    judgement_cache가 주어지면 캐시 hit 요청은 배치에 넣지 않는다.
+    cache_variants는 어댑터 이름 -> 캐시 variant (어댑터 가중치가 바뀌면 다른 키가 되도록).
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size=MAX_BATCH_SIZE, wait_ms=BATCH_WAIT_MS,
+                 multi_lora=None, judgement_cache=None, cache_variants=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.multi_lora = multi_lora
+        self.judgement_cache = judgement_cache
+        self.cache_variants = cache_variants or {}
+        self.max_batch_size = max_batch_size
+        self.wait_s = wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "batches": 0, "generated_tokens": 0, "seconds": 0.0, "cached": 0}
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, prompt: str, adapter=None) -> Future:
+        future = Future()
+        if self.judgement_cache is not None:
+            response = self.judgement_cache.get(prompt, variant=self.cache_variants.get(adapter, adapter))
+            if response is not None:
+                with self._lock:
+                    self.stats["cached"] += 1
+                future.set_result({
+                    "response": response,
+                    "adapter": adapter,
+                    "cached": True,
+                    "batch_size": 1,
+                    "generated_tokens": 0,
+                    "seconds": 0.0,
+                })
+                return future
+        self._queue.put((prompt, adapter, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            prompts = [p for p, _, _ in batch]
+            start = time.perf_counter()
+            try:
+                if self.multi_lora is not None:
+                    responses, generated = self.multi_lora.generate(
+                        prompts, [a for _, a, _ in batch], mixed=MIXED_ADAPTER_BATCH,
+                        max_new_tokens=MAX_NEW_TOKENS, constrained=CONSTRAINED,
+                    )
+                else:
+                    responses, generated = generate_batch(
+                        self.model, self.tokenizer, prompts, max_new_tokens=MAX_NEW_TOKENS,
+                        constrained=CONSTRAINED,
+                    )
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self.stats["requests"] += len(batch)
+                self.stats["batches"] += 1
+                self.stats["generated_tokens"] += generated
+                self.stats["seconds"] += elapsed
+
+            for (prompt, adapter, future), response in zip(batch, responses):
+                if self.judgement_cache is not None:
+                    self.judgement_cache.put(prompt, response, elapsed / len(batch),
+                                             variant=self.cache_variants.get(adapter, adapter))
+                future.set_result({
+                    "response": response,
+                    "adapter": adapter,
+                    "cached": False,
+                    "batch_size": len(batch),
+                    "generated_tokens": generated,
+                    "seconds": round(elapsed, 3),
+                })
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["queue_size"] = self._queue.qsize()
+        stats["avg_batch_size"] = round(stats["requests"] / stats["batches"], 2) if stats["batches"] else 0.0
+        if self.multi_lora is not None:
+            stats["adapters"] = self.multi_lora.snapshot()
+        if self.judgement_cache is not None:
+            stats["judgement_cache"] = self.judgement_cache.stats()
+        return stats
+
+
+def parse_verdict(response: str):
+    """응답을 JSON으로 파싱. 실패하면 None"""
+    try:
+        return json.loads(response)
+    except json.JSONDecodeError:
+        return None
+
+
+def make_handler(batcher: MicroBatcher):
+    class JudgeHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send_json(200, {
+                    "status": "ok",
+                    "model": "multi-lora" if batcher.multi_lora else MODEL_SIZE.upper(),
+                    "base_model": batcher.multi_lora.router.base_model if batcher.multi_lora else BASE_MODEL,
+                    "stats": batcher.snapshot(),
+                })
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/judge":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                req = json.loads(self.rfile.read(length).decode("utf-8"))
+                prompt = build_prompt(req["user_query"], req["regit_num"], req["claim_text"])
+                adapter = None
+                if batcher.multi_lora is not None:
+                    # 어댑터 선택: adapter 필드 > regit_num 매핑 > domain 매핑 > default
+                    adapter = batcher.multi_lora.router.route(
+                        regit_num=req["regit_num"], domain=req.get("domain"), adapter=req.get("adapter"),
+                    )
+            except (ValueError, KeyError) as e:
+                self._send_json(400, {"error": f"잘못된 요청: {e}"})
+                return
+
+            try:
+                out = batcher.submit(prompt, adapter).result(timeout=REQUEST_TIMEOUT)
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+
+            out["result"] = parse_verdict(out["response"])
+            self._send_json(200, out)
+
+        def log_message(self, format, *args):
+            pass
+
+    return JudgeHandler
+
+
+def main():
+    token = os.environ.get("HF_TOKEN")
+
+    start = time.perf_counter()
+    multi_lora = None
+    if ADAPTERS_CONFIG:
+        router = AdapterRouter.from_yaml(ADAPTERS_CONFIG)
+        print(f"다중 LoRA 모드: base {router.base_model}, 어댑터 {list(router.paths)} "
+              f"(기본 {router.default}, {'혼합 배치' if MIXED_ADAPTER_BATCH else '어댑터별 교체'})")
+        multi_lora = MultiLoraModel(router, token=token, max_loaded=MAX_LOADED_ADAPTERS)
+        model, tokenizer = None, multi_lora.tokenizer
+    elif MERGED_MODEL_PATH:
+        print(f"병합+int8 모델 로딩 중... ({MERGED_MODEL_PATH})")
+        model, tokenizer = load_merged(MERGED_MODEL_PATH)
+    else:
+        print(f"모델 로딩 중... ({MODEL_SIZE.upper()})")
+        model, tokenizer = load_model(BASE_MODEL, ADAPTER_PATH, token=token)
+    print(f"모델 로딩 완료 ({time.perf_counter() - start:.1f}s)")
+
+    judgement_cache, cache_variants = None, None
+    if JUDGE_CACHE:
+        if multi_lora is not None:
+            fingerprint = model_fingerprint(multi_lora.router.base_model, None, None, MAX_NEW_TOKENS, CONSTRAINED)
+            cache_variants = {name: f"{name}:{adapter_hash(path)}" for name, path in multi_lora.router.paths.items()}
+        else:
+            fingerprint = model_fingerprint(
+                BASE_MODEL, None if MERGED_MODEL_PATH else ADAPTER_PATH, MERGED_MODEL_PATH,
+                MAX_NEW_TOKENS, CONSTRAINED,
+            )
+        judgement_cache = JudgementCache(fingerprint)
+        print(f"판단 캐시 사용: {judgement_cache.path} (fingerprint {fingerprint})")
+
+    batcher = MicroBatcher(model, tokenizer, multi_lora=multi_lora,
+                           judgement_cache=judgement_cache, cache_variants=cache_variants)
+    server = ThreadingHTTPServer((SERVE_HOST, SERVE_PORT), make_handler(batcher))
+    print(f"서버 시작: http://{SERVE_HOST}:{SERVE_PORT} "
+          f"(max_batch_size={MAX_BATCH_SIZE}, wait={BATCH_WAIT_MS}ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"서버 종료: {batcher.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
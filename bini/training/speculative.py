@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import torch
+from dotenv import load_dotenv
+from pathlib import Path
+
+from generation import MAX_NEW_TOKENS, encode_prompts, extract_response, load_model
+from prompt_format import build_prompt
+
+load_dotenv()
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# 검증(target) 모델: Fine-tuned 4B / 초안(draft) 모델: Fine-tuned 1B
+TARGET_BASE_MODEL = "google/gemma-3-4b-it"
+TARGET_ADAPTER_PATH = BASE_DIR / "outputs/gemma3-4b-it-lora"
+DRAFT_BASE_MODEL = "google/gemma-3-1b-it"
+DRAFT_ADAPTER_PATH = BASE_DIR / "outputs/gemma3-1b-it-lora"
+
+# draft가 한 번에 제안하는 토큰 수 (HF 기본 스케줄은 전부 채택되면 늘리고 거절되면 줄인다)
+NUM_ASSISTANT_TOKENS = int(os.environ.get("NUM_ASSISTANT_TOKENS", "5"))
+
+SEED_PATH = BASE_DIR / "data/raw/seeds/seed_cases.json"
+
+# 벤치마크에 사용할 seed 개수 (0이면 전체)
+SPEC_SAMPLES = int(os.environ.get("SPEC_SAMPLES", "0"))
+
+
+def _vocab_size(model):
+    config = model.config
+    if hasattr(config, "get_text_config"):
+        config = config.get_text_config()
+    return config.vocab_size
+
+
+def load_draft(token=None, num_assistant_tokens=NUM_ASSISTANT_TOKENS):
+    """draft 모델(1B + LoRA) 로드. (model, tokenizer) 반환"""
+    draft, draft_tokenizer = load_model(DRAFT_BASE_MODEL, DRAFT_ADAPTER_PATH, token=token)
+    draft.generation_config.num_assistant_tokens = num_assistant_tokens
+    return draft, draft_tokenizer
+
+
+def assist_kwargs(target, draft, tokenizer, draft_tokenizer):
+    """generate에 넘길 assisted generation 인자
+
+    Gemma 3 1B/4B는 같은 토크나이저지만 4B의 임베딩 행 수(vocab_size)가 더 커서
+    HF가 같은 어휘로 인정하지 않는다. 이 경우 tokenizer/assistant_tokenizer를 함께 넘겨
+    텍스트 기준으로 후보를 맞추는 universal assisted decoding 경로를 쓴다.
+    """
+    kwargs = {"assistant_model": draft}
+    if _vocab_size(target) != _vocab_size(draft):
+        kwargs["tokenizer"] = tokenizer
+        kwargs["assistant_tokenizer"] = draft_tokenizer
+    return kwargs
+
+
+class ForwardCounter:
+    """모델 forward 호출 수를 세는 hook (with 블록 안에서만)"""
+
+    def __init__(self, model):
+        self.module = model.get_base_model() if hasattr(model, "get_base_model") else model
+        self.calls = 0
+        self._handle = None
+
+    def _hook(self, module, args, output):
+        self.calls += 1
+
+    def __enter__(self):
+        self.calls = 0
+        self._handle = self.module.register_forward_hook(self._hook)
+        return self
+
+    def __exit__(self, *exc):
+        self._handle.remove()
+
+
+def _generate_ids(model, tokenizer, prompt, max_new_tokens, **extra):
+    inputs = encode_prompts(tokenizer, [prompt]).to(model.device)
+    prompt_len = inputs["input_ids"].shape[1]
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    with torch.no_grad():
+        outputs = model.generate(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            pad_token_id=tokenizer.pad_token_id,
+            **extra,
+        )
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    elapsed = time.perf_counter() - start
+    return outputs[0, prompt_len:], elapsed
+
+
+def speculative_generate(target, draft, tokenizer, draft_tokenizer, prompt, max_new_tokens=MAX_NEW_TOKENS):
+    """draft 제안 + target 검증으로 greedy 생성. (응답, 생성 토큰 ids, 통계) 반환
+
+    target forward 1회(라운드)마다 채택된 draft 토큰 + target 토큰 1개가 붙으므로
+    채택 토큰 = 생성 토큰 - 라운드 수, 제안 토큰 = draft forward 수로 채택률을 계산한다.
+    """
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    with ForwardCounter(target) as target_calls, ForwardCounter(draft) as draft_calls:
+        ids, elapsed = _generate_ids(
+            target, tokenizer, prompt, max_new_tokens,
+            **assist_kwargs(target, draft, tokenizer, draft_tokenizer),
+        )
+    generated = int((ids != tokenizer.pad_token_id).sum())
+    accepted = max(generated - target_calls.calls, 0)
+    stats = {
+        "generated_tokens": generated,
+        "seconds": round(elapsed, 3),
+        "target_forwards": target_calls.calls,
+        "draft_forwards": draft_calls.calls,
+        "accepted_tokens": accepted,
+        "acceptance_rate": round(accepted / draft_calls.calls, 4) if draft_calls.calls else 0.0,
+    }
+    response = extract_response(tokenizer.decode(ids, skip_special_tokens=True))
+    return response, ids, stats
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def main():
+    """seed_cases.json에서 4B greedy vs 1B draft + 4B 검증 비교 (출력 동일성 / 채택률 / 지연)"""
+    token = os.environ.get("HF_TOKEN")
+
+    with open(SEED_PATH, "r", encoding="utf-8") as f:
+        seeds = json.load(f)
+    if SPEC_SAMPLES:
+        seeds = seeds[:SPEC_SAMPLES]
+
+    print("모델 로딩 중... (target 4B + draft 1B)")
+    target, tokenizer = load_model(TARGET_BASE_MODEL, TARGET_ADAPTER_PATH, token=token)
+    draft, draft_tokenizer = load_draft(token)
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    # 워밍업 (CUDA 커널 / 할당)
+    warm = build_prompt(seeds[0]["user_query"], seeds[0]["regit_num"], seeds[0]["claim_text"])
+    _generate_ids(target, tokenizer, warm, 8)
+    speculative_generate(target, draft, tokenizer, draft_tokenizer, warm, 8)
+
+    rows = []
+    for i, seed in enumerate(seeds, 1):
+        prompt = build_prompt(seed["user_query"], seed["regit_num"], seed["claim_text"])
+        base_ids, base_seconds = _generate_ids(target, tokenizer, prompt, MAX_NEW_TOKENS)
+        _, spec_ids, stats = speculative_generate(target, draft, tokenizer, draft_tokenizer, prompt)
+
+        identical = torch.equal(base_ids.cpu(), spec_ids.cpu())
+        rows.append({
+            "idx": i,
+            "regit_num": seed["regit_num"],
+            "identical": identical,
+            "greedy_seconds": round(base_seconds, 3),
+            **{f"speculative_{k}" if k == "seconds" else k: v for k, v in stats.items()},
+        })
+        print(f"[{i:3d}/{len(seeds)}] {'=' if identical else '≠'} "
+              f"greedy {base_seconds:6.2f}s | speculative {stats['seconds']:6.2f}s | "
+              f"채택률 {stats['acceptance_rate'] * 100:5.1f}% ({stats['accepted_tokens']}/{stats['draft_forwards']})")
+
+    greedy = [r["greedy_seconds"] for r in rows]
+    spec = [r["speculative_seconds"] for r in rows]
+    accepted = sum(r["accepted_tokens"] for r in rows)
+    proposed = sum(r["draft_forwards"] for r in rows)
+    mismatches = [r["idx"] for r in rows if not r["identical"]]
+    summary = {
+        "samples": len(rows),
+        "num_assistant_tokens": NUM_ASSISTANT_TOKENS,
+        "identical": len(rows) - len(mismatches),
+        "mismatched_idx": mismatches,
+        "acceptance_rate": round(accepted / proposed, 4) if proposed else 0.0,
+        "greedy_total_seconds": round(sum(greedy), 3),
+        "speculative_total_seconds": round(sum(spec), 3),
+        "speedup": round(sum(greedy) / sum(spec), 3) if sum(spec) else 0.0,
+        "greedy_p50": _percentile(greedy, 50),
+        "greedy_p95": _percentile(greedy, 95),
+        "speculative_p50": _percentile(spec, 50),
+        "speculative_p95": _percentile(spec, 95),
+    }
+
+    print("\n[speculative decoding 결과]")
+    print(f"  출력 동일:   {summary['identical']}/{summary['samples']}")
+    print(f"  draft 채택률: {summary['acceptance_rate'] * 100:.1f}%")
+    print(f"  지연 p50:    greedy {summary['greedy_p50']:.2f}s | speculative {summary['speculative_p50']:.2f}s")
+    print(f"  지연 p95:    greedy {summary['greedy_p95']:.2f}s | speculative {summary['speculative_p95']:.2f}s")
+    print(f"  전체:        greedy {summary['greedy_total_seconds']:.1f}s | "
+          f"speculative {summary['speculative_total_seconds']:.1f}s (x{summary['speedup']:.2f})")
+    if mismatches:
+        print(f"  [WARN] greedy와 다른 출력: {mismatches}")
+
+    report_path = TARGET_ADAPTER_PATH / "speculative_report.json"
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({"summary": summary, "rows": rows}, f, ensure_ascii=False, indent=2)
+    print(f"\n결과 저장: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
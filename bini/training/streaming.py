@@ -0,0 +1,148 @@
+import os
+import json
+import time
+from queue import Empty
+from threading import Thread
+
+from json_grammar import JsonCursor
+
+# decision_reason은 토큰 단위로 흘려보내는 필드
+STREAM_TEXT_FIELD = "decision_reason"
+
+# 다음 토큰 조각을 기다리는 최대 시간(초). 생성 스레드가 멈추면 무한 대기 대신 TimeoutError
+STREAM_TIMEOUT = float(os.environ.get("STREAM_TIMEOUT", "120"))
+
+
+class VerdictParser:
+    """생성 텍스트 조각을 받아 스키마 필드를 완성되는 순서대로 이벤트로 변환
+
+    comparisons[] 원소 -> risk_level -> decision_reason(조각) 순서로 output_schema.json 필드 순서를 따른다.
+    """
+
+    def __init__(self):
+        self.cursor = JsonCursor()
+        self.text = ""
+        self.comparisons = 0
+        self._reason_sent = ""
+
+    def feed(self, chunk):
+        events = []
+        for ch in chunk:
+            self.text += ch
+            self.cursor._feed_char(ch)
+            events.extend(self._drain())
+        events.extend(self._reason_delta())
+        return events
+
+    def _drain(self):
+        events = []
+        for event in self.cursor.events:
+            if event[0] == "close":
+                _, kind, key, start, end = event
+                # comparisons 배열 안의 object가 닫힘
+                if kind == "{" and key == "comparisons":
+                    try:
+                        item = json.loads(self.text[start:end])
+                    except json.JSONDecodeError:
+                        continue
+                    events.append({"type": "comparison", "index": self.comparisons, "data": item})
+                    self.comparisons += 1
+            elif event[0] == "string":
+                _, key, value = event
+                if key == "risk_level":
+                    events.append({"type": "risk_level", "value": value})
+                elif key == STREAM_TEXT_FIELD:
+                    # 문자열이 닫힐 때 남은 조각을 마저 보낸다
+                    if value.startswith(self._reason_sent) and len(value) > len(self._reason_sent):
+                        events.append({"type": "decision_reason_delta", "text": value[len(self._reason_sent):]})
+                    self._reason_sent = value
+        self.cursor.events.clear()
+        return events
+
+    def _reason_delta(self):
+        c = self.cursor
+        if not (c.in_string and not c.string_is_key and c.value_key == STREAM_TEXT_FIELD):
+            return []
+        raw = c.buffer[:-1] if c.escape else c.buffer
+        try:
+            decoded = json.loads('"' + raw + '"')
+        except json.JSONDecodeError:
+            return []  # 미완성 \uXXXX escape는 다음 조각에서
+        if not decoded.startswith(self._reason_sent) or len(decoded) == len(self._reason_sent):
+            return []
+        delta = decoded[len(self._reason_sent):]
+        self._reason_sent = decoded
+        return [{"type": "decision_reason_delta", "text": delta}]
+
+    def result(self):
+        c = self.cursor
+        if not c.closed:
+            return None
+        try:
+            return json.loads(self.text[c.start:c.end])
+        except json.JSONDecodeError:
+            return None
+
+
+def stream_verdict(model, tokenizer, prompt, max_new_tokens=None, constrained=True):
+    """build_prompt 프롬프트로 생성하면서 판단 결과를 필드 단위로 yield
+
+    이벤트: comparison / risk_level / decision_reason_delta / done (각각 생성 시작 후 경과 초 "elapsed" 포함)
+    max_new_tokens 기본값은 generation.MAX_NEW_TOKENS
+    """
+    # VerdictParser는 torch 없이 쓸 수 있도록 생성 의존성은 여기서 가져온다
+    import torch
+    from transformers import TextIteratorStreamer
+
+    from generation import MAX_NEW_TOKENS, constraint_kwargs
+
+    max_new_tokens = max_new_tokens or MAX_NEW_TOKENS
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    _, extra = constraint_kwargs(tokenizer, inputs["input_ids"].shape[1], constrained)
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=STREAM_TIMEOUT)
+    errors = []
+
+    def _generate():
+        try:
+            with torch.no_grad():
+                model.generate(
+                    **inputs,
+                    max_new_tokens=max_new_tokens,
+                    do_sample=False,
+                    pad_token_id=tokenizer.pad_token_id,
+                    streamer=streamer,
+                    **extra,
+                )
+        except Exception as e:
+            # 예외를 남기고 스트림을 닫아야 아래 for 루프가 끝난다
+            errors.append(e)
+            streamer.end()
+
+    start = time.perf_counter()
+    thread = Thread(target=_generate, daemon=True)
+    thread.start()
+
+    parser = VerdictParser()
+    first_risk = None
+    try:
+        for chunk in streamer:
+            for event in parser.feed(chunk):
+                event["elapsed"] = round(time.perf_counter() - start, 3)
+                if event["type"] == "risk_level" and first_risk is None:
+                    first_risk = event["elapsed"]
+                yield event
+    except Empty:
+        raise TimeoutError(f"생성 스트림이 {STREAM_TIMEOUT:.0f}초 동안 응답하지 않았습니다") from None
+    thread.join()
+    if errors:
+        raise errors[0]
+
+    yield {
+        "type": "done",
+        "result": parser.result(),
+        "elapsed": round(time.perf_counter() - start, 3),
+        "time_to_risk_level": first_risk,
+    }
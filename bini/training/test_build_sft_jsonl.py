@@ -0,0 +1,115 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+import build_sft_jsonl as build
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+
+@pytest.fixture
+def scratch(tmp_path, monkeypatch):
+    """실제 seed/label을 임시 디렉터리에 복사하고 build_sft_jsonl 경로를 그쪽으로 돌린다"""
+    seed_dir = tmp_path / "raw/seeds"
+    label_dir = tmp_path / "processed"
+    shutil.copytree(DATA_DIR / "raw/seeds", seed_dir)
+    label_dir.mkdir()
+    for path in (DATA_DIR / "processed").glob("train*.jsonl"):
+        shutil.copy(path, label_dir / path.name)
+
+    monkeypatch.setattr(build, "SEED_DIR", seed_dir)
+    monkeypatch.setattr(build, "LABEL_DIR", label_dir)
+    monkeypatch.setattr(build, "SEED_PATH", seed_dir / "seed_cases.json")
+    monkeypatch.setattr(build, "LABEL_PATH", label_dir / "train.jsonl")
+    monkeypatch.setattr(build, "OUT_PATH", label_dir / "sft_train.jsonl")
+    monkeypatch.setattr(build, "MANIFEST_PATH", label_dir / "sft_manifest.json")
+    monkeypatch.setattr(build, "FULL_REBUILD", False)
+    return tmp_path
+
+
+def run(fresh=False):
+    """빌드 후 (정렬한 출력 줄, manifest 행 수) 반환. fresh=True면 manifest 무시"""
+    build.FULL_REBUILD = fresh
+    build.main()
+    with open(build.OUT_PATH, encoding="utf-8") as f:
+        lines = sorted(f.read().splitlines())
+    with open(build.MANIFEST_PATH, encoding="utf-8") as f:
+        manifest = json.load(f)
+    return lines, len(manifest["rows"])
+
+
+def edit_seeds(edit):
+    with open(build.SEED_PATH, encoding="utf-8") as f:
+        seeds = json.load(f)
+    edit(seeds)
+    with open(build.SEED_PATH, "w", encoding="utf-8") as f:
+        json.dump(seeds, f, ensure_ascii=False)
+
+
+def unique_seed_index():
+    """특허별 seed 파일에 중복되지 않은 seed_cases.json 예제 중 마지막 것의 위치"""
+    per_patent = set()
+    for path in build.SEED_DIR.glob("seed_*.json"):
+        if path != build.SEED_PATH:
+            per_patent.update(build.dedup_key(s) for s in build.iter_json_array(path))
+    seeds = list(build.iter_json_array(build.SEED_PATH))
+    return max(i for i, s in enumerate(seeds) if build.dedup_key(s) not in per_patent)
+
+
+def drop_label_line(index):
+    with open(build.LABEL_PATH, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    del lines[index]
+    with open(build.LABEL_PATH, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def test_incremental_matches_fresh_build(scratch):
+    lines, rows = run()
+    assert run() == (lines, rows)  # 변경 없음
+
+    # 제품 설명 수정: 새 행이 추가되지 않고 기존 행이 대체된다
+    edit_seeds(lambda seeds: seeds[5].update(user_query=seeds[5]["user_query"] + " (수정)"))
+    edited, edited_rows = run()
+    assert edited_rows == rows and len(edited) == len(lines)
+    assert sum("(수정)" in line for line in edited) == 1
+    assert (edited, edited_rows) == run(fresh=True)
+
+    # 예제 삭제 (seed와 label 모두): 출력과 manifest에서 빠진다
+    run()
+    index = unique_seed_index()
+    edit_seeds(lambda seeds: seeds.pop(index))
+    drop_label_line(index)
+    deleted, deleted_rows = run()
+    assert deleted_rows == rows - 1 and len(deleted) == len(lines) - 1
+    assert (deleted, deleted_rows) == run(fresh=True)
+
+
+def test_unpaired_label_raises_before_writing(scratch):
+    lines, _ = run()
+
+    # label만 삭제: 뒤의 예제를 밀린 짝으로 내보내지 않고 출력도 그대로 둔다
+    drop_label_line(unique_seed_index())
+    with pytest.raises(ValueError, match="짝이 맞지 않습니다"):
+        build.main()
+    with open(build.OUT_PATH, encoding="utf-8") as f:
+        assert sorted(f.read().splitlines()) == lines
+
+
+def test_positional_join_checks_counts_per_patent(tmp_path):
+    seeds = [{"regit_num": "1", "user_query": "a"}, {"regit_num": "2", "user_query": "b"}]
+    seed_path = tmp_path / "seed.json"
+    label_path = tmp_path / "train.jsonl"
+    seed_path.write_text(json.dumps(seeds), encoding="utf-8")
+
+    # id가 없으면 특허별 순번으로 짝을 짓는다
+    label_path.write_text('{"regit_num":"2","risk_level":"LOW"}\n{"regit_num":"1","risk_level":"HIGH"}\n', encoding="utf-8")
+    pairs = {seed["user_query"]: label["risk_level"] for _, seed, label in build.join_pairs(seed_path, label_path)}
+    assert pairs == {"a": "HIGH", "b": "LOW"}
+
+    # 특허별 개수가 다르면 ValueError
+    label_path.write_text('{"regit_num":"1","risk_level":"HIGH"}\n{"regit_num":"1","risk_level":"LOW"}\n', encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(build.join_pairs(seed_path, label_path))
@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+from json_grammar import SchemaGrammar, load_schema
+
+LABEL_PATH = Path(__file__).resolve().parents[1] / "data/processed/train.jsonl"
+
+
+def completion(label):
+    """build_sft_jsonl.build_text의 정답 응답과 같은 직렬화"""
+    return json.dumps({k: v for k, v in label.items() if k != "id"}, ensure_ascii=False).encode("utf-8")
+
+
+def accepts(grammar, text):
+    return grammar.feed(grammar.start, text) == ()
+
+
+def test_accepts_labels_except_out_of_enum_match():
+    schema = load_schema()
+    grammar = SchemaGrammar(schema)
+    allowed = set(schema["properties"]["comparisons"]["items"]["properties"]["match"]["enum"])
+    with open(LABEL_PATH, encoding="utf-8") as f:
+        labels = [json.loads(line) for line in f if line.strip()]
+
+    # 라벨 일부는 match 값이 enum 밖이다. 정확히 그 라벨만 거부되어야 한다
+    out_of_enum = [y for y in labels if any(c["match"] not in allowed for c in y["comparisons"])]
+    rejected = [y for y in labels if not accepts(grammar, completion(y))]
+    assert out_of_enum and len(out_of_enum) < len(labels)
+    assert rejected == out_of_enum
+
+
+def test_rejects_other_formats():
+    grammar = SchemaGrammar(load_schema())
+    label = {
+        "regit_num": "1014541990000",
+        "comparisons": [{"patent_element": "녹차 추출물", "user_product_element": None, "match": "미대응"}],
+        "risk_level": "낮음",
+        "decision_reason": "핵심 구성요소가 없습니다.",
+    }
+    text = completion(label)
+    assert accepts(grammar, text)
+
+    # 닫히기 전까지는 진행 중 상태 (None도 ()도 아님)
+    assert grammar.feed(grammar.start, text[:-1]) not in (None, ())
+    # 구분자 공백 없음 / key 순서 변경 / enum 밖 값 / 잘못된 UTF-8
+    assert grammar.feed(grammar.start, json.dumps(label, ensure_ascii=False, separators=(",", ":")).encode()) is None
+    reordered = {"risk_level": label["risk_level"], **{k: v for k, v in label.items() if k != "risk_level"}}
+    assert grammar.feed(grammar.start, completion(reordered)) is None
+    assert grammar.feed(grammar.start, completion({**label, "risk_level": "보통"})) is None
+    assert grammar.feed(grammar.start, b'{"regit_num": "\xed\xa0\x80"') is None
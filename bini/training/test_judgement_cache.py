@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pytest
+
+import judgement_cache
+from judgement_cache import JudgementCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """judgement_cache가 보는 time.time()을 손으로 움직이는 시계"""
+    now = SimpleNamespace(t=0.0)
+    monkeypatch.setattr(judgement_cache, "time", SimpleNamespace(time=lambda: now.t))
+    return now
+
+
+def make_cache(tmp_path, max_bytes=10 ** 6, ttl=0):
+    return JudgementCache("fp", path=tmp_path / "cache.sqlite", max_mb=max_bytes / 1024 ** 2, ttl=ttl)
+
+
+def test_ttl_expires_from_creation(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl=10)
+    cache.put("프롬프트", "응답", gen_seconds=2.0)
+
+    clock.t = 5
+    assert cache.get("  프롬프트 ") == "응답"  # 공백 차이는 같은 프롬프트
+    clock.t = 11
+    assert cache.get("프롬프트") is None  # hit해도 만료 시각은 생성 기준
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expired"]) == (1, 1, 1)
+    assert (stats["entries"], stats["bytes"], stats["saved_seconds"]) == (0, 0, 2.0)
+
+
+def test_evicts_least_recently_used_down_to_low_water(tmp_path, clock):
+    cache = make_cache(tmp_path, max_bytes=1000)
+    for t, prompt in enumerate("ABC", 1):
+        clock.t = t
+        cache.put(prompt, "x" * 300, gen_seconds=1.0)
+
+    clock.t = 4
+    assert cache.get("A") is not None  # A가 B, C보다 최근 사용
+
+    clock.t = 5
+    cache.put("D", "x" * 300, gen_seconds=1.0)  # 1200 > 1000 -> 900 (CACHE_LOW_WATER) 이하까지 제거
+    assert cache.get("B") is None
+    assert all(cache.get(p) is not None for p in "ACD")
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert (stats["entries"], stats["bytes"]) == (3, 900)
+
+
+def test_replace_keeps_byte_count(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.put("A", "x" * 100, gen_seconds=1.0)
+    cache.put("A", "x" * 40, gen_seconds=1.0)
+    assert cache.stats()["bytes"] == 40
+    # fingerprint / variant가 다르면 다른 항목
+    assert cache.get("A", variant="other") is None
+    assert JudgementCache("fp2", path=cache.path).get("A") is None
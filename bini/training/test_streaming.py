@@ -0,0 +1,54 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from streaming import VerdictParser
+
+LABEL_PATH = Path(__file__).resolve().parents[1] / "data/processed/train.jsonl"
+
+
+def first_label():
+    with open(LABEL_PATH, encoding="utf-8") as f:
+        label = json.loads(f.readline())
+    label.pop("id", None)
+    return label
+
+
+def parse(text, size):
+    """text를 size 글자씩 잘라 넣고 (이벤트 리스트, 최종 결과) 반환"""
+    parser = VerdictParser()
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return events, parser.result()
+
+
+@pytest.mark.parametrize("ensure_ascii", [False, True])
+@pytest.mark.parametrize("size", [1, 3, 7, 10_000])
+def test_events_match_label_for_any_split(size, ensure_ascii):
+    label = first_label()
+    # 모델 출력처럼 JSON 앞에 잡음이 섞여도 top-level object부터 따라간다
+    text = "응답: " + json.dumps(label, ensure_ascii=ensure_ascii)
+    events, result = parse(text, size)
+
+    assert result == label
+    comparisons = [e for e in events if e["type"] == "comparison"]
+    assert [e["data"] for e in comparisons] == label["comparisons"]
+    assert [e["index"] for e in comparisons] == list(range(len(label["comparisons"])))
+    assert [e["value"] for e in events if e["type"] == "risk_level"] == [label["risk_level"]]
+    deltas = [e["text"] for e in events if e["type"] == "decision_reason_delta"]
+    assert "".join(deltas) == label["decision_reason"]
+
+    # 필드는 스키마 순서대로 완성된다
+    kinds = [e["type"] for e in events]
+    assert kinds.index("risk_level") > max(i for i, k in enumerate(kinds) if k == "comparison")
+    assert kinds.index("decision_reason_delta") > kinds.index("risk_level")
+    if size == 1:
+        assert len(deltas) > 1  # 문자열이 닫히기 전부터 조각으로 흘려보낸다
+
+
+def test_unfinished_object_has_no_result():
+    text = json.dumps(first_label(), ensure_ascii=False)
+    _, result = parse(text[:-1], 5)
+    assert result is None
@@ -12,13 +12,21 @@ from transformers import (
     AutoTokenizer,
     AutoModelForCausalLM,
     BitsAndBytesConfig,
-    Trainer,
     TrainingArguments,
     default_data_collator,
 )
 from peft import LoraConfig, get_peft_model
 from pathlib import Path
 
+from dynamic_batching import (
+    DynamicPaddingCollator,
+    LengthGroupedTrainer,
+    ThroughputCallback,
+    TokenBudgetBatchSampler,
+    TokenCounter,
+)
+from pretokenize import PackedCollator, PackedDataset, build_cache
+
 BASE_DIR = Path(__file__).resolve().parents[1]  # bini/
 
 DATA_PATH = BASE_DIR / "data/processed/sft_train.jsonl"
@@ -106,6 +114,9 @@ def main():
     tokenizer.padding_side = "right"
     max_length = cfg.get("max_seq_length", 2048)
 
+    # 동적 패딩: 배치 최장 길이까지만 패딩 + 길이 버킷 배치
+    dynamic_padding = bool(cfg.get("dynamic_padding", False))
+
     # 응답 시작 토큰 찾기 (labels 마스킹용)
     assistant_token = "<assistant>"
 
@@ -114,7 +125,7 @@ def main():
             examples["text"],
             truncation=True,
             max_length=max_length,
-            padding="max_length",
+            padding=False if dynamic_padding else "max_length",
             return_tensors=None,
         )
 
@@ -150,12 +161,38 @@ def main():
         tokenized["labels"] = labels_list
         return tokenized
 
-    # 데이터셋 전처리
-    tokenized_ds = ds["train"].map(
-        tokenize_function,
-        batched=True,
-        remove_columns=ds["train"].column_names,
-    )
+    batch_sampler = None
+    if cfg.get("packing", False):
+        # 토크나이즈/패킹 결과를 캐시에서 재사용 (토크나이저 + 데이터 해시 키)
+        mode = "packing"
+        cache_dir = build_cache(tokenizer, DATA_PATH, max_length=max_length, pack=True)
+        tokenized_ds = PackedDataset(cache_dir)
+        data_collator = PackedCollator(tokenizer.pad_token_id, dtype=torch_dtype)
+    else:
+        # 데이터셋 전처리
+        tokenized_ds = ds["train"].map(
+            tokenize_function,
+            batched=True,
+            remove_columns=ds["train"].column_names,
+        )
+        if dynamic_padding:
+            mode = "dynamic_padding"
+            data_collator = DynamicPaddingCollator(tokenizer.pad_token_id)
+            # 메모리 상한은 기존 (batch_size x max_seq_length) 패딩 배치와 동일하게 유지
+            max_tokens = cfg.get("max_tokens_per_batch", cfg["per_device_train_batch_size"] * max_length)
+            batch_sampler = TokenBudgetBatchSampler(
+                [len(ids) for ids in tokenized_ds["input_ids"]],
+                max_tokens=max_tokens,
+                max_batch_size=cfg.get("max_batch_size"),
+            )
+            print(f"길이 버킷 배치: {len(batch_sampler)}개 (토큰 상한 {max_tokens})")
+        else:
+            mode = "max_length_padding"
+            data_collator = default_data_collator  # labels를 덮어쓰지 않음
+
+    # step 시간 / tokens/sec 측정 (모드별 리포트를 비교해 before/after 확인)
+    token_counter = TokenCounter(data_collator, tokenizer.pad_token_id)
+    throughput_cb = ThroughputCallback(token_counter, Path(out_dir) / f"throughput_{mode}.json", mode)
 
     training_args = TrainingArguments(
         output_dir=out_dir,
@@ -173,13 +210,19 @@ def main():
         report_to=[],
         push_to_hub=False,
         dataloader_pin_memory=False if device == "mps" else True,
+        # 패킹 모드의 position_ids 컬럼을 Trainer가 제거하지 않도록
+        remove_unused_columns=not cfg.get("packing", False),
+        # TokenCounter가 메인 프로세스에서 토큰 수를 세도록 워커 미사용
+        dataloader_num_workers=0,
     )
 
-    trainer = Trainer(
+    trainer = LengthGroupedTrainer(
         model=model,
         args=training_args,
         train_dataset=tokenized_ds,
-        data_collator=default_data_collator,  # labels를 덮어쓰지 않음
+        data_collator=token_counter,
+        callbacks=[throughput_cb],
+        batch_sampler=batch_sampler,
     )
 
     trainer.train()
@@ -0,0 +1,237 @@
+# vegan_demo/bench_async.py
+"""
+main3_claude.analyze_images 동시성별 처리량 벤치마크 (로컬 모의 서버)
+
+127.0.0.1에 OpenAI 호환 /v1/chat/completions 모의 서버를 띄우고 OPENAI_BASE_URL로 연결한다.
+- 응답: bench_fused.FIXTURES (result.txt 기준 고정 응답)
+- 지연: 호출당 MOCK_LATENCY_MS (±20% 지터)
+- rate limit: 1초 창에 MOCK_RPS개까지. 모든 응답에 x-ratelimit-* 헤더, 넘으면 429 + retry-after-ms
+동시성 1/8/32 (BENCH_CONCURRENCY)에서 images/sec, 첫 결과까지 시간, 429/재시도 횟수를 비교한다.
+"""
+
+import sys
+import io
+import os
+import json
+import time
+import random
+import hashlib
+import asyncio
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import main3_claude as vegan
+from bench_fused import FIXTURES, load_test_images
+
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_IMAGE_DIR = os.path.join(CURRENT_DIR, "test_image")
+RESULT_PATH = os.path.join(CURRENT_DIR, "result_async_bench.json")
+
+MOCK_LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "300"))
+MOCK_RPS = int(os.getenv("MOCK_RPS", "40"))
+
+BENCH_IMAGES = int(os.getenv("BENCH_IMAGES", "64"))
+BENCH_CONCURRENCY = [int(c) for c in os.getenv("BENCH_CONCURRENCY", "1,8,32").split(",")]
+
+
+# ===== 모의 서버 =====
+class MockState:
+    """요청 창(rate limit)과 요청/429 카운터"""
+
+    def __init__(self, images: dict):
+        # base64 해시 -> (파일명, 이미지 토큰 수), load_test_images 결과
+        self.images = images
+        self.lock = threading.Lock()
+        self.window = deque()
+        self.requests = 0
+        self.rejected = 0
+
+    def admit(self) -> tuple:
+        """(허용 여부, 남은 요청 수, 창이 비기까지 초)"""
+        with self.lock:
+            now = time.monotonic()
+            while self.window and now - self.window[0] >= 1.0:
+                self.window.popleft()
+            self.requests += 1
+            admitted = len(self.window) < MOCK_RPS
+            if admitted:
+                self.window.append(now)
+            else:
+                self.rejected += 1
+            reset = 1.0 - (now - self.window[0]) if self.window else 0.0
+            return admitted, MOCK_RPS - len(self.window), max(reset, 0.001)
+
+    def reset(self):
+        with self.lock:
+            self.window.clear()
+            self.requests = 0
+            self.rejected = 0
+
+
+def answer(messages: list, images: dict) -> str:
+    """요청 메시지 → 고정 응답 content (system 프롬프트로 노드 구분, 이미지 해시/재료 문자열로 이미지 구분)"""
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    fixture = None
+    for message in messages:
+        parts = message["content"] if isinstance(message["content"], list) else [{"type": "text", "text": message["content"]}]
+        for part in parts:
+            if part["type"] == "image_url":
+                payload = part["image_url"]["url"].split(",", 1)[1]
+                fixture = FIXTURES[images[hashlib.sha256(payload.encode()).hexdigest()][0]]
+            elif message["role"] == "user" and fixture is None:
+                # 비건 단계 분석 호출은 이미지 없이 재료 문자열만 온다
+                fixture = next((f for f in FIXTURES.values()
+                                if (f["extracted_ingredients"] or f["estimated_ingredients"]) in part["text"]), None)
+
+    if system == vegan.FUSED_SYSTEM_PROMPT:
+        return json.dumps(fixture, ensure_ascii=False)
+    if "image classifier" in system:
+        return fixture["image_type"]
+    if "food expert" in system:
+        return json.dumps({k: fixture[k] for k in ("food_name", "estimated_ingredients")}, ensure_ascii=False)
+    if system == vegan.VEGAN_CLASSIFICATION_PROMPT:
+        keys = ("classification_name", "reason", "contains_ingredients")
+        return json.dumps({k: fixture[k] for k in keys}, ensure_ascii=False)
+    return fixture["extracted_ingredients"]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: dict, headers: dict):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        state = self.server.mock
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        admitted, remaining, reset = state.admit()
+        headers = {
+            "x-ratelimit-limit-requests": str(MOCK_RPS),
+            "x-ratelimit-remaining-requests": str(remaining),
+            "x-ratelimit-reset-requests": f"{reset * 1000:.0f}ms",
+        }
+        if not admitted:
+            headers["retry-after-ms"] = f"{reset * 1000:.0f}"
+            self._send(429, {"error": {"message": "Rate limit reached for requests", "type": "requests",
+                                       "code": "rate_limit_exceeded"}}, headers)
+            return
+
+        content = answer(request["messages"], state.images)
+        time.sleep(MOCK_LATENCY_MS / 1000 * random.uniform(0.8, 1.2))
+        self._send(200, {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }, headers)
+
+
+def start_mock_server(images: dict) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockHandler)
+    server.daemon_threads = True
+    server.mock = MockState(images)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ===== 벤치마크 =====
+async def run_level(paths: list, concurrency: int, state: MockState) -> dict:
+    state.reset()
+    vegan._batch_stats.update(calls=0, retries=0, rate_limited=0, waited_seconds=0.0)
+    vegan._rate_limit_until = 0.0
+
+    start = time.perf_counter()
+    first = None
+    results = []
+    async for result in vegan.analyze_images(paths, concurrency=concurrency):
+        if first is None:
+            first = time.perf_counter() - start
+        results.append(result)
+    wall = time.perf_counter() - start
+
+    correct = sum(
+        1 for r in results
+        if r["success"] and (r.get("analysis") or {}).get("classification_name")
+        == FIXTURES[os.path.basename(r["image_path"])]["classification_name"]
+    )
+    stats = vegan.get_batch_stats()
+    return {
+        "concurrency": concurrency,
+        "images": len(results),
+        "wall_seconds": round(wall, 3),
+        "images_per_sec": round(len(results) / wall, 2),
+        "first_result_seconds": round(first, 3),
+        "correct": correct,
+        "failed": sum(1 for r in results if not r["success"]),
+        "server_requests": state.requests,
+        "server_429": state.rejected,
+        "client_retries": stats["retries"],
+        "rate_limit_wait_seconds": round(stats["waited_seconds"], 2),
+    }
+
+
+async def run_all(paths: list, state: MockState) -> list:
+    # analyze_images는 한 이벤트 루프 안에서 써야 하므로 모든 동시성 단계를 한 루프에서 돌린다
+    return [await run_level(paths, concurrency, state) for concurrency in BENCH_CONCURRENCY]
+
+
+if __name__ == "__main__":
+    # 터미널 한글 깨짐 방지
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+    images = load_test_images()
+    server = start_mock_server(images)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "mock"
+
+    names = sorted(name for name, _ in images.values())
+    paths = [os.path.join(TEST_IMAGE_DIR, names[i % len(names)]) for i in range(BENCH_IMAGES)]
+    print(f"이미지 {len(paths)}장 ({', '.join(names)} 반복), 호출 지연 {MOCK_LATENCY_MS:.0f}ms, "
+          f"모의 한도 {MOCK_RPS} req/s, 동시성 {BENCH_CONCURRENCY}")
+
+    # 노드 로그는 벤치마크 출력에서 제외
+    stdout = sys.stdout
+    sys.stdout = io.StringIO()
+    try:
+        # 같은 이미지를 반복 스캔하므로 결과 캐시를 끄고 실제 호출 처리량을 잰다
+        vegan.SCAN_CACHE = False
+        if vegan.initialize_vegan_system()["status"] != "success":
+            raise SystemExit("초기화 실패")
+        rows = asyncio.run(run_all(paths, server.mock))
+    finally:
+        sys.stdout = stdout
+        server.shutdown()
+
+    print(f"\n{'동시성':>6} | {'images/s':>8} | {'wall s':>7} | {'첫 결과 s':>9} | {'정답':>7} | "
+          f"{'요청':>5} | {'429':>4} | {'재시도':>5} | {'한도 대기 합 s':>10}")
+    print("-" * 92)
+    for r in rows:
+        print(f"{r['concurrency']:>6} | {r['images_per_sec']:>8.2f} | {r['wall_seconds']:>7.2f} | "
+              f"{r['first_result_seconds']:>9.2f} | {r['correct']:>3}/{r['images']:<3} | {r['server_requests']:>5} | "
+              f"{r['server_429']:>4} | {r['client_retries']:>5} | {r['rate_limit_wait_seconds']:>10.2f}")
+    base = rows[0]["images_per_sec"]
+    for r in rows[1:]:
+        print(f"  동시성 {r['concurrency']}: x{r['images_per_sec'] / base:.1f} (동시성 {rows[0]['concurrency']} 대비)")
+
+    with open(RESULT_PATH, "w", encoding="utf-8") as f:
+        json.dump({
+            "mock_latency_ms": MOCK_LATENCY_MS,
+            "mock_rps": MOCK_RPS,
+            "fused": vegan.get_system_status()["fused_mode"],
+            "rows": rows,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\n결과 저장: {RESULT_PATH}")
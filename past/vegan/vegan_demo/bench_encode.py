@@ -0,0 +1,97 @@
+# vegan_demo/bench_encode.py
+"""
+스캔 1회당 이미지 인코딩 비용 비교 (API 호출 없이 노드의 인코딩 패턴만 재현)
+
+- before: 노드마다 encode_image로 파일을 다시 읽고 Base64 인코딩 + data URL 문자열 생성 (스캔당 NODE_CALLS회)
+- after:  ImageHandle 하나를 상태로 공유, 첫 노드에서만 인코딩하고 나머지는 같은 문자열 재사용
+          (인코딩 재사용 효과만 보도록 업로드 전처리는 끈다. 전처리 비교는 bench_preprocess.py)
+
+메모리는 tracemalloc peak (Python 할당 기준), CPU는 process_time.
+"""
+
+import sys
+import io
+import os
+import json
+import time
+import base64
+import tracemalloc
+
+from image_handle import ImageHandle, stats
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_IMAGE_DIR = os.path.join(CURRENT_DIR, "test_image")
+RESULT_PATH = os.path.join(CURRENT_DIR, "result_encode_bench.json")
+
+# 스캔 한 번에 이미지를 쓰는 노드 수 (detect + extract/recognize = 2, fused 폴백까지 3)
+NODE_CALLS = int(os.getenv("NODE_CALLS", "3"))
+REPEAT = int(os.getenv("BENCH_REPEAT", "5"))
+
+
+def legacy_encode_image(image_path: str):
+    """변경 전 encode_image와 동일한 구현"""
+    try:
+        with open(image_path, "rb") as image_file:
+            return base64.b64encode(image_file.read()).decode('utf-8')
+    except FileNotFoundError:
+        return None
+
+
+def scan_before(image_path: str):
+    urls = []
+    for _ in range(NODE_CALLS):
+        base64_image = legacy_encode_image(image_path)
+        urls.append(f"data:image/jpeg;base64,{base64_image}")
+        # 노드가 끝나면 요청 본문과 함께 해제된다
+        urls.clear()
+
+
+def scan_after(image_path: str):
+    with ImageHandle(image_path, preprocess=False) as image:
+        urls = []
+        for _ in range(NODE_CALLS):
+            urls.append(image.data_url)
+            urls.clear()
+
+
+def measure(scan, image_path: str) -> dict:
+    peaks, cpu, wall = [], [], []
+    for _ in range(REPEAT):
+        tracemalloc.start()
+        c0, w0 = time.process_time(), time.perf_counter()
+        scan(image_path)
+        cpu.append(time.process_time() - c0)
+        wall.append(time.perf_counter() - w0)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {
+        "peak_mb": round(max(peaks) / 1024 ** 2, 2),
+        "cpu_ms": round(sorted(cpu)[len(cpu) // 2] * 1000, 2),
+        "wall_ms": round(sorted(wall)[len(wall) // 2] * 1000, 2),
+    }
+
+
+if __name__ == "__main__":
+    # 터미널 한글 깨짐 방지
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+    rows = []
+    for name in sorted(os.listdir(TEST_IMAGE_DIR)):
+        path = os.path.join(TEST_IMAGE_DIR, name)
+        size_mb = os.path.getsize(path) / 1024 ** 2
+        before = measure(scan_before, path)
+        after = measure(scan_after, path)
+        rows.append({"image": name, "file_mb": round(size_mb, 2), "before": before, "after": after})
+
+    print(f"노드 {NODE_CALLS}개가 이미지를 쓰는 스캔 기준, 반복 {REPEAT}회 (CPU/wall은 중앙값)\n")
+    print(f"{'이미지':<12} | {'파일 MB':>7} | {'peak MB 전→후':>16} | {'CPU ms 전→후':>18} | {'wall ms 전→후':>18}")
+    print("-" * 84)
+    for r in rows:
+        b, a = r["before"], r["after"]
+        print(f"{r['image']:<12} | {r['file_mb']:>7.2f} | {b['peak_mb']:>7.2f} → {a['peak_mb']:<6.2f} | "
+              f"{b['cpu_ms']:>8.2f} → {a['cpu_ms']:<7.2f} | {b['wall_ms']:>8.2f} → {a['wall_ms']:<7.2f}")
+    print(f"\nImageHandle 누적: {stats()}")
+
+    with open(RESULT_PATH, "w", encoding="utf-8") as f:
+        json.dump({"node_calls": NODE_CALLS, "repeat": REPEAT, "rows": rows}, f, ensure_ascii=False, indent=2)
+    print(f"결과 저장: {RESULT_PATH}")
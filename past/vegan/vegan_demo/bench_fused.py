@@ -0,0 +1,256 @@
+# vegan_demo/bench_fused.py
+"""
+main3_claude.py 다중 노드 모드 vs fused 모드 비교 벤치마크
+
+실제 OpenAI API 대신 로컬 대역 클라이언트(StandInOpenAI)를 쓴다.
+- 응답: result.txt의 실제 분석 결과를 고정 응답으로 사용
+- 토큰: 텍스트는 글자 수 기반 추정, 이미지는 gpt-4o high detail 타일 공식 (85 + 170 * 512px 타일 수)
+- 지연: 호출당 고정 지연 + 입력/출력 토큰 비례 지연 (BENCH_LATENCY_SCALE로 배율 조정)
+"""
+
+import sys
+import io
+import os
+import json
+import math
+import time
+import random
+import hashlib
+from types import SimpleNamespace
+
+from PIL import Image
+
+import main3_claude as vegan
+from image_handle import ImageHandle
+
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_IMAGE_DIR = os.path.join(CURRENT_DIR, "test_image")
+RESULT_PATH = os.path.join(CURRENT_DIR, "result_fused_bench.json")
+
+# 지연 모델 (gpt-4o 관측치 근사): 호출당 고정 + 입력 토큰당 + 출력 토큰당 (초)
+CALL_OVERHEAD_S = 0.45
+PROMPT_TOKEN_S = 0.00004
+COMPLETION_TOKEN_S = 0.012
+LATENCY_SCALE = float(os.getenv("BENCH_LATENCY_SCALE", "1.0"))
+
+# fused 응답 중 일부러 검증에 실패시킬 비율 (폴백 경로 측정용)
+FUSED_INVALID_RATE = float(os.getenv("FUSED_INVALID_RATE", "0"))
+
+REPEAT = int(os.getenv("BENCH_REPEAT", "3"))
+
+
+# ===== 고정 응답 (result.txt 기준) =====
+FIXTURES = {
+    "IMG_8393.jpg": {
+        "image_type": "ingredients",
+        "extracted_ingredients": "코코아매스,코코아버터,설탕,우유,유당,유화제,향료,대두,캐러멜색소,정제염",
+        "food_name": "",
+        "estimated_ingredients": "",
+        "classification_name": "2단계: 락토 베지테리언 (Lacto Vegetarian)",
+        "reason": "제품에 우유 및 유당이 포함되어 있어 달걀을 제외한 유제품 성분 섭취가 가능한 락토 베지테리언 단계까지 허용됩니다.",
+        "contains_ingredients": ["우유", "유당"],
+    },
+    "test1.png": {
+        "image_type": "food",
+        "extracted_ingredients": "",
+        "food_name": "Smoked Salmon Salad",
+        "estimated_ingredients": "smoked salmon, mixed greens, capers, onions",
+        "classification_name": "5단계: 페스코 베지테리언 (Pesco / Pescatarian)",
+        "reason": "'smoked salmon'은 생선류 성분이므로 유제품이나 달걀을 제외하고 생선/해산물 섭취가 가능한 5단계: 페스코 베지테리언에 해당합니다.",
+        "contains_ingredients": ["smoked salmon"],
+    },
+    "test3.jpg": {
+        "image_type": "food",
+        "extracted_ingredients": "",
+        "food_name": "Korean Lunch Tray",
+        "estimated_ingredients": "seaweed, rice, black beans, red beans, spinach, sesame seeds, spring rolls, sweet chili sauce, braised beef, potatoes, quail eggs, kimchi stew, tofu, green onions, gochujang",
+        "classification_name": "채식주의자에게 적합하지 않음",
+        "reason": "원재료명 목록에 'braised beef'가 포함되어 있어, 붉은 고기(소고기)를 포함한 제품이므로 '채식주의자에게 적합하지 않음'으로 분류됩니다.",
+        "contains_ingredients": ["braised beef"],
+    },
+}
+DEFAULT_FIXTURE = "test1.png"
+
+
+# ===== 토큰 추정 =====
+def estimate_text_tokens(text: str) -> int:
+    """ASCII는 4글자당 1토큰, 한글 등 비ASCII는 글자당 1토큰으로 근사"""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """gpt-4o high detail: 2048px 안으로 축소 → 짧은 변 768px → 512px 타일당 170 + 기본 85"""
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+# ===== OpenAI 클라이언트 대역 =====
+class StandInOpenAI:
+    """chat.completions.create만 흉내 내는 로컬 대역
+
+    요청의 system 프롬프트로 어떤 노드인지 구분하고, 이미지 data URL의 해시로 어떤 테스트 이미지인지 찾는다.
+    이미지가 없는 비건 단계 분석 호출은 직전에 본 이미지의 고정 응답을 쓴다 (그래프는 순차 실행).
+    """
+
+    def __init__(self, images: dict):
+        # base64 해시 -> (파일명, 이미지 토큰 수)
+        self.images = images
+        self.rng = random.Random(0)
+        self.calls = []
+        self._last_image = (None, 0)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _image(self, messages):
+        for message in messages:
+            if isinstance(message["content"], list):
+                for part in message["content"]:
+                    if part["type"] == "image_url":
+                        payload = part["image_url"]["url"].split(",", 1)[1]
+                        return self.images[hashlib.sha256(payload.encode()).hexdigest()]
+        return None
+
+    def _answer(self, messages, image_name):
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        fixture = FIXTURES.get(image_name or "", FIXTURES[DEFAULT_FIXTURE])
+        if system == vegan.FUSED_SYSTEM_PROMPT:
+            if self.rng.random() < FUSED_INVALID_RATE:
+                return "fused", json.dumps({"image_type": fixture["image_type"]}, ensure_ascii=False)
+            return "fused", json.dumps(fixture, ensure_ascii=False)
+        if "image classifier" in system:
+            return "detect", fixture["image_type"]
+        if "food expert" in system:
+            return "recognize", json.dumps({k: fixture[k] for k in ("food_name", "estimated_ingredients")},
+                                           ensure_ascii=False)
+        if system == vegan.VEGAN_CLASSIFICATION_PROMPT:
+            keys = ("classification_name", "reason", "contains_ingredients")
+            return "analyze", json.dumps({k: fixture[k] for k in keys}, ensure_ascii=False)
+        # 원재료명 추출 노드는 system 없이 user 텍스트 + 이미지
+        return "extract", fixture["extracted_ingredients"]
+
+    def _create(self, model, messages, **kwargs):
+        image = self._image(messages)
+        if image:
+            self._last_image = image
+        image_name, image_tokens = self._last_image[0], image[1] if image else 0
+        node, content = self._answer(messages, image_name)
+
+        prompt_tokens = image_tokens
+        for message in messages:
+            parts = message["content"] if isinstance(message["content"], list) else [{"type": "text", "text": message["content"]}]
+            prompt_tokens += sum(estimate_text_tokens(p["text"]) for p in parts if p["type"] == "text")
+        completion_tokens = estimate_text_tokens(content)
+
+        time.sleep(LATENCY_SCALE * (CALL_OVERHEAD_S + prompt_tokens * PROMPT_TOKEN_S
+                                    + completion_tokens * COMPLETION_TOKEN_S))
+        self.calls.append({"node": node, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                  total_tokens=prompt_tokens + completion_tokens),
+        )
+
+
+def load_test_images() -> dict:
+    """test_image/의 이미지 -> {base64 해시: (파일명, 이미지 토큰 수)}"""
+    images = {}
+    for name in sorted(os.listdir(TEST_IMAGE_DIR)):
+        path = os.path.join(TEST_IMAGE_DIR, name)
+        # 노드가 보내는 것과 같은 (전처리된) data URL로 해시
+        with ImageHandle(path) as image:
+            payload = image.data_url.split(",", 1)[1]
+            size = image.info.get("size")
+        if size is None:
+            # 전처리 없이 원본을 그대로 보낸 경우 (VEGAN_IMAGE_PREPROCESS=0 / 전처리 실패)
+            with Image.open(path) as img:
+                size = img.size
+        # 토큰은 원본이 아니라 실제로 업로드한 해상도 기준
+        tokens = estimate_image_tokens(*size)
+        images[hashlib.sha256(payload.encode()).hexdigest()] = (name, tokens)
+    return images
+
+
+def run_mode(fused: bool, images: dict) -> list:
+    client = StandInOpenAI(images)
+    vegan._client = client
+    vegan._graph = vegan.build_vegan_analyzer_graph(fused=fused)
+
+    rows = []
+    for name, _ in sorted(images.values()):
+        path = os.path.join(TEST_IMAGE_DIR, name)
+        for _ in range(REPEAT):
+            client.calls.clear()
+            start = time.perf_counter()
+            result = vegan.analyze_image(path, verbose=False)
+            wall = time.perf_counter() - start
+            rows.append({
+                "mode": "fused" if fused else "multi",
+                "image": name,
+                "wall_seconds": round(wall, 3),
+                "calls": len(client.calls),
+                "nodes": [c["node"] for c in client.calls],
+                "prompt_tokens": sum(c["prompt_tokens"] for c in client.calls),
+                "completion_tokens": sum(c["completion_tokens"] for c in client.calls),
+                "fused_ok": result.get("metadata", {}).get("fused", False),
+                "classification": (result.get("analysis") or {}).get("classification_name"),
+            })
+    return rows
+
+
+def summarize(rows: list) -> dict:
+    n = len(rows)
+    return {
+        "runs": n,
+        "avg_wall_seconds": round(sum(r["wall_seconds"] for r in rows) / n, 3),
+        "avg_calls": round(sum(r["calls"] for r in rows) / n, 2),
+        "avg_prompt_tokens": round(sum(r["prompt_tokens"] for r in rows) / n, 1),
+        "avg_completion_tokens": round(sum(r["completion_tokens"] for r in rows) / n, 1),
+        "fused_ok_rate": round(sum(r["fused_ok"] for r in rows) / n, 3),
+    }
+
+
+if __name__ == "__main__":
+    # 터미널 한글 깨짐 방지
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+    images = load_test_images()
+    print(f"테스트 이미지 {len(images)}개, 반복 {REPEAT}회, 지연 배율 {LATENCY_SCALE}, fused 검증 실패율 {FUSED_INVALID_RATE}")
+
+    # 노드 로그는 벤치마크 출력에서 제외
+    stdout = sys.stdout
+    sys.stdout = io.StringIO()
+    try:
+        multi_rows = run_mode(False, images)
+        fused_rows = run_mode(True, images)
+    finally:
+        sys.stdout = stdout
+
+    summary = {"multi": summarize(multi_rows), "fused": summarize(fused_rows)}
+
+    print(f"\n{'이미지':<14} | {'모드':<6} | {'wall s':>7} | {'호출':>4} | {'입력 tok':>8} | {'출력 tok':>8} | 판정")
+    print("-" * 100)
+    for row in multi_rows + fused_rows:
+        print(f"{row['image']:<14} | {row['mode']:<6} | {row['wall_seconds']:>7.2f} | {row['calls']:>4} | "
+              f"{row['prompt_tokens']:>8} | {row['completion_tokens']:>8} | {row['classification']}")
+
+    print("\n[요약] (이미지당 평균)")
+    for mode, s in summary.items():
+        print(f"  {mode:<6}: {s['avg_wall_seconds']:.2f}s, 호출 {s['avg_calls']:.1f}회, "
+              f"입력 {s['avg_prompt_tokens']:.0f} tok, 출력 {s['avg_completion_tokens']:.0f} tok"
+              + (f", fused 통과율 {s['fused_ok_rate'] * 100:.0f}%" if mode == "fused" else ""))
+    speedup = summary["multi"]["avg_wall_seconds"] / summary["fused"]["avg_wall_seconds"]
+    print(f"  fused 지연 단축: x{speedup:.2f}")
+
+    # 두 모드의 판정이 같은지 확인
+    mismatch = [(m["image"], m["classification"], f["classification"])
+                for m, f in zip(multi_rows, fused_rows) if m["classification"] != f["classification"]]
+    if mismatch:
+        print(f"  ⚠ 판정 불일치 {len(mismatch)}건: {mismatch[:3]}")
+
+    with open(RESULT_PATH, "w", encoding="utf-8") as f:
+        json.dump({"summary": summary, "runs": multi_rows + fused_rows}, f, ensure_ascii=False, indent=2)
+    print(f"\n결과 저장: {RESULT_PATH}")
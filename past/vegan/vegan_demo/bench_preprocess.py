@@ -0,0 +1,126 @@
+# vegan_demo/bench_preprocess.py
+"""
+업로드 전처리(image_handle.preprocess_image) 전후 비교
+
+- 업로드 바이트 (data URL 길이), 인코딩 시간, 전송 해상도, MIME
+- 이미지 토큰 추정 (gpt-4o high detail 공식, bench_fused.estimate_image_tokens)
+- VEGAN_BENCH_LIVE=1 이고 OPENAI_API_KEY가 있으면 main3_claude로 실제 분석을 돌려
+  전처리 전/후 판정을 result.txt 기준 판정과 비교 (정확도 변화)
+  그 외에는 결과 파일에 accuracy.measured = false로 미측정임을 남긴다.
+  (bench_fused의 대역 클라이언트는 이미지 해시로 고정 응답을 돌려주므로 전처리가 판정에 주는 영향을 볼 수 없다)
+"""
+
+import sys
+import io
+import os
+import json
+import time
+
+from PIL import Image
+
+import image_handle
+from image_handle import ImageHandle
+from bench_fused import FIXTURES, estimate_image_tokens
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_IMAGE_DIR = os.path.join(CURRENT_DIR, "test_image")
+RESULT_PATH = os.path.join(CURRENT_DIR, "result_preprocess_bench.json")
+
+LIVE = os.getenv("VEGAN_BENCH_LIVE", "0") == "1"
+REPEAT = int(os.getenv("BENCH_REPEAT", "5"))
+
+UNMEASURED_NOTE = ("실제 API 미호출로 판정 정확도 미측정 (VEGAN_BENCH_LIVE=1 + OPENAI_API_KEY 필요). "
+                   "대역 클라이언트는 이미지 해시로 고정 응답을 돌려주므로 전처리 영향을 측정할 수 없다")
+
+
+def measure(path: str, preprocess: bool) -> dict:
+    seconds = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        with ImageHandle(path, preprocess=preprocess) as image:
+            data_url = image.data_url
+            info = image.info
+        seconds.append(time.perf_counter() - start)
+    return {
+        "upload_bytes": len(data_url),
+        "mime": info["mime"],
+        "encode_ms": round(sorted(seconds)[len(seconds) // 2] * 1000, 2),
+        "size": info.get("size"),
+        "quality": info.get("quality"),
+    }
+
+
+def live_accuracy(paths: list) -> dict:
+    """실제 API로 전처리 전/후 판정 비교 (기준: bench_fused.FIXTURES의 result.txt 판정)"""
+    import main3_claude as vegan
+
+    # 전처리 전/후를 모두 실제로 호출해야 하므로 결과 캐시는 끈다
+    vegan.SCAN_CACHE = False
+    if vegan.initialize_vegan_system(fused=False)["status"] != "success":
+        return {"measured": False, "note": "시스템 초기화 실패 (OPENAI_API_KEY 확인)"}
+    report = {"measured": True}
+    for preprocess in (False, True):
+        image_handle.IMAGE_PREPROCESS = preprocess
+        rows = []
+        for path in paths:
+            name = os.path.basename(path)
+            result = vegan.analyze_image(path, verbose=False)
+            predicted = (result.get("analysis") or {}).get("classification_name")
+            expected = FIXTURES.get(name, {}).get("classification_name")
+            rows.append({"image": name, "predicted": predicted, "expected": expected,
+                         "correct": predicted == expected})
+        key = "preprocessed" if preprocess else "original"
+        report[key] = {"accuracy": sum(r["correct"] for r in rows) / len(rows), "rows": rows}
+    return report
+
+
+if __name__ == "__main__":
+    # 터미널 한글 깨짐 방지
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+    paths = [os.path.join(TEST_IMAGE_DIR, name) for name in sorted(os.listdir(TEST_IMAGE_DIR))]
+    rows = []
+    for path in paths:
+        with Image.open(path) as img:
+            source_size = img.size
+        before = measure(path, preprocess=False)
+        after = measure(path, preprocess=True)
+        before["size"] = list(source_size)
+        before["mime_sent_before"] = "image/jpeg"  # 변경 전에는 포맷과 무관하게 image/jpeg로 보냈다
+        before["image_tokens"] = estimate_image_tokens(*source_size)
+        after["image_tokens"] = estimate_image_tokens(*after["size"])
+        rows.append({"image": os.path.basename(path), "before": before, "after": after})
+
+    print(f"전처리: detail={image_handle.IMAGE_DETAIL}, format={image_handle.IMAGE_FORMAT}, "
+          f"예산 {image_handle.IMAGE_MAX_KB} KB, 반복 {REPEAT}회 (인코딩 시간은 중앙값)\n")
+    print(f"{'이미지':<12} | {'업로드 KB 전→후':>18} | {'인코딩 ms 전→후':>17} | {'해상도 전→후':>22} | "
+          f"{'원본 포맷 → 전송 MIME':>24} | {'이미지 tok':>10}")
+    print("-" * 124)
+    for r in rows:
+        b, a = r["before"], r["after"]
+        print(f"{r['image']:<12} | {b['upload_bytes'] / 1024:>8.0f} → {a['upload_bytes'] / 1024:<7.0f} | "
+              f"{b['encode_ms']:>7.1f} → {a['encode_ms']:<7.1f} | "
+              f"{'x'.join(map(str, b['size'])):>10} → {'x'.join(map(str, a['size'])):<9} | "
+              f"{b['mime']:>10} → {a['mime']:<11} | {b['image_tokens']:>4} → {a['image_tokens']:<4}")
+    total_before = sum(r["before"]["upload_bytes"] for r in rows)
+    total_after = sum(r["after"]["upload_bytes"] for r in rows)
+    print("(변경 전에는 원본 포맷과 무관하게 image/jpeg로 전송)")
+    print(f"\n업로드 합계: {total_before / 1024:.0f} KB → {total_after / 1024:.0f} KB "
+          f"({(1 - total_after / total_before) * 100:.1f}% 감소)")
+
+    accuracy = live_accuracy(paths) if LIVE else {"measured": False, "note": UNMEASURED_NOTE}
+    if accuracy["measured"]:
+        for key in ("original", "preprocessed"):
+            print(f"판정 정확도 ({key}): {accuracy[key]['accuracy'] * 100:.0f}%")
+    else:
+        print(f"판정 정확도: {accuracy['note']}")
+
+    with open(RESULT_PATH, "w", encoding="utf-8") as f:
+        json.dump({
+            "detail": image_handle.IMAGE_DETAIL,
+            "format": image_handle.IMAGE_FORMAT,
+            "max_kb": image_handle.IMAGE_MAX_KB,
+            "rows": rows,
+            "accuracy": accuracy,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"결과 저장: {RESULT_PATH}")
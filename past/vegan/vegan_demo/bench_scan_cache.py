@@ -0,0 +1,215 @@
+# vegan_demo/bench_scan_cache.py
+"""
+결과 캐시(scan_cache.py) hit율 / 아낀 호출 수 / 오판정 측정
+
+원본을 한 번씩 스캔해 캐시에 넣은 뒤, 같은 사진을 다르게 찍은 것처럼 만든 변형
+(축소, 재압축, 밝기, 흐림, 3도 회전, 가장자리 잘림)과 겉모습은 거의 같지만 다른 제품인 사진을 다시 스캔한다.
+- 사진: test_image/의 음식 사진
+  (+ test1_tofu: test1.png의 연어만 두부 색으로 바꾼 다른 음식. 지각 해시는 회전/잘림 변형만큼 가깝지만 판정이 달라진다)
+- 원재료명: 같은 레이아웃에 원재료 텍스트만 다르게 그린 합성 패널
+  (panel_a / 한 단어만 다른 panel_a2 (egg → gelatin, 판정이 달라진다) / 완전히 다른 panel_b)
+모델 호출은 bench_fused의 대역 클라이언트(StandInOpenAI)로 센다. 캐시 파일은 임시 디렉터리에 만든다.
+"""
+
+import sys
+import io
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+from PIL import Image, ImageChops, ImageDraw, ImageEnhance, ImageFilter, ImageFont
+
+import bench_fused
+import main3_claude as vegan
+from bench_fused import FIXTURES, StandInOpenAI
+from image_handle import ImageHandle
+from scan_cache import ScanCache, config_fingerprint
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_IMAGE_DIR = os.path.join(CURRENT_DIR, "test_image")
+RESULT_PATH = os.path.join(CURRENT_DIR, "result_scan_cache_bench.json")
+
+# 합성 원재료명 패널 (판정은 VEGAN_CLASSIFICATION_PROMPT 기준으로 기대되는 값)
+PANELS = {
+    "panel_a": {
+        "lines": ["wheat flour, sugar, palm oil, cocoa", "powder, skim milk powder, salt,",
+                  "emulsifier (soy lecithin), flavour,", "leavening agents, whey powder,", "egg, glucose syrup."],
+        "classification_name": "4단계: 락토-오보 베지테리언 (Lacto-Ovo Vegetarian)",
+        "contains_ingredients": ["skim milk powder", "whey powder", "egg"],
+    },
+    "panel_a2": {
+        "lines": ["wheat flour, sugar, palm oil, cocoa", "powder, skim milk powder, salt,",
+                  "emulsifier (soy lecithin), flavour,", "leavening agents, whey powder,", "gelatin, glucose syrup."],
+        "classification_name": "채식주의자에게 적합하지 않음",
+        "contains_ingredients": ["gelatin"],
+    },
+    "panel_b": {
+        "lines": ["rice, soybean oil, sea salt, seaweed,", "sesame, garlic powder, onion powder,",
+                  "yeast extract, spice, citric acid,", "natural flavour, maltodextrin,", "corn starch."],
+        "classification_name": "1단계: 비건 (Vegan)",
+        "contains_ingredients": [],
+    },
+}
+
+# 같은 접시, 다른 음식 (연어 샐러드 -> 두부 샐러드)
+NEAR_DUPLICATES = {
+    "test1_tofu": {
+        "source": "test1.png",
+        "fixture": {
+            **FIXTURES["test1.png"],
+            "food_name": "Tofu Salad",
+            "estimated_ingredients": "tofu, mixed greens, capers, onions",
+            "classification_name": "1단계: 비건 (Vegan)",
+            "reason": "합성 이미지 고정 응답",
+            "contains_ingredients": [],
+        },
+    },
+}
+# 원본을 저장하지 않고 "다른 제품 재스캔" 쪽으로만 쓰는 이미지
+DIFFERENT_PRODUCTS = {"panel_a2", *NEAR_DUPLICATES}
+
+VARIANTS = {
+    "half": lambda img: img.resize((img.width // 2, img.height // 2), Image.LANCZOS),
+    "q30": lambda img: img,  # 저장할 때 품질 30
+    "bright": lambda img: ImageEnhance.Brightness(img).enhance(1.25),
+    "dark": lambda img: ImageEnhance.Brightness(img).enhance(0.7),
+    "blur": lambda img: img.filter(ImageFilter.GaussianBlur(2)),
+    "rot3": lambda img: img.rotate(3, resample=Image.BICUBIC, fillcolor=(255, 255, 255)),
+    "crop": lambda img: img.crop((int(img.width * 0.03), int(img.height * 0.03),
+                                  int(img.width * 0.97), int(img.height * 0.97))),
+}
+
+
+def draw_panel(lines: list) -> Image.Image:
+    img = Image.new("RGB", (1200, 800), (250, 248, 240))
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default(size=34)
+    draw.rectangle((20, 20, 1180, 780), outline=(0, 0, 0), width=4)
+    draw.text((50, 40), "INGREDIENTS", fill=(0, 0, 0), font=font)
+    for i, line in enumerate(lines):
+        draw.text((50, 110 + 52 * i), line, fill=(20, 20, 20), font=font)
+    return img
+
+
+def replace_salmon(img: Image.Image) -> Image.Image:
+    """주황/분홍(채도 높은) 영역을 두부 색으로 덮는다"""
+    hue, saturation, _ = img.convert("HSV").split()
+    mask = ImageChops.multiply(hue.point(lambda h: 255 if h <= 25 or h >= 235 else 0),
+                               saturation.point(lambda v: 255 if v >= 90 else 0))
+    out = img.copy()
+    out.paste(Image.new("RGB", img.size, (236, 228, 205)), mask=mask)
+    return out
+
+
+def panel_fixture(panel: dict) -> dict:
+    return {
+        "image_type": "ingredients",
+        "extracted_ingredients": " ".join(panel["lines"]),
+        "food_name": "",
+        "estimated_ingredients": "",
+        "classification_name": panel["classification_name"],
+        "reason": "합성 패널 고정 응답",
+        "contains_ingredients": panel["contains_ingredients"],
+    }
+
+
+def build_images(work_dir: str) -> list:
+    """[(경로, 원본 이름, 변형 이름)]. 원본이 앞에 온다"""
+    sources = {}
+    for name in sorted(os.listdir(TEST_IMAGE_DIR)):
+        if FIXTURES.get(name, {}).get("image_type") == "food":
+            sources[name] = Image.open(os.path.join(TEST_IMAGE_DIR, name)).convert("RGB")
+    for name, near in NEAR_DUPLICATES.items():
+        FIXTURES[name] = near["fixture"]
+        sources[name] = replace_salmon(sources[near["source"]])
+    for name, panel in PANELS.items():
+        FIXTURES[name] = panel_fixture(panel)
+        sources[name] = draw_panel(panel["lines"])
+
+    originals, variants = [], []
+    for name, img in sources.items():
+        path = os.path.join(work_dir, f"{name}.jpg")
+        img.save(path, quality=90)
+        # 한 단어만 다른 panel_a2 / 재료만 바꾼 test1_tofu는 "다른 제품 재스캔" 쪽으로만 쓴다
+        (variants if name in DIFFERENT_PRODUCTS else originals).append((path, name, "original"))
+        if name in DIFFERENT_PRODUCTS:
+            continue
+        for variant, transform in VARIANTS.items():
+            path = os.path.join(work_dir, f"{name}_{variant}.jpg")
+            transform(img).save(path, quality=30 if variant == "q30" else 90)
+            variants.append((path, name, variant))
+    return originals + variants
+
+
+def register(client_images: dict, path: str, name: str):
+    """대역 클라이언트가 이 이미지를 알아보도록 업로드 data URL 해시 등록"""
+    with ImageHandle(path) as image:
+        payload = image.data_url.split(",", 1)[1]
+    client_images[hashlib.sha256(payload.encode()).hexdigest()] = (name, 0)
+
+
+if __name__ == "__main__":
+    # 터미널 한글 깨짐 방지
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+    work_dir = tempfile.mkdtemp(prefix="scan_cache_bench_")
+    bench_fused.LATENCY_SCALE = 0.0
+    try:
+        images = build_images(work_dir)
+        client_images = {}
+        for path, name, _ in images:
+            register(client_images, path, name)
+
+        client = StandInOpenAI(client_images)
+        vegan._client = client
+        vegan._graph = vegan.build_vegan_analyzer_graph(fused=False)
+        vegan._scan_cache = ScanCache(config_fingerprint("bench"), path=os.path.join(work_dir, "scan_cache.sqlite"))
+
+        rows = []
+        stdout = sys.stdout
+        sys.stdout = io.StringIO()  # 노드 로그 제외
+        try:
+            for path, name, variant in images:
+                client.calls.clear()
+                result = vegan.analyze_image(path, verbose=False)
+                cache = result.get("cache")
+                rows.append({
+                    "image": name,
+                    "variant": variant,
+                    "calls": len(client.calls),
+                    "outcome": ("stored" if variant == "original" and name not in DIFFERENT_PRODUCTS else
+                                "miss" if cache is None else
+                                "verified_hit" if cache["verified_by_text"] else "hit"),
+                    "distance": cache["distance"] if cache else None,
+                    "correct": (result.get("analysis") or {}).get("classification_name")
+                               == FIXTURES[name]["classification_name"],
+                })
+        finally:
+            sys.stdout = stdout
+        stats = vegan.get_scan_cache_stats()
+    finally:
+        vegan._scan_cache = None
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'이미지':<10} | {'변형':<8} | {'결과':<12} | {'거리':>4} | {'호출':>4} | 판정")
+    print("-" * 60)
+    for r in rows:
+        print(f"{r['image']:<10} | {r['variant']:<8} | {r['outcome']:<12} | "
+              f"{'' if r['distance'] is None else r['distance']:>4} | {r['calls']:>4} | {'O' if r['correct'] else 'X 오판정'}")
+
+    rescans = [r for r in rows if r["outcome"] != "stored"]
+    wrong = [r for r in rows if not r["correct"]]
+    lookups = stats["hits"] + stats["verified_hits"] + stats["misses"]
+    print(f"\n조회 {lookups}회 (원본 {lookups - len(rescans)}회 + 재스캔 {len(rescans)}회): hit {stats['hits']}, "
+          f"원재료명 확인 hit {stats['verified_hits']}, 확인 실패 {stats['verify_failed']}, "
+          f"음식 거리 초과 {stats['food_rejected']}, "
+          f"미스 {stats['misses'] - stats['verify_failed'] - stats['food_rejected']}")
+    print(f"hit율 {stats['hit_rate'] * 100:.0f}%, 아낀 호출 {stats['saved_calls']}회 "
+          f"(캐시 없이 {3 * len(rescans)}회 → {sum(r['calls'] for r in rescans)}회), "
+          f"확인용 호출 {stats['verify_calls']}회, 오판정 {len(wrong)}건")
+
+    with open(RESULT_PATH, "w", encoding="utf-8") as f:
+        json.dump({"stats": stats, "rows": rows}, f, ensure_ascii=False, indent=2)
+    print(f"결과 저장: {RESULT_PATH}")
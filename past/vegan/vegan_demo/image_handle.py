@@ -0,0 +1,235 @@
+# vegan_demo/image_handle.py
+"""
+이미지 인코딩 핸들
+
+그래프 실행(스캔) 한 번에 이미지 파일을 한 번만 읽어 data URL(Base64)로 만들고,
+모든 노드가 같은 문자열을 재사용하도록 상태(GraphState/AgentState)에 넣어 전달한다.
+인코딩은 처음 data_url에 접근할 때 수행하며, 프로세스 전체에서 들고 있는 인코딩 결과는
+IMAGE_CACHE_MB 안으로 제한한다 (넘으면 오래 안 쓴 핸들의 인코딩부터 버리고, 다시 필요하면 재인코딩).
+
+업로드 전 전처리 (IMAGE_PREPROCESS=1, 기본):
+EXIF 방향 보정 → vision 모델이 실제로 쓰는 해상도(detail 등급)로 축소 → 바이트 예산 안으로 JPEG/WebP 재압축.
+원본이 이미 등급 해상도 이하이고 예산 안이면 원본 바이트를 그대로 쓴다. MIME은 실제 포맷을 따른다.
+"""
+
+import io
+import os
+import time
+import base64
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+# 인코딩 결과 보관 상한 (MB)
+IMAGE_CACHE_MB = float(os.getenv("VEGAN_IMAGE_CACHE_MB", "64"))
+
+# 업로드 전처리 (0이면 원본 바이트를 그대로, MIME만 실제 포맷으로)
+IMAGE_PREPROCESS = os.getenv("VEGAN_IMAGE_PREPROCESS", "1") == "1"
+# gpt-4o detail 등급: high = 2048px 안으로 맞춘 뒤 짧은 변 768px, low = 512px 안
+IMAGE_DETAIL = os.getenv("VEGAN_IMAGE_DETAIL", "high")
+# 재압축 포맷 (jpeg/webp)과 업로드 바이트 예산 (KB)
+IMAGE_FORMAT = os.getenv("VEGAN_IMAGE_FORMAT", "jpeg")
+IMAGE_MAX_KB = int(os.getenv("VEGAN_IMAGE_MAX_KB", "350"))
+
+# 예산을 맞출 때 시도하는 품질 (높은 것부터), 최저 품질로도 넘으면 해상도를 줄여 다시 시도
+QUALITY_STEPS = (88, 80, 72, 64, 56)
+DOWNSCALE_STEP = 0.8
+
+MIME_BY_FORMAT = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+
+# 3의 배수 단위로 읽어야 조각별 Base64를 이어 붙여도 패딩이 중간에 생기지 않는다
+_CHUNK_BYTES = 3 * 256 * 1024
+
+_lock = threading.Lock()
+_live = OrderedDict()  # id(handle) -> handle (LRU 순서)
+_live_bytes = 0
+_stats = {"encodes": 0, "evictions": 0}
+
+
+def sniff_mime(head: bytes) -> str:
+    """파일 앞부분 매직 바이트로 MIME 판별 (모르는 포맷은 image/jpeg)"""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return "image/jpeg"
+
+
+def encode_data_url(image_path: str, mime: Optional[str] = None) -> Optional[str]:
+    """파일을 조각 단위로 Base64 인코딩해 data URL 문자열로 반환 (파일이 없으면 None)
+
+    파일 전체 bytes와 Base64 bytes를 동시에 들고 있지 않도록 조각별로 인코딩해 한 번에 join한다.
+    mime을 생략하면 파일 내용으로 판별한다.
+    """
+    parts = []
+    try:
+        with open(image_path, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK_BYTES), b""):
+                if mime is None:
+                    mime = sniff_mime(chunk[:16])
+                parts.append(base64.b64encode(chunk).decode("ascii"))
+    except FileNotFoundError:
+        print(f"[ERROR] 이미지 파일을 찾을 수 없습니다: {image_path}")
+        return None
+    return "".join([f"data:{mime or 'image/jpeg'};base64,"] + parts)
+
+
+def target_size(width: int, height: int, detail: str = IMAGE_DETAIL) -> Tuple[int, int]:
+    """vision 모델이 실제로 보는 해상도 (이보다 크게 보내면 서버에서 축소될 뿐 업로드만 늘어난다)"""
+    if detail == "low":
+        scale = min(1.0, 512 / max(width, height))
+    else:
+        scale = min(1.0, 2048 / max(width, height))
+        scale *= min(1.0, 768 / (min(width, height) * scale))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _save(img, fmt: str, quality: int) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "webp":
+        img.save(buf, format="WEBP", quality=quality, method=4)
+    else:
+        img.save(buf, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def preprocess_image(image_path: str, detail: str = IMAGE_DETAIL, fmt: str = IMAGE_FORMAT,
+                     max_bytes: int = IMAGE_MAX_KB * 1024) -> Tuple[bytes, str, dict]:
+    """업로드용 (bytes, mime, info). info에는 원본/결과 크기와 해상도, 품질, 원본 유지 여부
+
+    FileNotFoundError는 호출한 쪽에서 처리한다.
+    """
+    from PIL import Image, ImageOps
+
+    with open(image_path, "rb") as f:
+        source = f.read()
+    with Image.open(io.BytesIO(source)) as opened:
+        source_format = opened.format
+        source_size = opened.size
+        oriented = (opened.getexif() or {}).get(0x0112, 1) not in (1, None)
+        if source_format == "JPEG":
+            # JPEG은 디코딩 단계에서 1/2~1/8로 줄여 읽을 수 있다 (목표 해상도 이상은 유지)
+            opened.draft("RGB", target_size(*source_size, detail=detail))
+        img = ImageOps.exif_transpose(opened)
+        img.load()
+
+    size = target_size(*img.size, detail=detail)
+    info = {"source_bytes": len(source), "source_size": list(source_size), "source_format": source_format}
+
+    # 이미 모델 해상도 이하 + 예산 안 + 방향 보정 불필요 → 재압축 없이 원본 (화질 손실 없음)
+    if size == img.size and len(source) <= max_bytes and not oriented and source_format in MIME_BY_FORMAT:
+        info.update(size=list(img.size), bytes=len(source), quality=None, passthrough=True)
+        return source, MIME_BY_FORMAT[source_format], info
+
+    if img.mode not in ("RGB", "L") and not (fmt == "webp" and img.mode == "RGBA"):
+        if img.mode in ("RGBA", "LA", "P"):
+            # JPEG은 알파가 없으므로 흰 배경에 합성
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel("A"))
+        else:
+            img = img.convert("RGB")
+
+    while True:
+        resized = img.resize(size, Image.LANCZOS) if size != img.size else img
+        for quality in QUALITY_STEPS:
+            data = _save(resized, fmt, quality)
+            if len(data) <= max_bytes:
+                break
+        if len(data) <= max_bytes or min(size) <= 256:
+            break
+        size = (round(size[0] * DOWNSCALE_STEP), round(size[1] * DOWNSCALE_STEP))
+
+    info.update(size=list(size), bytes=len(data), quality=quality, passthrough=False)
+    return data, "image/webp" if fmt == "webp" else "image/jpeg", info
+
+
+class ImageHandle:
+    """스캔 한 번 동안 노드들이 공유하는 지연 인코딩 이미지 핸들"""
+
+    def __init__(self, image_path: str, preprocess: Optional[bool] = None):
+        self.image_path = image_path
+        self.preprocess = IMAGE_PREPROCESS if preprocess is None else preprocess
+        self.encodes = 0
+        self.info = {}  # 마지막 인코딩의 원본/업로드 바이트, 해상도, 소요 시간
+        self._data_url = None
+        self._missing = False
+
+    @property
+    def data_url(self) -> Optional[str]:
+        """"data:<mime>;base64,..." 문자열 (첫 접근 시 인코딩, 파일이 없으면 None)"""
+        with _lock:
+            if self._data_url is not None:
+                _live.move_to_end(id(self))
+                return self._data_url
+            if self._missing:
+                return None
+
+        # 인코딩은 락 밖에서 (동시 스캔끼리 서로 기다리지 않도록)
+        data_url = self._encode()
+        with _lock:
+            self.encodes += 1
+            _stats["encodes"] += 1
+            if data_url is None:
+                self._missing = True
+                return None
+            if self._data_url is None:
+                self._data_url = data_url
+                self._register()
+            return self._data_url
+
+    def _encode(self) -> Optional[str]:
+        start = time.perf_counter()
+        if self.preprocess:
+            try:
+                data, mime, info = preprocess_image(self.image_path)
+                data_url = f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+                self.info = {**info, "mime": mime, "seconds": round(time.perf_counter() - start, 4)}
+                return data_url
+            except FileNotFoundError:
+                print(f"[ERROR] 이미지 파일을 찾을 수 없습니다: {self.image_path}")
+                return None
+            except Exception as e:
+                # Pillow가 못 여는 포맷 등은 원본 그대로 보낸다
+                print(f"[WARN] 이미지 전처리 실패, 원본 사용: {e}")
+        data_url = encode_data_url(self.image_path)
+        if data_url is not None:
+            size = os.path.getsize(self.image_path)
+            self.info = {"source_bytes": size, "bytes": size, "mime": data_url[5:data_url.index(";")],
+                         "passthrough": True, "seconds": round(time.perf_counter() - start, 4)}
+        return data_url
+
+    def _register(self):
+        global _live_bytes
+        _live[id(self)] = self
+        _live_bytes += len(self._data_url)
+        budget = IMAGE_CACHE_MB * 1024 ** 2
+        # 자기 자신은 남겨 둔다 (예산보다 큰 이미지 한 장도 이번 스캔에서는 재사용)
+        while _live_bytes > budget and len(_live) > 1:
+            _, victim = _live.popitem(last=False)
+            _live_bytes -= len(victim._data_url)
+            victim._data_url = None
+            _stats["evictions"] += 1
+
+    def release(self):
+        """스캔이 끝나면 호출해 인코딩 결과를 바로 해제"""
+        global _live_bytes
+        with _lock:
+            if _live.pop(id(self), None) is not None:
+                _live_bytes -= len(self._data_url)
+            self._data_url = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+def stats() -> dict:
+    """누적 인코딩/축출 횟수와 현재 보관 중인 인코딩 크기"""
+    with _lock:
+        return {**_stats, "live_handles": len(_live), "live_bytes": _live_bytes}
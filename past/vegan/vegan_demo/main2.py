@@ -4,17 +4,19 @@
 import sys
 import io
 import os
-import base64
 import json
 from typing import TypedDict, Any
 from openai import OpenAI
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, END
 
+from image_handle import ImageHandle
+
 
 # --- 상태 정의 ---
 class AgentState(TypedDict):
     image_path: str   # 이미지 파일 경로
+    image: ImageHandle  # 스캔 동안 노드들이 공유하는 인코딩 이미지 (한 번만 읽고 인코딩)
     image_type: str  # 'food' or 'ingredients'
     extracted_ingredients: str # 원재료명 리스트
     food_name: str # 음식 이름
@@ -24,28 +26,18 @@ class AgentState(TypedDict):
     client: OpenAI
 
 
-# --- 도우미 함수 ---
-def encode_image(image_path: str):
-    """이미지 파일을 Base64로 인코딩합니다."""
-    try:
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
-    except FileNotFoundError:
-        return None
-
-
 # --- 노드 ---
 
 # 들어온 이미지가 음식 사진인지 성분표인지 판단
 def detect_image_type(state: AgentState) -> AgentState:
-    base64_image = encode_image(state['image_path'])
+    image_url = state['image'].data_url
 
     response = state['client'].chat.completions.create(
         model="gpt-4o",
         messages=[
             {"role": "system", "content": "이미지를 음식 사진인지, 원재료명 리스트가 적힌 글자 사진인지 분류해라. "
                                            "음식 사진이면 'food', 원재료명 리스트이면 'ingredients'로 대답해라."},
-            {"role": "user", "content": [{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}]},
+            {"role": "user", "content": [{"type": "image_url", "image_url": {"url": image_url}}]},
         ],
         max_tokens=5,
     )
@@ -57,14 +49,14 @@ def detect_image_type(state: AgentState) -> AgentState:
 
 # 성분표 이미지 -> 원재료명 추출
 def extract_ingredients(state: AgentState) -> AgentState:
-    base64_image = encode_image(state['image_path'])
+    image_url = state['image'].data_url
 
     response = state['client'].chat.completions.create(
         model="gpt-4o",
         messages=[
             {"role": "user", "content": [
                 {"type": "text", "text": "이미지에서 원재료명에 해당하는 텍스트만 모두 추출해서, 쉼표(,)로 구분된 하나의 문자열로 만들어라."},
-                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}},
+                {"type": "image_url", "image_url": {"url": image_url}},
             ]}
         ],
         max_tokens=1000,
@@ -77,14 +69,14 @@ def extract_ingredients(state: AgentState) -> AgentState:
 
 # 음식 이미지 -> 이름&예상 재료 분석
 def recognize_food(state: AgentState) -> AgentState:
-    base64_image = encode_image(state['image_path'])
+    image_url = state['image'].data_url
 
     response = state['client'].chat.completions.create(
         model="gpt-4o",
         response_format={"type": "json_object"},
         messages=[
             {"role": "system", "content": "음식 이름과 추정 재료를 JSON으로 반환해라. 형식: {\"food_name\": \"...\", \"estimated_ingredients\": \"...\"}"},
-            {"role": "user", "content": [{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}]}
+            {"role": "user", "content": [{"type": "image_url", "image_url": {"url": image_url}}]}
         ]
     )
     food_info = json.loads(response.choices[0].message.content)
@@ -279,8 +271,11 @@ class VeganAnalyzerWithLangGraph:
 
         print(f"\n[VeganAnalyzerWithLangGraph] 이미지 스캔 시작: {image_path}")
 
+        # 이미지는 첫 노드에서 한 번만 인코딩되고, 스캔이 끝나면 해제된다
+        image = ImageHandle(image_path)
         initial_state = AgentState(
             image_path=image_path,
+            image=image,
             image_type="",
             extracted_ingredients="",
             food_name="",
@@ -291,7 +286,8 @@ class VeganAnalyzerWithLangGraph:
         )
 
         # 그래프 실행
-        final_state = self.graph.invoke(initial_state)
+        with image:
+            final_state = self.graph.invoke(initial_state)
         return final_state['final_result']
 
 
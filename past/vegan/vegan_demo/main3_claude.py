@@ -9,60 +9,213 @@ fashion/demo.py 스타일로 구현
 import sys
 import io
 import os
-import base64
+import re
 import json
-from typing import TypedDict, List, Dict, Any, Optional, Literal
+import time
+import random
+import asyncio
+from typing import TypedDict, List, Dict, Any, Optional, Literal, Iterable, AsyncIterator, Tuple
 
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, APIStatusError, APIConnectionError, RateLimitError
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, START, END
 
+from image_handle import ImageHandle
+from scan_cache import ScanCache, ScanKey, ScanMatch, config_fingerprint, normalize_ingredients
+
 
 # ===== 전역 변수 =====
 _client: OpenAI = None
 _graph = None
+_fused = False
+_aclient: AsyncOpenAI = None   # analyze_images용 비동기 클라이언트
+_agraph = None                 # 비동기 노드로 컴파일한 그래프 (analyze_images 첫 호출 시 생성)
+_scan_cache: ScanCache = None  # 지각 해시 결과 캐시 (VEGAN_SCAN_CACHE=0이면 None)
+
+# 비동기 호출 공통 대기 시각 (time.monotonic 기준). 429나 남은 한도 0을 받으면 모든 호출이 이때까지 쉰다
+_rate_limit_until = 0.0
+_batch_stats = {"calls": 0, "retries": 0, "rate_limited": 0, "waited_seconds": 0.0}
+
+
+# ===== 비동기 배치 설정 =====
+# analyze_images 기본 동시 스캔 수
+BATCH_CONCURRENCY = int(os.getenv("VEGAN_CONCURRENCY", "8"))
+# 429 / 5xx / 연결 오류 재시도 횟수와 지수 백오프 (rate limit 헤더가 있으면 헤더 우선)
+MAX_RETRIES = int(os.getenv("VEGAN_MAX_RETRIES", "5"))
+BACKOFF_BASE_S = 0.5
+BACKOFF_MAX_S = 30.0
+
+# ===== 결과 캐시 설정 =====
+# 같은 제품을 다시 찍은 사진은 모델 호출 없이 저장된 결과로 응답 (scan_cache.py)
+SCAN_CACHE = os.getenv("VEGAN_SCAN_CACHE", "1") == "1"
 
 
 # ===== GraphState 정의 =====
 class GraphState(TypedDict):
     """LangGraph 상태 관리"""
     image_path: str           # 이미지 파일 경로
+    image: ImageHandle        # 스캔 동안 노드들이 공유하는 인코딩 이미지 (한 번만 읽고 인코딩)
     image_type: str           # 'food' or 'ingredients' or 'error'
     extracted_ingredients: str # 원재료명 리스트
     food_name: str            # 음식 이름
     estimated_ingredients: str # 예상 재료 리스트
     analysis_result: Optional[Dict[str, Any]]  # 비건 분석 결과
     final_result: str         # 최종 답변
+    fused_ok: bool            # fused 모드에서 단일 호출 결과가 검증을 통과했는지
+
+
+# ===== Prompts =====
+# 분류 기준/규칙. 단계 판정 호출과 fused 호출이 함께 쓴다
+VEGAN_CRITERIA = """
+당신은 음식 성분을 분석하여 비건 및 베지테리언 7단계에 따라 분류하는 전문가입니다.
+주어진 원재료명 리스트를 분석하여, 어떤 단계까지 허용되는 제품인지 판단합니다.
+가장 엄격한 단계부터 검사하여 해당하는 가장 낮은 숫자(가장 엄격한)의 단계를 찾아냅니다.
+
+[분류 기준]
+1. 비건 (Vegan): 완전 채식.
+2. 락토 베지테리언 (Lacto Vegetarian): 유제품 O, 달걀 X
+3. 오보 베지테리언 (Ovo Vegetarian): 달걀 O, 유제품 X
+4. 락토-오보 베지테리언 (Lacto-Ovo Vegetarian): 유제품 O, 달걀 O
+5. 페스코 베지테리언 (Pesco / Pescatarian): 생선/해산물 O
+6. 폴로 베지테리언 (Pollo Vegetarian): 닭고기 O
+7. 플렉시테리언 (Flexitarian): 주로 채식, 때때로 육류 섭취. (이 단계는 식습관이므로 제품 분류에는 사용하지 않습니다.)
+
+[분석 규칙]
+- 붉은 고기(소, 돼지), 젤라틴, 카민 등 명백한 동물성 재료가 있으면 '채식주의자에게 적합하지 않음'으로 분류합니다.
+- 그 외에는 1~6단계 중 해당하는 가장 엄격한 단계를 판정합니다.
+"""
+
+# 단계 판정 단독 호출의 응답 형식 (fused 호출은 아래 [최종 응답 형식]을 쓴다)
+VEGAN_RESPONSE_FORMAT = """
+[응답 형식]
+응답은 반드시 JSON 형식이어야 하며, 다음 3개의 키를 포함해야 합니다.
+1. "classification_name": 단계의 이름 (e.g., "1단계: 비건 (Vegan)", "채식주의자에게 적합하지 않음").
+2. "reason": 왜 그렇게 분류되었는지, 판단의 근거가 된 주요 성분을 명시하여 상세히 설명하는 문자열.
+3. "contains_ingredients": 판단의 근거가 된 성분 리스트 (e.g., ["탈지분유", "유당"])
+"""
+
+VEGAN_CLASSIFICATION_PROMPT = VEGAN_CRITERIA.rstrip("\n") + "\n" + VEGAN_RESPONSE_FORMAT
+
+FUSED_SYSTEM_PROMPT = """
+당신은 이미지 한 장으로 비건 단계를 판정하는 분석가입니다. 아래 순서를 한 번에 수행합니다.
+
+1. 이미지 타입 판별: 조리된 음식 사진이면 "food", 제품의 원재료명 텍스트 사진이면 "ingredients".
+2. "ingredients"이면 원재료명에 해당하는 텍스트만 모두 추출해 쉼표(,)로 구분한 하나의 문자열로 만듭니다.
+   "food"이면 음식 이름과 예상되는 주요 재료(쉼표로 구분한 문자열)를 추정합니다.
+3. 2에서 얻은 재료 리스트로 아래 기준에 따라 비건 단계를 판정합니다.
+""" + VEGAN_CRITERIA + """
+[최종 응답 형식]
+응답은 반드시 다음 7개의 키를 모두 포함한 하나의 JSON 객체여야 합니다.
+- "image_type": "food" 또는 "ingredients"
+- "extracted_ingredients": 추출한 원재료명 문자열 (food이면 "")
+- "food_name": 음식 이름 (ingredients이면 "")
+- "estimated_ingredients": 예상 재료 문자열 (ingredients이면 "")
+- "classification_name": 단계의 이름 (e.g., "1단계: 비건 (Vegan)", "채식주의자에게 적합하지 않음")
+- "reason": 왜 그렇게 분류되었는지, 판단의 근거가 된 주요 성분을 명시하여 상세히 설명하는 문자열
+- "contains_ingredients": 판단의 근거가 된 성분 리스트 (e.g., ["탈지분유", "유당"])
+"""
+
+# fused 결과 검증용: "N단계: ..." 또는 "채식주의자에게 적합하지 않음"
+CLASSIFICATION_PATTERN = re.compile(r"^[1-7]단계: |^채식주의자에게 적합하지 않음")
 
 
 # ===== Helper Functions =====
-def encode_image(image_path: str) -> Optional[str]:
-    """이미지 파일을 Base64로 인코딩합니다."""
-    try:
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
-    except FileNotFoundError:
-        print(f"[ERROR] 이미지 파일을 찾을 수 없습니다: {image_path}")
+def validate_fused_result(data: Any) -> Optional[dict]:
+    """fused 응답 검증. 통과하면 GraphState 업데이트 dict, 아니면 None
+
+    다중 노드 경로가 만드는 것과 같은 필드를 모두 채울 수 있어야 통과한다.
+    """
+    if not isinstance(data, dict):
+        return None
+    image_type = data.get("image_type")
+    fields = {k: data.get(k, "") for k in ("extracted_ingredients", "food_name", "estimated_ingredients")}
+    if not all(isinstance(v, str) for v in fields.values()):
+        return None
+    if image_type == "ingredients":
+        if not fields["extracted_ingredients"].strip():
+            return None
+    elif image_type == "food":
+        if not fields["food_name"].strip() or not fields["estimated_ingredients"].strip():
+            return None
+    else:
+        return None
+
+    name = data.get("classification_name")
+    reason = data.get("reason")
+    contains = data.get("contains_ingredients", [])
+    if not isinstance(name, str) or not CLASSIFICATION_PATTERN.match(name.strip()):
+        return None
+    if not isinstance(reason, str) or not reason.strip():
+        return None
+    if not isinstance(contains, list) or not all(isinstance(c, str) for c in contains):
         return None
 
+    return {
+        "image_type": image_type,
+        **fields,
+        "analysis_result": {
+            "classification_name": name.strip(),
+            "reason": reason,
+            "contains_ingredients": contains,
+        },
+        "fused_ok": True,
+    }
+
 
 # ===== Node Functions =====
+# API를 부르는 노드는 요청 kwargs를 yield하고 응답을 돌려받는 제너레이터다.
+# 실제 호출은 _sync_node(_client) / _async_node(_aclient)가 해서 동기/비동기 그래프가 같은 노드 코드를 쓴다.
+def fused_analyze_node(state: GraphState) -> dict:
+    """노드 0 (fused 모드): 한 번의 vision 호출로 타입 판별 + 재료 추출/추정 + 비건 단계 판정"""
+    print("\n" + "=" * 60)
+    print("[NODE: fused_analyze] 단일 호출 분석")
+    print("=" * 60)
+
+    image_url = state["image"].data_url
+    if not image_url:
+        return {"image_type": "error", "fused_ok": False}
+
+    try:
+        response = yield dict(
+            model="gpt-4o",
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": FUSED_SYSTEM_PROMPT},
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "image_url", "image_url": {"url": image_url}}
+                    ]
+                },
+            ],
+            max_tokens=1500,
+        )
+        update = validate_fused_result(json.loads(response.choices[0].message.content))
+    except Exception as e:
+        print(f"[fused_analyze] Error: {e}")
+        update = None
+
+    if update is None:
+        print("[fused_analyze] 검증 실패 → 다중 노드 경로로 폴백")
+        return {"fused_ok": False}
+
+    print(f"[fused_analyze] 타입: {update['image_type']}, 판정: {update['analysis_result']['classification_name']}")
+    return update
+
+
 def detect_image_type_node(state: GraphState) -> dict:
     """노드 1: 이미지 타입 판별 (음식 vs 원재료명)"""
     print("\n" + "=" * 60)
     print("[NODE: detect_image_type] 이미지 타입 판별")
     print("=" * 60)
 
-    global _client
-    image_path = state["image_path"]
-
-    base64_image = encode_image(image_path)
-    if not base64_image:
+    image_url = state["image"].data_url
+    if not image_url:
         print("[detect_image_type] 이미지 인코딩 실패")
         return {"image_type": "error"}
 
     try:
-        response = _client.chat.completions.create(
+        response = yield dict(
             model="gpt-4o",
             messages=[
                 {
@@ -72,7 +225,7 @@ def detect_image_type_node(state: GraphState) -> dict:
                 {
                     "role": "user",
                     "content": [
-                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
+                        {"type": "image_url", "image_url": {"url": image_url}}
                     ]
                 },
             ],
@@ -93,15 +246,12 @@ def extract_ingredients_node(state: GraphState) -> dict:
     print("[NODE: extract_ingredients] 원재료명 추출")
     print("=" * 60)
 
-    global _client
-    image_path = state["image_path"]
-
-    base64_image = encode_image(image_path)
-    if not base64_image:
+    image_url = state["image"].data_url
+    if not image_url:
         return {"extracted_ingredients": ""}
 
     try:
-        response = _client.chat.completions.create(
+        response = yield dict(
             model="gpt-4o",
             messages=[
                 {
@@ -113,7 +263,7 @@ def extract_ingredients_node(state: GraphState) -> dict:
                         },
                         {
                             "type": "image_url",
-                            "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}
+                            "image_url": {"url": image_url}
                         },
                     ]
                 }
@@ -135,15 +285,12 @@ def recognize_food_node(state: GraphState) -> dict:
     print("[NODE: recognize_food] 음식 인식 및 재료 추정")
     print("=" * 60)
 
-    global _client
-    image_path = state["image_path"]
-
-    base64_image = encode_image(image_path)
-    if not base64_image:
+    image_url = state["image"].data_url
+    if not image_url:
         return {"food_name": "알 수 없음", "estimated_ingredients": ""}
 
     try:
-        response = _client.chat.completions.create(
+        response = yield dict(
             model="gpt-4o",
             response_format={"type": "json_object"},
             messages=[
@@ -154,7 +301,7 @@ def recognize_food_node(state: GraphState) -> dict:
                 {
                     "role": "user",
                     "content": [
-                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
+                        {"type": "image_url", "image_url": {"url": image_url}}
                     ]
                 }
             ]
@@ -182,7 +329,6 @@ def analyze_vegan_level_node(state: GraphState) -> dict:
     print("[NODE: analyze_vegan_level] 비건 단계 분석")
     print("=" * 60)
 
-    global _client
     image_type = state["image_type"]
 
     # 분석할 재료 결정
@@ -195,37 +341,12 @@ def analyze_vegan_level_node(state: GraphState) -> dict:
         print("[analyze_vegan_level] 분석할 재료 없음")
         return {"analysis_result": None}
 
-    system_prompt = """
-당신은 음식 성분을 분석하여 비건 및 베지테리언 7단계에 따라 분류하는 전문가입니다.
-주어진 원재료명 리스트를 분석하여, 어떤 단계까지 허용되는 제품인지 판단합니다.
-가장 엄격한 단계부터 검사하여 해당하는 가장 낮은 숫자(가장 엄격한)의 단계를 찾아냅니다.
-
-[분류 기준]
-1. 비건 (Vegan): 완전 채식.
-2. 락토 베지테리언 (Lacto Vegetarian): 유제품 O, 달걀 X
-3. 오보 베지테리언 (Ovo Vegetarian): 달걀 O, 유제품 X
-4. 락토-오보 베지테리언 (Lacto-Ovo Vegetarian): 유제품 O, 달걀 O
-5. 페스코 베지테리언 (Pesco / Pescatarian): 생선/해산물 O
-6. 폴로 베지테리언 (Pollo Vegetarian): 닭고기 O
-7. 플렉시테리언 (Flexitarian): 주로 채식, 때때로 육류 섭취. (이 단계는 식습관이므로 제품 분류에는 사용하지 않습니다.)
-
-[분석 규칙]
-- 붉은 고기(소, 돼지), 젤라틴, 카민 등 명백한 동물성 재료가 있으면 '채식주의자에게 적합하지 않음'으로 분류합니다.
-- 그 외에는 1~6단계 중 해당하는 가장 엄격한 단계를 판정합니다.
-
-[응답 형식]
-응답은 반드시 JSON 형식이어야 하며, 다음 3개의 키를 포함해야 합니다.
-1. "classification_name": 단계의 이름 (e.g., "1단계: 비건 (Vegan)", "채식주의자에게 적합하지 않음").
-2. "reason": 왜 그렇게 분류되었는지, 판단의 근거가 된 주요 성분을 명시하여 상세히 설명하는 문자열.
-3. "contains_ingredients": 판단의 근거가 된 성분 리스트 (e.g., ["탈지분유", "유당"])
-"""
-
     try:
-        response = _client.chat.completions.create(
+        response = yield dict(
             model="gpt-4o",
             response_format={"type": "json_object"},
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": VEGAN_CLASSIFICATION_PROMPT},
                 {"role": "user", "content": f"다음은 제품의 원재료명 리스트입니다. 분석해주세요: {ingredients_to_analyze}"}
             ]
         )
@@ -299,6 +420,19 @@ def format_result_node(state: GraphState) -> dict:
 
 
 # ===== Conditional Edge Functions =====
+def route_after_fused(state: GraphState) -> Literal["format_result", "detect_image_type"]:
+    """fused 결과가 검증을 통과했으면 바로 포맷팅, 아니면 기존 경로 처음부터"""
+    if state.get("fused_ok"):
+        print("\n[ROUTING] fused_ok → format_result")
+        return "format_result"
+    if state.get("image_type") == "error":
+        # 이미지 인코딩 실패는 기존 경로로 가도 같은 결과
+        print("\n[ROUTING] image error → format_result")
+        return "format_result"
+    print("\n[ROUTING] fused 실패 → detect_image_type")
+    return "detect_image_type"
+
+
 def route_by_image_type(state: GraphState) -> Literal["extract_ingredients", "recognize_food", "format_result"]:
     """이미지 타입에 따라 다음 노드 결정"""
     image_type = state.get("image_type", "")
@@ -316,26 +450,170 @@ def route_by_image_type(state: GraphState) -> Literal["extract_ingredients", "re
         return "format_result"
 
 
+# ===== Node Runners =====
+def _sync_node(node):
+    """제너레이터 노드 → 동기 LangGraph 노드 (요청을 _client로 보낸다)"""
+    def run(state: GraphState) -> dict:
+        steps = node(state)
+        try:
+            request = next(steps)
+            while True:
+                try:
+                    response = _client.chat.completions.create(**request)
+                except Exception as e:
+                    # 노드의 except 블록이 기존과 똑같이 처리하도록 노드 안으로 던진다
+                    request = steps.throw(e)
+                else:
+                    request = steps.send(response)
+        except StopIteration as stop:
+            return stop.value
+    return run
+
+
+def _async_node(node):
+    """제너레이터 노드 → 비동기 LangGraph 노드 (요청을 _acreate로 보낸다)"""
+    async def run(state: GraphState) -> dict:
+        steps = node(state)
+        try:
+            request = next(steps)
+            while True:
+                try:
+                    response = await _acreate(request)
+                except Exception as e:
+                    request = steps.throw(e)
+                else:
+                    request = steps.send(response)
+        except StopIteration as stop:
+            return stop.value
+    return run
+
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """rate limit 헤더 값 → 초 ("20ms", "1s", "6m0s", "0.5" 모두 허용)"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * DURATION_SECONDS[unit] for n, unit in parts)
+
+
+def _reset_delay(headers) -> Optional[float]:
+    """남은 요청/토큰 한도가 0인 쪽의 x-ratelimit-reset-* 중 가장 긴 대기 시간 (없으면 None)"""
+    delays = []
+    for kind in ("requests", "tokens"):
+        if headers.get(f"x-ratelimit-remaining-{kind}") == "0":
+            delay = _parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if delay is not None:
+                delays.append(delay)
+    return max(delays) if delays else None
+
+
+def _retry_delay(headers, attempt: int) -> float:
+    """재시도 전 대기: retry-after-ms > retry-after > x-ratelimit-reset-* > 지수 백오프(지터)"""
+    if headers is not None:
+        ms = _parse_duration(headers.get("retry-after-ms"))
+        if ms is not None:
+            return ms / 1000
+        seconds = _parse_duration(headers.get("retry-after"))
+        if seconds is not None:
+            return seconds
+        delay = _reset_delay(headers)
+        if delay is not None:
+            return delay
+    return min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def _hold_until(delay: float):
+    """모든 비동기 호출을 delay초 뒤까지 멈춘다 (동시 스캔들이 한꺼번에 다시 429를 맞지 않도록)"""
+    global _rate_limit_until
+    _rate_limit_until = max(_rate_limit_until, time.monotonic() + delay)
+
+
+async def _acreate(request: dict):
+    """_aclient 호출 + rate limit 헤더 기반 대기/재시도"""
+    for attempt in range(MAX_RETRIES + 1):
+        wait = _rate_limit_until - time.monotonic()
+        if wait > 0:
+            _batch_stats["waited_seconds"] += wait
+            await asyncio.sleep(wait)
+
+        _batch_stats["calls"] += 1
+        try:
+            raw = await _aclient.chat.completions.with_raw_response.create(**request)
+        except RateLimitError as e:
+            _batch_stats["rate_limited"] += 1
+            error, delay = e, _retry_delay(e.response.headers, attempt)
+            _hold_until(delay)
+            delay = 0.0  # 위 공통 대기로 쉰다
+        except APIStatusError as e:
+            # 요청 자체가 잘못된 4xx는 재시도해도 같다
+            if e.status_code < 500 and e.status_code not in (408, 409):
+                raise
+            error, delay = e, _retry_delay(e.response.headers, attempt)
+        except APIConnectionError as e:
+            error, delay = e, _retry_delay(None, attempt)
+        else:
+            # 한도를 다 쓴 응답이면 리셋까지 다음 호출들을 미리 멈춘다
+            delay = _reset_delay(raw.headers)
+            if delay:
+                _hold_until(delay)
+            return raw.parse()
+
+        if attempt == MAX_RETRIES:
+            raise error
+        _batch_stats["retries"] += 1
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
 # ===== Graph Builder =====
-def build_vegan_analyzer_graph():
-    """LangGraph 비건 분석기 구축"""
+def build_vegan_analyzer_graph(fused: bool = False, use_async: bool = False):
+    """LangGraph 비건 분석기 구축
+
+    fused=True면 fused_analyze 노드를 먼저 실행하고, 검증 실패 시에만 기존 다중 노드 경로를 탄다.
+    use_async=True면 _aclient로 호출하는 비동기 노드로 컴파일한다 (ainvoke 전용).
+    """
     print("\n" + "=" * 60)
     print("[GRAPH BUILD] LangGraph 비건 분석기 구축")
     print("=" * 60)
 
     graph = StateGraph(GraphState)
 
+    node = _async_node if use_async else _sync_node
+
     # 노드 추가
-    graph.add_node("detect_image_type", detect_image_type_node)
-    graph.add_node("extract_ingredients", extract_ingredients_node)
-    graph.add_node("recognize_food", recognize_food_node)
-    graph.add_node("analyze_vegan_level", analyze_vegan_level_node)
+    graph.add_node("detect_image_type", node(detect_image_type_node))
+    graph.add_node("extract_ingredients", node(extract_ingredients_node))
+    graph.add_node("recognize_food", node(recognize_food_node))
+    graph.add_node("analyze_vegan_level", node(analyze_vegan_level_node))
     graph.add_node("format_result", format_result_node)
 
-    print("[GRAPH] 5개 노드 추가 완료")
+    if fused:
+        graph.add_node("fused_analyze", node(fused_analyze_node))
+    print(f"[GRAPH] {6 if fused else 5}개 노드 추가 완료")
 
     # 엣지 추가
-    graph.add_edge(START, "detect_image_type")
+    if fused:
+        graph.add_edge(START, "fused_analyze")
+        graph.add_conditional_edges(
+            "fused_analyze",
+            route_after_fused,
+            {
+                "format_result": "format_result",
+                "detect_image_type": "detect_image_type",
+            }
+        )
+    else:
+        graph.add_edge(START, "detect_image_type")
 
     # 조건부 엣지: 이미지 타입에 따라 분기
     graph.add_conditional_edges(
@@ -362,9 +640,12 @@ def build_vegan_analyzer_graph():
 
 
 # ===== External API Functions =====
-def initialize_vegan_system() -> dict:
-    """비건 분석 시스템 초기화"""
-    global _client, _graph
+def initialize_vegan_system(fused: Optional[bool] = None) -> dict:
+    """비건 분석 시스템 초기화
+
+    fused가 None이면 환경변수 VEGAN_FUSED=1일 때 fused 모드 (단일 vision 호출 + 검증 실패 시 폴백)
+    """
+    global _client, _graph, _fused, _aclient, _agraph, _scan_cache
 
     try:
         print("\n[INIT] 비건 분석 시스템 초기화 중...")
@@ -383,10 +664,22 @@ def initialize_vegan_system() -> dict:
             raise ValueError("OPENAI_API_KEY가 설정되지 않았습니다.")
 
         _client = OpenAI(api_key=api_key)
+        # 재시도/백오프는 _acreate가 rate limit 헤더를 보고 직접 한다
+        _aclient = AsyncOpenAI(api_key=api_key, max_retries=0)
+        _agraph = None
         print("[INIT] OpenAI 클라이언트 생성 완료")
 
+        if SCAN_CACHE and _scan_cache is None:
+            try:
+                # 판정 프롬프트가 바뀌면 이전 결과와 섞이지 않도록 fingerprint에 포함
+                _scan_cache = ScanCache(config_fingerprint("gpt-4o", VEGAN_CLASSIFICATION_PROMPT))
+                print(f"[INIT] 결과 캐시: {_scan_cache.path} ({_scan_cache.stats()['entries']}개 항목)")
+            except Exception as e:
+                print(f"[WARN] 결과 캐시를 열 수 없어 캐시 없이 실행합니다: {e}")
+
         # LangGraph 컴파일
-        _graph = build_vegan_analyzer_graph()
+        _fused = os.getenv("VEGAN_FUSED", "0") == "1" if fused is None else fused
+        _graph = build_vegan_analyzer_graph(fused=_fused)
 
         print("[SUCCESS] 초기화 완료!\n")
         return {"status": "success", "message": "Initialized successfully"}
@@ -396,6 +689,72 @@ def initialize_vegan_system() -> dict:
         return {"status": "error", "message": str(e)}
 
 
+def _initial_state(image_path: str, image: ImageHandle) -> dict:
+    """그래프 초기 상태"""
+    return {
+        "image_path": image_path,
+        "image": image,
+        "image_type": "",
+        "extracted_ingredients": "",
+        "food_name": "",
+        "estimated_ingredients": "",
+        "analysis_result": None,
+        "final_result": "",
+        "fused_ok": False,
+    }
+
+
+def _build_response(image_path: str, result: dict) -> dict:
+    """그래프 최종 상태 → analyze_image 응답"""
+    return {
+        "success": True,
+        "image_path": image_path,
+        "image_type": result.get("image_type", ""),
+        "result": result.get("final_result", ""),
+        "analysis": result.get("analysis_result"),
+        "metadata": {
+            "food_name": result.get("food_name", ""),
+            "extracted_ingredients": result.get("extracted_ingredients", ""),
+            "estimated_ingredients": result.get("estimated_ingredients", ""),
+            "fused": result.get("fused_ok", False),
+        }
+    }
+
+
+def _cache_lookup(key: Optional[ScanKey]) -> Tuple[Optional[dict], Optional[ScanMatch]]:
+    """(바로 쓸 캐시 응답, 원재료명 재추출로 확인할 후보). 캐시가 꺼져 있거나 미스면 (None, None)"""
+    if key is None:
+        return None, None
+    match = _scan_cache.match(key)
+    if match is None:
+        return None, None
+    if match.verified:
+        print(f"[scan_cache] hit (거리 {match.distance}) → 모델 호출 없이 저장된 결과 사용")
+        return _scan_cache.hit(match), None
+    print(f"[scan_cache] 원재료명 후보 (거리 {match.distance}) → 원재료명만 다시 추출해 확인")
+    return None, match
+
+
+def _cache_verify(match: ScanMatch, update: dict) -> Optional[dict]:
+    """다시 추출한 원재료명이 저장된 것과 같으면 hit (호출 1회로 나머지 호출을 아낀다)"""
+    extracted = update.get("extracted_ingredients", "")
+    stored = match.response["metadata"]["extracted_ingredients"]
+    if extracted and normalize_ingredients(extracted) == normalize_ingredients(stored):
+        print("[scan_cache] 원재료명 일치 → 저장된 결과 사용")
+        return _scan_cache.hit(match, spent_calls=1)
+    print("[scan_cache] 원재료명 불일치 → 전체 분석")
+    _scan_cache.verify_miss()
+    return None
+
+
+def _cache_store(key: Optional[ScanKey], response: dict):
+    """판정까지 성공한 스캔만 저장 (원래 쓴 호출 수: fused 통과 1, 다중 노드 3, fused 폴백 4)"""
+    if key is None or not response.get("analysis") or response["image_type"] not in ("food", "ingredients"):
+        return
+    calls = 1 if response["metadata"]["fused"] else (4 if _fused else 3)
+    _scan_cache.put(key, response, calls)
+
+
 def analyze_image(image_path: str, verbose: bool = True) -> dict:
     """이미지 분석 실행"""
     global _client, _graph
@@ -407,35 +766,30 @@ def analyze_image(image_path: str, verbose: bool = True) -> dict:
         if verbose:
             print(f"\n[ANALYZE] 이미지 분석 시작: {image_path}")
 
-        # 초기 상태
-        initial_state = {
-            "image_path": image_path,
-            "image_type": "",
-            "extracted_ingredients": "",
-            "food_name": "",
-            "estimated_ingredients": "",
-            "analysis_result": None,
-            "final_result": "",
-        }
+        # 결과 캐시: 같은 제품의 이전 스캔이면 모델 호출 없이 반환
+        key = _scan_cache.key(image_path) if _scan_cache is not None else None
+        cached, pending = _cache_lookup(key)
+        if cached is not None:
+            return {**cached, "image_path": image_path}
+
+        # 이미지는 첫 노드에서 한 번만 인코딩되고, 스캔이 끝나면 해제된다
+        image = ImageHandle(image_path)
 
         # 그래프 실행
-        result = _graph.invoke(initial_state)
+        with image:
+            if pending is not None:
+                update = _sync_node(extract_ingredients_node)(_initial_state(image_path, image))
+                cached = _cache_verify(pending, update)
+                if cached is not None:
+                    return {**cached, "image_path": image_path}
+            result = _graph.invoke(_initial_state(image_path, image))
 
         if verbose:
             print("\n[ANALYZE] 분석 완료")
 
-        return {
-            "success": True,
-            "image_path": image_path,
-            "image_type": result.get("image_type", ""),
-            "result": result.get("final_result", ""),
-            "analysis": result.get("analysis_result"),
-            "metadata": {
-                "food_name": result.get("food_name", ""),
-                "extracted_ingredients": result.get("extracted_ingredients", ""),
-                "estimated_ingredients": result.get("estimated_ingredients", ""),
-            }
-        }
+        response = _build_response(image_path, result)
+        _cache_store(key, response)
+        return response
 
     except Exception as e:
         print(f"[ERROR] 분석 오류: {e}")
@@ -444,11 +798,111 @@ def analyze_image(image_path: str, verbose: bool = True) -> dict:
         return {"success": False, "error": str(e)}
 
 
+async def analyze_image_async(image_path: str, verbose: bool = True) -> dict:
+    """analyze_image의 비동기 버전 (비동기 그래프 + _aclient)"""
+    if _agraph is None:
+        return {"success": False, "image_path": image_path, "error": "시스템이 초기화되지 않았습니다."}
+
+    try:
+        if verbose:
+            print(f"\n[ANALYZE] 이미지 분석 시작: {image_path}")
+
+        # 해시/전처리/인코딩은 CPU 작업이라 이벤트 루프를 막지 않도록 스레드에서 한다
+        key = await asyncio.to_thread(_scan_cache.key, image_path) if _scan_cache is not None else None
+        cached, pending = _cache_lookup(key)
+        if cached is not None:
+            return {**cached, "image_path": image_path}
+
+        image = ImageHandle(image_path)
+        with image:
+            await asyncio.to_thread(lambda: image.data_url)
+            if pending is not None:
+                update = await _async_node(extract_ingredients_node)(_initial_state(image_path, image))
+                cached = _cache_verify(pending, update)
+                if cached is not None:
+                    return {**cached, "image_path": image_path}
+            result = await _agraph.ainvoke(_initial_state(image_path, image))
+
+        if verbose:
+            print("\n[ANALYZE] 분석 완료")
+
+        response = _build_response(image_path, result)
+        _cache_store(key, response)
+        return response
+
+    except Exception as e:
+        print(f"[ERROR] 분석 오류 ({image_path}): {e}")
+        return {"success": False, "image_path": image_path, "error": str(e)}
+
+
+async def analyze_images(paths: Iterable[str], concurrency: int = BATCH_CONCURRENCY,
+                         verbose: bool = False) -> AsyncIterator[dict]:
+    """여러 이미지를 최대 concurrency개씩 동시에 분석하고, 끝나는 순서대로 결과를 내보낸다
+
+    worker concurrency개가 paths에서 하나씩 꺼내 분석하므로 paths는 제너레이터 같은 지연 iterable이어도 되고
+    (디렉토리 순회, 큐 소비 등), 미리 꺼내 두는 경로는 worker 수만큼이다. 결과 대기열도 concurrency개로 제한해
+    소비자가 느리면 worker가 기다린다. 각 결과에는 입력 순서 "index"가 붙는다. 한 이벤트 루프 안에서 쓴다
+    (asyncio.run을 여러 번 부르면 _aclient의 커넥션 풀이 닫힌 루프에 묶인다).
+
+        async for result in analyze_images(paths, concurrency=8):
+            print(result["index"], result["image_path"], result["success"])
+    """
+    global _agraph
+
+    if _agraph is None and _aclient is not None:
+        _agraph = build_vegan_analyzer_graph(fused=_fused, use_async=True)
+
+    source = enumerate(paths)
+    results = asyncio.Queue(maxsize=max(1, concurrency))
+    done = object()
+
+    async def worker():
+        try:
+            # 이벤트 루프는 단일 스레드라 next(source)가 worker 사이에서 겹치지 않는다
+            for index, image_path in source:
+                result = await analyze_image_async(image_path, verbose=verbose)
+                result["index"] = index
+                await results.put(result)
+        except Exception as e:
+            # paths 자체의 오류 (제너레이터 예외 등)는 소비자에게 넘긴다
+            await results.put(e)
+        await results.put(done)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    try:
+        running = len(workers)
+        while running:
+            item = await results.get()
+            if item is done:
+                running -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        # 소비자가 중간에 멈추거나 오류가 나면 남은 스캔 취소
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+def get_batch_stats() -> dict:
+    """비동기 호출 누적 통계 (호출/재시도/429 횟수, rate limit 대기 시간)"""
+    return dict(_batch_stats)
+
+
+def get_scan_cache_stats() -> Optional[dict]:
+    """결과 캐시 hit율/아낀 호출 수 (캐시가 꺼져 있으면 None)"""
+    return _scan_cache.stats() if _scan_cache is not None else None
+
+
 def get_system_status() -> dict:
     """시스템 상태 조회"""
     return {
         "initialized": _graph is not None,
         "client_loaded": _client is not None,
+        "fused_mode": _fused,
+        "scan_cache": _scan_cache is not None,
     }
 
 
@@ -481,11 +935,20 @@ if __name__ == "__main__":
         os.path.join(test_image_dir, "test3.jpg")      # 음식 사진 이미지
     ]
 
-    # 분석 실행
-    final_output = ""
-    for image in images_to_test:
-        result = analyze_image(image, verbose=True)
+    # 분석 실행 (VEGAN_BATCH=1이면 analyze_images로 동시에, 결과는 입력 순서로 정리)
+    if os.getenv("VEGAN_BATCH", "0") == "1":
+        async def scan_all() -> list:
+            results = [None] * len(images_to_test)
+            async for result in analyze_images(images_to_test):
+                results[result["index"]] = result
+            return results
 
+        results = asyncio.run(scan_all())
+    else:
+        results = [analyze_image(image, verbose=True) for image in images_to_test]
+
+    final_output = ""
+    for image, result in zip(images_to_test, results):
         if result["success"]:
             final_output += f"===== {image} 분석 결과 =====\n{result['result']}\n\n"
         else:
@@ -496,6 +959,12 @@ if __name__ == "__main__":
     with open(result_path, "w", encoding="utf-8") as f:
         f.write(final_output)
 
+    cache_stats = get_scan_cache_stats()
+    if cache_stats is not None:
+        print(f"\n[결과 캐시] hit율 {cache_stats['hit_rate'] * 100:.0f}% "
+              f"(hit {cache_stats['hits']}, 원재료명 확인 hit {cache_stats['verified_hits']}, "
+              f"미스 {cache_stats['misses']}), 아낀 호출 {cache_stats['saved_calls']}회")
+
     print(f"\n\n{'=' * 60}")
     print(f"분석이 완료되었습니다. '{result_path}' 파일을 확인하세요.")
     print(f"{'=' * 60}")
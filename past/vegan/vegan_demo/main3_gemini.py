@@ -3,13 +3,14 @@
 import sys
 import io
 import os
-import base64
 import json
 from typing import TypedDict
 from openai import OpenAI
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, END
 
+from image_handle import ImageHandle
+
 # --- 기본 설정 ---
 
 # 터미널 한글 깨짐 방지
@@ -41,6 +42,7 @@ else:
 class VeganCheckState(TypedDict):
     """그래프의 각 노드 간에 전달될 상태를 정의합니다."""
     image_path: str                 # 입력된 이미지 경로
+    image: ImageHandle              # 스캔 동안 노드들이 공유하는 인코딩 이미지 (한 번만 읽고 인코딩)
     image_type: str                 # 판별된 이미지 종류 ('food', 'ingredients', 'error')
     ingredients_text: str | None    # 추출된 원재료명 또는 예상 재료
     food_name: str | None           # 인식된 음식 이름
@@ -48,17 +50,6 @@ class VeganCheckState(TypedDict):
     final_output: str | None        # 최종적으로 사용자에게 보여줄 결과 문자열
     error_message: str | None       # 에러 발생 시 메시지
 
-# --- Helper 함수 ---
-
-def encode_image(image_path: str) -> str | None:
-    """이미지 파일을 Base64로 인코딩합니다."""
-    try:
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
-    except FileNotFoundError:
-        print(f"오류: 이미지 파일을 찾을 수 없습니다 - {image_path}")
-        return None
-
 # --- 그래프의 각 노드(기능) 정의 ---
 
 def detect_image_type(state: VeganCheckState) -> dict:
@@ -66,15 +57,15 @@ def detect_image_type(state: VeganCheckState) -> dict:
     print(f"\n[Node: detect_image_type] 이미지 종류 판별 시작: {state['image_path']}")
     if not client: return {"error_message": "API 키가 유효하지 않습니다."}
     
-    base64_image = encode_image(state['image_path'])
-    if not base64_image: return {"error_message": f"이미지를 읽을 수 없습니다: {state['image_path']}"}
+    image_url = state['image'].data_url
+    if not image_url: return {"error_message": f"이미지를 읽을 수 없습니다: {state['image_path']}"}
         
     try:
         response = client.chat.completions.create(
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "You are an image classifier. Determine if the image primarily shows a prepared food dish, or a text-heavy ingredient list. Your response must be a single word: 'food' or 'ingredients'."},
-                {"role": "user", "content": [{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}]},
+                {"role": "user", "content": [{"type": "image_url", "image_url": {"url": image_url}}]},
             ],
             max_tokens=5,
         )
@@ -90,8 +81,8 @@ def extract_ingredients_from_image(state: VeganCheckState) -> dict:
     print("[Node: extract_ingredients_from_image] 원재료명 추출 시작")
     if not client: return {"error_message": "API 키가 유효하지 않습니다."}
 
-    base64_image = encode_image(state['image_path'])
-    if not base64_image: return {"error_message": f"이미지를 읽을 수 없습니다: {state['image_path']}"}
+    image_url = state['image'].data_url
+    if not image_url: return {"error_message": f"이미지를 읽을 수 없습니다: {state['image_path']}"}
 
     try:
         response = client.chat.completions.create(
@@ -99,7 +90,7 @@ def extract_ingredients_from_image(state: VeganCheckState) -> dict:
             messages=[
                 {"role": "user", "content": [
                     {"type": "text", "text": "이 이미지는 제품의 '원재료명' 부분입니다. 이미지에서 원재료명에 해당하는 텍스트만 모두 추출해서, 쉼표(,)로 구분된 하나의 문자열로 만들어주세요. 다른 설명이나 줄바꿈 없이 텍스트만 응답해주세요."},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}},
+                    {"type": "image_url", "image_url": {"url": image_url}},
                 ]}
             ],
             max_tokens=1000,
@@ -116,8 +107,8 @@ def recognize_food(state: VeganCheckState) -> dict:
     print("[Node: recognize_food] 음식 인식 시작")
     if not client: return {"error_message": "API 키가 유효하지 않습니다."}
 
-    base64_image = encode_image(state['image_path'])
-    if not base64_image: return {"error_message": f"이미지를 읽을 수 없습니다: {state['image_path']}"}
+    image_url = state['image'].data_url
+    if not image_url: return {"error_message": f"이미지를 읽을 수 없습니다: {state['image_path']}"}
 
     try:
         response = client.chat.completions.create(
@@ -125,7 +116,7 @@ def recognize_food(state: VeganCheckState) -> dict:
             response_format={"type": "json_object"},
             messages=[
                 {"role": "system", "content": "You are a food expert. Analyze the food in the image. Your response must be a JSON object with two keys: 'food_name' (the name of the dish) and 'estimated_ingredients' (a comma-separated string of likely main ingredients)."},
-                {"role": "user", "content": [{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}]}
+                {"role": "user", "content": [{"type": "image_url", "image_url": {"url": image_url}}]}
             ]
         )
         food_info = json.loads(response.choices[0].message.content)
@@ -321,11 +312,14 @@ if __name__ == "__main__":
     final_output_for_file = ""
     for image_path in images_to_test:
         # 초기 상태를 설정하여 그래프 실행
-        initial_state = {"image_path": image_path}
+        # 이미지는 첫 노드에서 한 번만 인코딩되고, 스캔이 끝나면 해제된다
+        image = ImageHandle(image_path)
+        initial_state = {"image_path": image_path, "image": image}
         
         print(f"\n--- Running analysis for: {image_path} ---")
         # .invoke()를 사용해 최종 상태를 한번에 받습니다.
-        final_state = app.invoke(initial_state)
+        with image:
+            final_state = app.invoke(initial_state)
         print("--- Analysis complete ---")
 
         # 최종 결과
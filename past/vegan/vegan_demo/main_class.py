@@ -3,34 +3,26 @@
 import sys
 import io
 import os
-import base64
 import json
 from openai import OpenAI
 from dotenv import load_dotenv
 
-# --- Helper function ---
-def encode_image(image_path: str):
-    """이미지 파일을 Base64로 인코딩합니다."""
-    try:
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
-    except FileNotFoundError:
-        return None
+from image_handle import ImageHandle
 
 # --- 각 전문 Agent들의 클래스 정의 ---
 
 class ImageTypeDetectorAgent:
     """이미지의 종류가 '음식'인지 '성분표'인지 판단합니다."""
-    def detect_type(self, image_path: str, client: OpenAI):
-        base64_image = encode_image(image_path)
-        if not base64_image: return "error"
+    def detect_type(self, image: ImageHandle, client: OpenAI):
+        image_url = image.data_url
+        if not image_url: return "error"
         
         try:
             response = client.chat.completions.create(
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": "You are an image classifier. Determine if the image primarily shows a prepared food dish, or a text-heavy ingredient list. Your response must be a single word: 'food' or 'ingredients'."},
-                    {"role": "user", "content": [{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}]},
+                    {"role": "user", "content": [{"type": "image_url", "image_url": {"url": image_url}}]},
                 ],
                 max_tokens=5,
             )
@@ -41,16 +33,16 @@ class ImageTypeDetectorAgent:
 
 class VisionAgent:
     """(성분표 이미지용) GPT-4o Vision을 사용해 이미지에서 텍스트(성분)를 추출합니다."""
-    def extract_ingredients_from_image(self, image_path: str, client: OpenAI):
-        base64_image = encode_image(image_path)
-        if not base64_image: return None
+    def extract_ingredients_from_image(self, image: ImageHandle, client: OpenAI):
+        image_url = image.data_url
+        if not image_url: return None
         try:
             response = client.chat.completions.create(
                 model="gpt-4o",
                 messages=[
                     {"role": "user", "content": [
                         {"type": "text", "text": "이 이미지는 제품의 '원재료명' 부분입니다. 이미지에서 원재료명에 해당하는 텍스트만 모두 추출해서, 쉼표(,)로 구분된 하나의 문자열로 만들어주세요. 다른 설명이나 줄바꿈 없이 텍스트만 응답해주세요."},
-                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}},
+                        {"type": "image_url", "image_url": {"url": image_url}},
                     ]}
                 ],
                 max_tokens=1000,
@@ -62,16 +54,16 @@ class VisionAgent:
 
 class FoodRecognitionAgent:
     """(음식 사진용) GPT-4o Vision을 사용해 음식 이름과 예상 재료를 분석합니다."""
-    def recognize_food(self, image_path: str, client: OpenAI):
-        base64_image = encode_image(image_path)
-        if not base64_image: return None
+    def recognize_food(self, image: ImageHandle, client: OpenAI):
+        image_url = image.data_url
+        if not image_url: return None
         try:
             response = client.chat.completions.create(
                 model="gpt-4o",
                 response_format={"type": "json_object"},
                 messages=[
                     {"role": "system", "content": "You are a food expert. Analyze the food in the image. Your response must be a JSON object with two keys: 'food_name' (the name of the dish) and 'estimated_ingredients' (a comma-separated string of likely main ingredients)."},
-                    {"role": "user", "content": [{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}]}
+                    {"role": "user", "content": [{"type": "image_url", "image_url": {"url": image_url}}]}
                 ]
             )
             return json.loads(response.choices[0].message.content)
@@ -142,18 +134,20 @@ class MasterAgent:
             return "에러: API 키가 유효하지 않습니다."
 
         print(f"\n[MasterAgent] 이미지 스캔 시작: {image_path}")
-        image_type = self.image_detector.detect_type(image_path, self.client)
-        print(f"[MasterAgent] 이미지 종류 판별: '{image_type}'")
-
-        if image_type == 'ingredients':
-            return self.handle_ingredients_image(image_path)
-        elif image_type == 'food':
-            return self.handle_food_image(image_path)
-        else:
-            return f"이미지 종류를 판별할 수 없습니다: {image_path}"
-
-    def handle_ingredients_image(self, image_path):
-        ingredients = self.vision_agent.extract_ingredients_from_image(image_path, self.client)
+        # 이미지는 한 번만 읽고 인코딩해 모든 Agent가 공유하고, 스캔이 끝나면 해제한다
+        with ImageHandle(image_path) as image:
+            image_type = self.image_detector.detect_type(image, self.client)
+            print(f"[MasterAgent] 이미지 종류 판별: '{image_type}'")
+
+            if image_type == 'ingredients':
+                return self.handle_ingredients_image(image)
+            elif image_type == 'food':
+                return self.handle_food_image(image)
+            else:
+                return f"이미지 종류를 판별할 수 없습니다: {image_path}"
+
+    def handle_ingredients_image(self, image: ImageHandle):
+        ingredients = self.vision_agent.extract_ingredients_from_image(image, self.client)
         if not ingredients: return "성분 추출에 실패했습니다."
         
         analysis = self.analysis_agent.check_ingredients(ingredients, self.client)
@@ -178,8 +172,8 @@ class MasterAgent:
             result_string += f"  - 주요 성분: {', '.join(contains)}\n"
         return result_string
 
-    def handle_food_image(self, image_path):
-        food_info = self.food_agent.recognize_food(image_path, self.client)
+    def handle_food_image(self, image: ImageHandle):
+        food_info = self.food_agent.recognize_food(image, self.client)
         if not food_info: return "음식 인식에 실패했습니다."
         
         food_name = food_info.get("food_name", "이름 모를 음식")
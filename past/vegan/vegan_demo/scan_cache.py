@@ -0,0 +1,278 @@
+# vegan_demo/scan_cache.py
+"""
+지각 해시(perceptual hash) 기반 스캔 결과 캐시
+
+같은 제품을 조금 다르게 찍은 사진(크기, 압축, 밝기, 약간의 각도 차이)을 같은 스캔으로 보고,
+저장해 둔 분석 결과를 모델 호출 없이 돌려준다.
+
+- 정규화: EXIF 방향 보정 → 흑백 → 자동 대비 (조명 차이 완화)
+- 키: dHash(9x8 인접 밝기 비교) + pHash(32x32 DCT 저주파 8x8) 각 64bit + 파일 sha256
+- 후보: 두 해시의 해밍 거리가 모두 임계값 이하인 항목 중 가장 가까운 것
+- 판정:
+  - 음식 사진: 같은 파일이거나 거리가 FOOD_DISTANCE 이하(재압축/축소 수준)일 때만 바로 hit, 아니면 미스.
+    같은 접시에 재료만 바뀐 다른 음식(연어 샐러드 ↔ 두부 샐러드)이 같은 사진의 회전/잘림과 거리가 겹친다
+  - 원재료명 사진: 지각 해시로는 글자 한두 개 차이(달걀 ↔ 젤라틴)를 구분하지 못한다
+    (같은 레이아웃의 다른 원재료명이 같은 사진의 3도 회전보다 가깝다).
+    같은 파일일 때만 바로 hit, 아니면 호출한 쪽에서 원재료명만 다시 추출해 저장된 텍스트와 같은지 확인한다
+- 저장: SQLite, 항목 수 상한을 넘으면 오래 안 쓴 항목부터 비운다 (LRU)
+"""
+
+import os
+import json
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from typing import NamedTuple, Optional
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 캐시 파일 (SQLite)
+SCAN_CACHE_PATH = os.getenv("VEGAN_SCAN_CACHE_PATH", os.path.join(CURRENT_DIR, "scan_cache.sqlite"))
+
+# 항목 수 상한. 넘으면 오래 안 쓴 항목부터 CACHE_LOW_WATER까지 비운다
+SCAN_CACHE_ENTRIES = int(os.getenv("VEGAN_SCAN_CACHE_ENTRIES", "10000"))
+CACHE_LOW_WATER = 0.9
+
+# 후보 해밍 거리 임계값 (64bit 중). 축소/재압축/밝기/흐림은 대부분 0~9, 3도 회전/가장자리 잘림은 6~15,
+# 서로 다른 음식 사진은 25 이상
+DHASH_THRESHOLD = int(os.getenv("VEGAN_DHASH_THRESHOLD", "12"))
+PHASH_THRESHOLD = int(os.getenv("VEGAN_PHASH_THRESHOLD", "12"))
+
+# 음식 사진을 확인 없이 hit로 쓰는 dhash + phash 거리 상한. 같은 사진의 축소/재압축/흐림은 0, 밝기 3~11,
+# 회전/잘림 12~18인데 재료만 바꾼 다른 음식도 20 안팎이라 거리로는 나눌 수 없어, 사실상 같은 이미지만 허용한다
+FOOD_DISTANCE = int(os.getenv("VEGAN_FOOD_DISTANCE", "4"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fingerprint TEXT NOT NULL,
+    dhash TEXT NOT NULL,
+    phash TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    image_type TEXT NOT NULL,
+    response TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    saved_calls INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access);
+"""
+
+# pHash용 DCT-II 계수 (32점 중 저주파 8개만 필요)
+_DCT = [[math.cos(math.pi * (2 * x + 1) * u / 64) for x in range(32)] for u in range(8)]
+
+
+class ScanKey(NamedTuple):
+    dhash: int
+    phash: int
+    digest: str  # 파일 바이트 sha256 (같은 파일 재업로드 판별)
+
+
+class ScanMatch(NamedTuple):
+    entry_id: int
+    distance: int        # dhash + phash 해밍 거리
+    response: dict
+    calls: int           # 원래 스캔이 쓴 모델 호출 수
+    verified: bool       # True면 바로 hit, False면 원재료명 재추출로 확인 필요 (다른 파일의 원재료명 사진)
+
+
+def _hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _normalized(image_path: str):
+    """해시 입력용 흑백 이미지 (EXIF 방향 보정 + 자동 대비)"""
+    from PIL import Image, ImageOps
+
+    with Image.open(image_path) as opened:
+        if opened.format == "JPEG":
+            # 해시는 32px까지만 쓰므로 디코딩 단계에서 최대한 줄여 읽는다
+            opened.draft("L", (64, 64))
+        img = ImageOps.exif_transpose(opened).convert("L")
+    return ImageOps.autocontrast(img, cutoff=1)
+
+
+def dhash(img) -> int:
+    """9x8로 줄여 가로로 이웃한 픽셀의 밝기 증감을 64bit로"""
+    from PIL import Image
+
+    pixels = img.resize((9, 8), Image.LANCZOS).tobytes()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] < pixels[row * 9 + col + 1])
+    return bits
+
+
+def phash(img) -> int:
+    """32x32 DCT의 저주파 8x8 계수가 중앙값(DC 제외)보다 큰지를 64bit로"""
+    from PIL import Image
+
+    pixels = img.resize((32, 32), Image.LANCZOS).tobytes()
+    rows = [[sum(c * p for c, p in zip(_DCT[u], pixels[y * 32:(y + 1) * 32])) for u in range(8)]
+            for y in range(32)]
+    coeffs = [sum(_DCT[v][y] * rows[y][u] for y in range(32)) for v in range(8) for u in range(8)]
+    median = sorted(coeffs[1:])[len(coeffs[1:]) // 2]
+    bits = 0
+    for c in coeffs:
+        bits = (bits << 1) | (c > median)
+    return bits
+
+
+def scan_key(image_path: str) -> ScanKey:
+    with open(image_path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    img = _normalized(image_path)
+    return ScanKey(dhash(img), phash(img), digest)
+
+
+def normalize_ingredients(text: str) -> str:
+    """원재료명 비교용: NFKC(전각 쉼표/괄호 통일) + 공백 제거 + 소문자"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return "".join(text.lower().split()).strip(",.")
+
+
+def config_fingerprint(*parts) -> str:
+    """결과를 바꾸는 설정(모델명, 프롬프트 등)의 식별자"""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+class ScanCache:
+    """지각 해시 → 스캔 결과(analyze_image 응답) 캐시 (SQLite, LRU)
+
+    fingerprint가 다른 항목(모델/프롬프트가 바뀐 결과)과는 일치시키지 않는다.
+    해시 비교는 메모리에 올린 색인에서 선형 탐색한다 (1만 항목 기준 수 ms).
+    항목마다 원래 스캔이 쓴 모델 호출 수를 저장해 hit 때마다 아낀 호출 수를 합산한다
+    (saved_calls는 이 프로세스, saved_calls_total은 파일에 남은 항목 누적).
+    """
+
+    def __init__(self, fingerprint: str, path: str = SCAN_CACHE_PATH, max_entries: int = SCAN_CACHE_ENTRIES,
+                 dhash_threshold: int = DHASH_THRESHOLD, phash_threshold: int = PHASH_THRESHOLD,
+                 food_distance: int = FOOD_DISTANCE):
+        self.fingerprint = fingerprint
+        self.path = path
+        self.max_entries = max_entries
+        self.dhash_threshold = dhash_threshold
+        self.phash_threshold = phash_threshold
+        self.food_distance = food_distance
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        # id -> (dhash, phash), 이 fingerprint 항목만
+        self._index = {
+            row[0]: (int(row[1], 16), int(row[2], 16))
+            for row in self.conn.execute("SELECT id, dhash, phash FROM entries WHERE fingerprint = ?", (fingerprint,))
+        }
+        self.hits = self.verified_hits = self.verify_failed = self.misses = self.evictions = 0
+        self.food_rejected = 0  # 후보였지만 거리가 FOOD_DISTANCE를 넘어 미스로 처리한 음식 사진
+        self.saved_calls = self.verify_calls = 0
+
+    def key(self, image_path: str) -> Optional[ScanKey]:
+        """이미지 키. 열 수 없는 이미지면 None (캐시를 건너뛴다)"""
+        try:
+            return scan_key(image_path)
+        except Exception as e:
+            print(f"[scan_cache] 해시 실패, 캐시 건너뜀: {e}")
+            return None
+
+    def match(self, key: ScanKey) -> Optional[ScanMatch]:
+        """임계값 안에서 가장 가까운 항목 (없거나 다른 음식일 수 있으면 None, 미스로 집계)"""
+        with self._lock:
+            best = None
+            for entry_id, (d, p) in self._index.items():
+                dd, dp = _hamming(key.dhash, d), _hamming(key.phash, p)
+                if dd <= self.dhash_threshold and dp <= self.phash_threshold:
+                    if best is None or dd + dp < best[1]:
+                        best = (entry_id, dd + dp)
+            if best is None:
+                self.misses += 1
+                return None
+            digest, image_type, response, calls = self.conn.execute(
+                "SELECT digest, image_type, response, calls FROM entries WHERE id = ?", (best[0],)
+            ).fetchone()
+            same_file = key.digest == digest
+            if image_type == "food" and not same_file and best[1] > self.food_distance:
+                self.food_rejected += 1
+                self.misses += 1
+                return None
+        verified = image_type == "food" or same_file
+        return ScanMatch(best[0], best[1], json.loads(response), calls, verified)
+
+    def hit(self, match: ScanMatch, spent_calls: int = 0) -> dict:
+        """match를 hit로 기록하고 저장된 응답 반환. spent_calls는 확인에 쓴 호출 수 (원재료명 재추출)"""
+        saved = max(0, match.calls - spent_calls)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE entries SET last_access = ?, hits = hits + 1, saved_calls = saved_calls + ? WHERE id = ?",
+                (time.time(), saved, match.entry_id),
+            )
+            if spent_calls:
+                self.verified_hits += 1
+                self.verify_calls += spent_calls
+            else:
+                self.hits += 1
+            self.saved_calls += saved
+        return {**match.response, "cache": {"distance": match.distance, "saved_calls": saved,
+                                            "verified_by_text": bool(spent_calls)}}
+
+    def verify_miss(self, spent_calls: int = 1):
+        """원재료명을 다시 추출해 봤지만 저장된 텍스트와 달랐음 (다른 제품)"""
+        with self._lock:
+            self.verify_failed += 1
+            self.verify_calls += spent_calls
+            self.misses += 1
+
+    def put(self, key: ScanKey, response: dict, calls: int):
+        now = time.time()
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO entries (fingerprint, dhash, phash, digest, image_type, response, calls, "
+                "created_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.fingerprint, f"{key.dhash:016x}", f"{key.phash:016x}", key.digest, response["image_type"],
+                 json.dumps(response, ensure_ascii=False), calls, now, now),
+            )
+            self._index[cursor.lastrowid] = (key.dhash, key.phash)
+            self._evict()
+
+    def _evict(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        excess = count - int(self.max_entries * CACHE_LOW_WATER)
+        victims = [row[0] for row in self.conn.execute(
+            "SELECT id FROM entries ORDER BY last_access LIMIT ?", (excess,))]
+        self.conn.executemany("DELETE FROM entries WHERE id = ?", [(v,) for v in victims])
+        for v in victims:
+            self._index.pop(v, None)
+        self.evictions += len(victims)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, saved_total = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(saved_calls), 0) FROM entries"
+            ).fetchone()
+            lookups = self.hits + self.verified_hits + self.misses
+            return {
+                "hits": self.hits,
+                "verified_hits": self.verified_hits,
+                "verify_failed": self.verify_failed,
+                "food_rejected": self.food_rejected,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.verified_hits) / lookups, 4) if lookups else 0.0,
+                "saved_calls": self.saved_calls,
+                "verify_calls": self.verify_calls,
+                "saved_calls_total": saved_total,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,88 @@
+# vegan_demo/test_scan_cache.py
+"""
+scan_cache.py hit / 미스 판정 테스트 (test_image/의 음식 사진 사용, 캐시 파일은 pytest 임시 디렉터리)
+"""
+
+import os
+
+import pytest
+from PIL import Image
+
+from bench_fused import FIXTURES
+from bench_scan_cache import replace_salmon
+from scan_cache import ScanCache
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_IMAGE_DIR = os.path.join(CURRENT_DIR, "test_image")
+SALAD = os.path.join(TEST_IMAGE_DIR, "test1.png")
+OTHER_FOOD = os.path.join(TEST_IMAGE_DIR, "test3.jpg")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ScanCache("test", path=str(tmp_path / "scan_cache.sqlite"))
+
+
+def save_variant(tmp_path, name, edit):
+    path = str(tmp_path / name)
+    with Image.open(SALAD) as img:
+        edit(img.convert("RGB")).save(path, quality=85)
+    return path
+
+
+def store(cache, path, response, calls=3):
+    key = cache.key(path)
+    cache.put(key, response, calls)
+    return key
+
+
+def test_same_food_photo_hits(tmp_path, cache):
+    store(cache, SALAD, FIXTURES["test1.png"])
+
+    # 같은 파일 재업로드
+    match = cache.match(cache.key(SALAD))
+    assert match is not None and match.verified and match.distance == 0
+    result = cache.hit(match)
+    assert result["classification_name"] == FIXTURES["test1.png"]["classification_name"]
+    assert result["cache"]["saved_calls"] == 3
+
+    # 축소 + JPEG 재압축: 다른 파일이지만 FOOD_DISTANCE 안이라 바로 hit
+    resized = save_variant(tmp_path, "half.jpg", lambda img: img.resize((img.width // 2, img.height // 2)))
+    match = cache.match(cache.key(resized))
+    assert match is not None and match.verified and 0 < match.distance <= cache.food_distance
+
+    stats = cache.stats()
+    assert (cache.hits, cache.misses, cache.food_rejected) == (1, 0, 0)
+    assert stats["saved_calls"] == 3
+
+
+def test_different_food_is_rejected(tmp_path, cache):
+    store(cache, SALAD, FIXTURES["test1.png"])
+
+    # 같은 접시에 연어만 두부로 바꾼 사진: 해시 후보에는 들지만 다른 음식이므로 미스
+    tofu = save_variant(tmp_path, "test1_tofu.png", replace_salmon)
+    assert cache.match(cache.key(tofu)) is None
+    assert cache.food_rejected == 1
+
+    # 전혀 다른 음식 사진은 후보조차 아니다
+    assert cache.match(cache.key(OTHER_FOOD)) is None
+    assert (cache.misses, cache.food_rejected) == (2, 1)
+
+
+def test_ingredient_photo_needs_text_check(tmp_path, cache):
+    # 원재료명 사진은 같은 파일이 아니면 재추출로 확인해야 한다 (verified=False)
+    store(cache, SALAD, FIXTURES["IMG_8393.jpg"], calls=2)
+    assert cache.match(cache.key(SALAD)).verified
+
+    resized = save_variant(tmp_path, "half.jpg", lambda img: img.resize((img.width // 2, img.height // 2)))
+    match = cache.match(cache.key(resized))
+    assert match is not None and not match.verified
+    result = cache.hit(match, spent_calls=1)
+    assert result["cache"] == {"distance": match.distance, "saved_calls": 1, "verified_by_text": True}
+    assert (cache.hits, cache.verified_hits) == (0, 1)
+
+
+def test_other_fingerprint_never_matches(tmp_path, cache):
+    store(cache, SALAD, FIXTURES["test1.png"])
+    other = ScanCache("other", path=cache.path)
+    assert other.match(other.key(SALAD)) is None